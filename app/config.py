@@ -0,0 +1,90 @@
+import os
+
+# Repository root, used to resolve default data and model locations
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+class Settings:
+    """
+    Runtime configuration for the API, read from environment variables
+    """
+
+    def __init__(self) -> None:
+        # Directory containing the model and scaler pickle files
+        self.models_dir = os.environ.get("HEART_MODELS_DIR", os.path.join(BASE_DIR, "pickles"))
+
+        # Model artifact format: 'pickle', 'bundle', or 'auto' to use the bundle when it exists.
+        # The bundle loads every model at once, so only the pickles follow the load mode
+        self.model_format = os.environ.get("HEART_MODEL_FORMAT", "pickle")
+        self.bundle_path = os.environ.get("HEART_MODEL_BUNDLE") or None
+        self.bundle_mmap = os.environ.get("HEART_BUNDLE_MMAP", "1") == "1"
+
+        # How models are unpickled: 'eager', 'parallel', 'background' or 'lazy'
+        self.load_mode = os.environ.get("HEART_LOAD_MODE", "eager")
+        self.load_workers = int(os.environ.get("HEART_LOAD_WORKERS", 4))
+
+        # Poll the models directory every this many seconds and hot reload changed models, 0 disables it
+        self.reload_interval = float(os.environ.get("HEART_RELOAD_INTERVAL", 0))
+
+        # Token required by the admin endpoints in the X-Admin-Token header, unset disables them
+        self.admin_token = os.environ.get("HEART_ADMIN_TOKEN") or None
+
+        # Run a dummy prediction through every model as soon as it is loaded
+        self.warm_models = os.environ.get("HEART_WARM_MODELS", "0") == "1"
+
+        # Evaluate the scalers and the linear and naive Bayes models as fused NumPy kernels
+        self.compiled_ensemble = os.environ.get("HEART_COMPILED_ENSEMBLE", "0") == "1"
+
+        # Evaluate random forests with the flattened array-backed engine
+        self.flat_forest = os.environ.get("HEART_FLAT_FOREST", "0") == "1"
+
+        # Evaluate KNN models with the precomputed neighbour index, searched by
+        # 'brute' matrix multiply, a KD-'tree', or 'auto' by training set size
+        self.flat_knn = os.environ.get("HEART_FLAT_KNN", "0") == "1"
+        self.knn_index = os.environ.get("HEART_KNN_INDEX", "auto")
+
+        # Evaluate every model with the float32 and 16-bit quantized engines, activated only when the
+        # models' drift report shows at most this share of held-out rows changing their predicted label
+        self.quantized = os.environ.get("HEART_QUANTIZED", "0") == "1"
+        self.quantized_max_drift = float(os.environ.get("HEART_QUANTIZED_MAX_DRIFT", 0.01))
+
+        # Exact-input prediction cache, a size of 0 disables it and a TTL of 0 never expires entries
+        self.cache_size = int(os.environ.get("HEART_CACHE_SIZE", 10000))
+        self.cache_ttl = float(os.environ.get("HEART_CACHE_TTL", 0))
+
+        # Models taking part in /predict_all consensus, comma-separated, empty for all available models
+        self.ensemble_models = [
+            model_name.strip() for model_name in os.environ.get("HEART_ENSEMBLE_MODELS", "").split(",")
+            if model_name.strip()
+        ] or None
+
+        # Run cheap models first and skip the rest once they cannot change the majority vote
+        self.fast_consensus = os.environ.get("HEART_FAST_CONSENSUS", "0") == "1"
+
+        # Record request, stage and per-model latencies for the /metrics endpoint
+        self.metrics_enabled = os.environ.get("HEART_METRICS", "1") == "1"
+
+        # Threads running model inference off the event loop
+        self.inference_workers = int(os.environ.get("HEART_INFERENCE_WORKERS", min(4, os.cpu_count() or 1)))
+
+        # Inference jobs allowed to wait for a free thread before requests get a 503
+        self.inference_queue_size = int(os.environ.get("HEART_INFERENCE_QUEUE_SIZE", 64))
+
+        # Micro-batching of concurrent /predict_all requests, a 0 ms window disables it
+        self.batch_window_ms = float(os.environ.get("HEART_BATCH_WINDOW_MS", 2))
+        self.batch_max_size = int(os.environ.get("HEART_BATCH_MAX_SIZE", 64))
+
+        # Most patients in one /batch request body, larger batches get a 413; 0 disables the limit
+        self.batch_max_rows = int(os.environ.get("HEART_BATCH_MAX_ROWS", 10000))
+
+        # Rows of an NDJSON body scored together by the streaming prediction routes
+        self.stream_chunk_size = int(os.environ.get("HEART_STREAM_CHUNK_SIZE", 1000))
+
+        # Asynchronous prediction jobs: SQLite job store, worker processes scoring their chunks
+        # per API process (every uvicorn worker starts its own), rows per chunk, and seconds
+        # finished jobs are kept, 0 keeps them until deleted
+        self.job_db = os.environ.get("HEART_JOB_DB", os.path.join(BASE_DIR, "jobs.sqlite3"))
+        self.job_workers = int(os.environ.get("HEART_JOB_WORKERS", 1))
+        self.job_chunk_size = int(os.environ.get("HEART_JOB_CHUNK_SIZE", 1000))
+        self.job_retention = float(os.environ.get("HEART_JOB_RETENTION", 86400))
+
+settings = Settings()
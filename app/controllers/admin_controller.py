@@ -0,0 +1,39 @@
+import secrets
+from fastapi import APIRouter, HTTPException, Depends, Header
+from fastapi.concurrency import run_in_threadpool
+from typing import Optional
+from app.config import settings
+from app.dependencies import get_predictor
+from app.models.model_set import ModelSetValidationError, ReloadInProgressError
+from app.models.predictor import HeartDiseasePredictor
+
+router = APIRouter(prefix="/admin", tags=["admin"])
+
+def require_admin_token(x_admin_token: Optional[str] = Header(None)) -> None:
+    """
+    Check the X-Admin-Token header against the configured admin token
+    """
+    if settings.admin_token is None:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled, set HEART_ADMIN_TOKEN to enable them")
+    if x_admin_token is None or not secrets.compare_digest(x_admin_token, settings.admin_token):
+        raise HTTPException(status_code=401, detail="Invalid admin token")
+
+@router.post("/reload", summary="Hot reload the models", dependencies=[Depends(require_admin_token)])
+async def reload_models(predictor: HeartDiseasePredictor = Depends(get_predictor)) -> dict:
+    """
+    Load the models again from the models directory, validate them with a smoke
+    prediction and swap them in without dropping requests.
+    The current models keep serving if the new ones fail validation.
+    """
+    previous_version = predictor.version
+    try:
+        # Loading runs outside the inference pool so predictions keep their threads
+        model_set = await run_in_threadpool(predictor.reload)
+    except ReloadInProgressError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except (ModelSetValidationError, FileNotFoundError) as e:
+        raise HTTPException(status_code=422, detail=f"{e}; still serving model set version {previous_version}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"{e}; still serving model set version {previous_version}")
+
+    return {"status": "reloaded", "previous_version": previous_version, "model_set": model_set}
@@ -1,17 +1,30 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends
+from app.dependencies import get_batcher, get_executor, get_job_queue, get_predictor
 from app.models.predictor import HeartDiseasePredictor
+from app.services.batcher import MicroBatcher
+from app.services.executor import InferenceExecutor
+from app.services.jobs import JobQueue
 
 router = APIRouter(tags=["health"])
 
-# Initialize predictor
-predictor = HeartDiseasePredictor()
-
 @router.get("/health", summary="Check API health")
-async def health_check() -> dict:
+async def health_check(predictor: HeartDiseasePredictor = Depends(get_predictor),
+                       executor: InferenceExecutor = Depends(get_executor),
+                       batcher: MicroBatcher = Depends(get_batcher),
+                       jobs: JobQueue = Depends(get_job_queue)) -> dict:
     """
-    Check the health of the API and return the number of loaded models
+    Check the health of the API and return the number of loaded models,
+    per-model readiness, the active model set, inference executor load,
+    achieved batch sizes, cache statistics and job worker load
     """
     return {
         "status": "healthy", 
-        "models_loaded": len(predictor.models)
+        "ready": predictor.is_ready(),
+        "models_loaded": len(predictor.models),
+        "models": dict(predictor.model_status),
+        "model_set": predictor.model_set.info(),
+        "inference": executor.stats(),
+        "batching": batcher.stats(),
+        "cache": predictor.cache.stats() if predictor.cache is not None else None,
+        "jobs": jobs.stats()
     }
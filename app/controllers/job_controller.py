@@ -0,0 +1,123 @@
+import asyncio
+from fastapi import APIRouter, HTTPException, Depends, Query
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from app.controllers.prediction_controller import (
+    COMPACT_DESCRIPTION, FAST_DESCRIPTION, MODELS_DESCRIPTION, PATIENTS_BODY, _ensemble_selection
+)
+from app.dependencies import get_job_queue, get_patient_matrix, get_predictor
+from app.models.predictor import HeartDiseasePredictor
+from app.schemas.encoding import FastJSONResponse, dumps, sse_event
+from app.services.jobs import FINISHED_STATES, JobNotFoundError, JobQueue
+import numpy as np
+from typing import AsyncIterator, Optional
+
+router = APIRouter(prefix="/jobs", tags=["jobs"])
+
+# Seconds between job store reads of a progress event stream
+EVENT_POLL_INTERVAL = 0.2
+
+# Chunks read from the job store per step of a results response
+RESULT_READ_CHUNKS = 8
+
+async def _job_status(jobs: JobQueue, job_id: str) -> dict:
+    """Read a job's status off the event loop, answering 404 for unknown jobs"""
+    try:
+        return await run_in_threadpool(jobs.store.get, job_id)
+    except JobNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+@router.post("", status_code=202, summary="Submit a batch of patients as a prediction job", openapi_extra=PATIENTS_BODY)
+async def submit_job(features: np.ndarray = Depends(get_patient_matrix),
+                     models: Optional[str] = Query(None, description=MODELS_DESCRIPTION),
+                     fast: Optional[bool] = Query(None, description=FAST_DESCRIPTION),
+                     compact: bool = Query(False, description=COMPACT_DESCRIPTION),
+                     predictor: HeartDiseasePredictor = Depends(get_predictor),
+                     jobs: JobQueue = Depends(get_job_queue)) -> FastJSONResponse:
+    """
+    Queue predictions from all models of the ensemble for a list of patients and
+    return the job id at once. The worker pool scores the job in chunks; poll
+    /jobs/{job_id} or stream /jobs/{job_id}/events for progress and fetch the
+    predictions from /jobs/{job_id}/results.
+    """
+    model_names = _ensemble_selection(predictor, models)
+    # Writing the chunks of a large job takes a while, so it runs off the event loop
+    job = await run_in_threadpool(jobs.submit, features, model_names, fast, compact)
+    return FastJSONResponse(job, status_code=202, headers={"Location": f"/jobs/{job['job_id']}"})
+
+@router.get("/{job_id}", summary="Get the status and progress of a prediction job")
+async def get_job(job_id: str, jobs: JobQueue = Depends(get_job_queue)) -> FastJSONResponse:
+    """
+    Get a job's status ('queued', 'running', 'completed' or 'failed'),
+    the rows and chunks scored so far and the error of a failed job
+    """
+    return FastJSONResponse(await _job_status(jobs, job_id))
+
+@router.get("/{job_id}/results", summary="Get the predictions of a prediction job")
+async def get_job_results(job_id: str, jobs: JobQueue = Depends(get_job_queue)) -> StreamingResponse:
+    """
+    Get the job status with the predictions scored so far under `results`, in
+    the /predict_all/batch layout. Until the job completes, `results` holds the
+    patients up to the first chunk that is not finished.
+    """
+    try:
+        job, finished = await run_in_threadpool(jobs.store.results, job_id)
+    except JobNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+    async def body() -> AsyncIterator[bytes]:
+        # The chunks are stored as encoded JSON arrays and are spliced into one array without
+        # decoding, a few at a time, so a large job is never held in memory as one body
+        yield dumps(job)[:-1] + b',"results":['
+        separator = b""
+        for start in range(0, finished, RESULT_READ_CHUNKS):
+            results = await run_in_threadpool(
+                jobs.store.chunk_results, job_id, start, min(RESULT_READ_CHUNKS, finished - start)
+            )
+            for result in results:
+                if len(result) > 2:
+                    yield separator + result[1:-1]
+                    separator = b","
+            if len(results) < min(RESULT_READ_CHUNKS, finished - start):
+                # The job was deleted while its results were being sent
+                break
+        yield b"]}"
+
+    return StreamingResponse(body(), media_type="application/json")
+
+@router.get("/{job_id}/events", summary="Stream the progress of a prediction job")
+async def stream_job_events(job_id: str, jobs: JobQueue = Depends(get_job_queue)) -> StreamingResponse:
+    """
+    Stream Server-Sent Events with the job status: a `progress` event whenever
+    more rows are scored, then a `completed` or `failed` event before the stream ends
+    """
+    job = await _job_status(jobs, job_id)
+
+    async def events(job: dict) -> AsyncIterator[bytes]:
+        previous = None
+        while True:
+            if job != previous:
+                if job["status"] in FINISHED_STATES:
+                    yield sse_event(job["status"], job)
+                    return
+                yield sse_event("progress", job)
+                previous = job
+            await asyncio.sleep(EVENT_POLL_INTERVAL)
+            try:
+                job = await run_in_threadpool(jobs.store.get, job_id)
+            except JobNotFoundError:
+                # The job was deleted while the stream was open
+                return
+
+    return StreamingResponse(events(job), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+@router.delete("/{job_id}", summary="Cancel and delete a prediction job")
+async def delete_job(job_id: str, jobs: JobQueue = Depends(get_job_queue)) -> dict:
+    """
+    Delete a job with its predictions; chunks that have not run yet are cancelled
+    """
+    try:
+        await run_in_threadpool(jobs.store.delete, job_id)
+    except JobNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    return {"job_id": job_id, "status": "deleted"}
@@ -1,96 +1,324 @@
-from fastapi import APIRouter, HTTPException, Depends
-from app.schemas.patient import PatientData, ModelPrediction, AllPredictionsResponse, SingleModelResponse
+import asyncio
+from functools import partial
+from fastapi import APIRouter, HTTPException, Depends, Query, Request
+from starlette.requests import ClientDisconnect
+from app.config import settings
+from app.schemas.decoding import decode_patient_lines, iter_ndjson_lines
+from app.schemas.encoding import DuplexStreamingResponse, FastJSONResponse, dumps, sse_event
+from app.schemas.responses import all_predictions_content, single_model_content
+from app.schemas.patient import (
+    PatientData, AllPredictionsResponse, SingleModelResponse,
+    BatchPredictionsResponse, BatchSingleModelResponse
+)
+from app.dependencies import get_batch_matrix, get_batcher, get_executor, get_patient_row, get_predictor
 from app.models.predictor import HeartDiseasePredictor
+from app.services.batcher import MicroBatcher
+from app.services.executor import ExecutorSaturatedError, InferenceExecutor
+from app.services.metrics import Stopwatch, metrics
 import numpy as np
-from typing import List
+from typing import Any, AsyncIterator, Callable, List, Literal, Optional
 
 router = APIRouter(tags=["predictions"])
 
-# Initialize predictor
-predictor = HeartDiseasePredictor()
+MODELS_DESCRIPTION = "Comma-separated models taking part in the consensus, defaults to the configured ensemble"
+FAST_DESCRIPTION = "Run cheap models first and skip the rest once the majority vote is settled, defaults to the configured mode"
+COMPACT_DESCRIPTION = "Return only the numeric fields, with [prediction, probability] per model instead of the labelled objects"
+FORMAT_DESCRIPTION = "'ndjson' for one result per line, or 'sse' for one Server-Sent Event per chunk of results"
+
+# Seconds a streaming request waits before retrying a chunk the saturated inference executor rejected
+STREAM_RETRY_DELAY = 0.05
+
+# The bodies are decoded straight into feature arrays by get_patient_row,
+# get_batch_matrix and get_patient_matrix, so the routes document their PatientData schemas here
+PATIENT_BODY = {
+    "requestBody": {
+        "content": {"application/json": {"schema": PatientData.model_json_schema()}},
+        "required": True
+    }
+}
+PATIENTS_BODY = {
+    "requestBody": {
+        "content": {"application/json": {"schema": {"type": "array", "items": PatientData.model_json_schema()}}},
+        "required": True
+    }
+}
+NDJSON_BODY = {
+    "requestBody": {
+        "content": {"application/x-ndjson": {"schema": PatientData.model_json_schema()}},
+        "description": "One PatientData JSON object per line",
+        "required": True
+    }
+}
+
+def _stopwatch(request: Request, route: str) -> Stopwatch:
+    """Start timing a request's stages, timing the parse stage from when the request arrived"""
+    watch = metrics.stopwatch(route, getattr(request.state, "request_start", None))
+    watch.lap("parse")
+    return watch
+
+def _finish(request: Request, watch: Stopwatch, stage: str) -> None:
+    """Time the last stage and mark where serializing the response starts"""
+    request.state.handler_end = watch.lap(stage)
+
+def _record_error(route: str, error: Exception) -> None:
+    """Count a failed prediction request by route and error type"""
+    metrics.request_errors.inc(route, type(error).__name__)
+
+def _ensemble_selection(predictor: HeartDiseasePredictor, models: Optional[str]) -> Optional[List[str]]:
+    """Parse the comma-separated models query parameter, None keeps the configured ensemble"""
+    if models is None:
+        return None
+    model_names = [model_name.strip() for model_name in models.split(",") if model_name.strip()]
+    try:
+        predictor.ensemble_keys(model_names)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return model_names
+
+async def _run_chunk(executor: InferenceExecutor, predict: Callable[[np.ndarray], List[Any]], features: np.ndarray) -> List[Any]:
+    """Run one chunk of a stream in the inference executor, waiting for room rather than failing when it is saturated"""
+    while True:
+        try:
+            return await executor.run(predict, features)
+        except ExecutorSaturatedError:
+            await asyncio.sleep(STREAM_RETRY_DELAY)
+
+async def _stream_predictions(request: Request, route: str, executor: InferenceExecutor,
+                              predict: Callable[[np.ndarray], List[Any]], content: Callable[[Any], dict],
+                              sse: bool) -> AsyncIterator[bytes]:
+    """
+    Score an NDJSON request body chunk by chunk as it arrives
+
+    Each chunk runs through the vectorized batch prediction, and its results are
+    sent before the next chunk is read. Only one chunk of patients and results is
+    held at a time, and a client that reads slowly also slows down the upload.
+    Invalid lines get an error in place of their result, and a failed chunk ends
+    the stream with an error.
+    """
+    rows = invalid_rows = 0
+    try:
+        async for lines in iter_ndjson_lines(request.stream(), settings.stream_chunk_size):
+            features, line_errors = decode_patient_lines([line for _, line in lines])
+            predictions = iter(await _run_chunk(executor, predict, features) if len(features) else ())
+            results = [
+                {"line": line_number, "detail": line_errors[position]} if position in line_errors else content(next(predictions))
+                for position, (line_number, _) in enumerate(lines)
+            ]
+            rows += len(features)
+            invalid_rows += len(line_errors)
+
+            if sse:
+                yield sse_event("results", {"line": lines[0][0], "results": results})
+            else:
+                yield b"".join([dumps(result) + b"\n" for result in results])
+    except ClientDisconnect:
+        return
+    except Exception as e:
+        _record_error(route, e)
+        yield sse_event("error", {"detail": str(e)}) if sse else dumps({"detail": str(e)}) + b"\n"
+        return
+
+    if sse:
+        yield sse_event("done", {"rows": rows, "invalid_rows": invalid_rows})
+
+def _streaming_response(request: Request, route: str, executor: InferenceExecutor,
+                        predict: Callable[[np.ndarray], List[Any]], content: Callable[[Any], dict],
+                        output_format: str) -> DuplexStreamingResponse:
+    """Stream the predictions of an NDJSON request body as NDJSON or Server-Sent Events"""
+    sse = output_format == "sse"
+    return DuplexStreamingResponse(
+        _stream_predictions(request, route, executor, predict, content, sse),
+        media_type="text/event-stream" if sse else "application/x-ndjson",
+        headers={"Cache-Control": "no-cache"}
+    )
 
 @router.get("/models", summary="List all available models")
-async def list_models() -> dict:
+async def list_models(predictor: HeartDiseasePredictor = Depends(get_predictor)) -> dict:
     """
     List all available prediction models
     """
-    return {"available_models": predictor.get_available_models()}
+    model_set = predictor.model_set
+    return {"available_models": model_set.available_models(), "model_set_version": model_set.version}
 
-@router.post("/predict_all", response_model=AllPredictionsResponse, summary="Get predictions from all models")
-async def predict_with_all_models(data: PatientData) -> AllPredictionsResponse:
+@router.post("/predict_all", response_model=AllPredictionsResponse, summary="Get predictions from all models",
+             openapi_extra=PATIENT_BODY)
+async def predict_with_all_models(request: Request, features: np.ndarray = Depends(get_patient_row),
+                                  models: Optional[str] = Query(None, description=MODELS_DESCRIPTION),
+                                  fast: Optional[bool] = Query(None, description=FAST_DESCRIPTION),
+                                  compact: bool = Query(False, description=COMPACT_DESCRIPTION),
+                                  predictor: HeartDiseasePredictor = Depends(get_predictor),
+                                  batcher: MicroBatcher = Depends(get_batcher),
+                                  executor: InferenceExecutor = Depends(get_executor)) -> FastJSONResponse:
     """
-    Make predictions using all available models and return a consensus result
+    Make predictions using all models of the ensemble and return a consensus result
     """
+    model_names = _ensemble_selection(predictor, models)
+    watch = _stopwatch(request, "/predict_all")
     try:
-        # Convert input data to numpy array
-        features = np.array([
-            data.age, data.sex, data.cp, data.trestbps, data.chol, 
-            data.fbs, data.restecg, data.thalach, data.exang, 
-            data.oldpeak, data.slope, data.ca, data.thal
-        ])
-        
-        # Get predictions from all models
-        all_predictions = predictor.predict_with_all_models(features)
-        
-        # Get consensus prediction
-        consensus, risk_level, agreement = predictor.get_consensus_prediction(all_predictions)
-        
-        # Create recommendation based on consensus
-        if consensus == 1:
-            recommendation = "Please consult a healthcare professional for a thorough evaluation."
+        if model_names is None and fast is None:
+            # Get predictions from the configured ensemble, batched with concurrent requests
+            all_predictions = await batcher.submit(features)
         else:
-            recommendation = "Continue maintaining a healthy lifestyle with regular check-ups."
-        
-        # Format predictions for response model
-        formatted_predictions = {}
-        for model_key, pred in all_predictions.items():
-            if pred["prediction"] is not None:
-                formatted_predictions[model_key] = ModelPrediction(
-                    prediction=pred["prediction"],
-                    probability=pred["probability"] if pred["probability"] is not None else 0.0,
-                    risk_level=pred["risk_level"]
-                )
-        
-        return AllPredictionsResponse(
-            predictions=formatted_predictions,
-            consensus_prediction=consensus,
-            consensus_risk_level=risk_level,
-            recommendation=recommendation,
-            model_agreement_percentage=agreement
-        )
-    
+            # Requests choosing their own ensemble are not batched
+            all_predictions = await executor.run(predictor.predict_with_all_models, features, model_names, fast)
+        watch.lap("inference")
+
+        response = FastJSONResponse(all_predictions_content(predictor, all_predictions, watch, model_names, compact))
+        _finish(request, watch, "response")
+        return response
+
+    except ExecutorSaturatedError as e:
+        _record_error("/predict_all", e)
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+    except Exception as e:
+        _record_error("/predict_all", e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/predict_all/batch", response_model=BatchPredictionsResponse, summary="Get predictions from all models for many patients",
+             openapi_extra=PATIENTS_BODY)
+async def predict_batch_with_all_models(request: Request, features: np.ndarray = Depends(get_batch_matrix),
+                                        models: Optional[str] = Query(None, description=MODELS_DESCRIPTION),
+                                        fast: Optional[bool] = Query(None, description=FAST_DESCRIPTION),
+                                        compact: bool = Query(False, description=COMPACT_DESCRIPTION),
+                                        predictor: HeartDiseasePredictor = Depends(get_predictor),
+                                        executor: InferenceExecutor = Depends(get_executor)) -> FastJSONResponse:
+    """
+    Make predictions for a list of patients using all models of the ensemble.
+    Every scaler and model runs once over the whole batch.
+    """
+    model_names = _ensemble_selection(predictor, models)
+    if len(features) == 0:
+        return FastJSONResponse({"results": []})
+
+    watch = _stopwatch(request, "/predict_all/batch")
+    try:
+        # Get predictions from all models
+        batch_predictions = await executor.run(predictor.predict_batch_with_all_models, features, model_names, fast)
+        watch.lap("inference")
+
+        # Consensus and formatting are timed together as the response stage for batches
+        response = FastJSONResponse({
+            "results": [
+                all_predictions_content(predictor, all_predictions, model_names=model_names, compact=compact)
+                for all_predictions in batch_predictions
+            ]
+        })
+        _finish(request, watch, "response")
+        return response
+
+    except ExecutorSaturatedError as e:
+        _record_error("/predict_all/batch", e)
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
     except Exception as e:
+        _record_error("/predict_all/batch", e)
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.post("/predict/{model_name}", response_model=SingleModelResponse, summary="Get prediction from a specific model")
-async def predict_with_specific_model(data: PatientData, model_name: str) -> SingleModelResponse:
+@router.post("/predict_all/stream", summary="Stream predictions from all models for NDJSON patients",
+             openapi_extra=NDJSON_BODY)
+async def stream_with_all_models(request: Request,
+                                 models: Optional[str] = Query(None, description=MODELS_DESCRIPTION),
+                                 fast: Optional[bool] = Query(None, description=FAST_DESCRIPTION),
+                                 compact: bool = Query(False, description=COMPACT_DESCRIPTION),
+                                 output_format: Literal["ndjson", "sse"] = Query("ndjson", alias="format", description=FORMAT_DESCRIPTION),
+                                 predictor: HeartDiseasePredictor = Depends(get_predictor),
+                                 executor: InferenceExecutor = Depends(get_executor)) -> DuplexStreamingResponse:
+    """
+    Make predictions using all models of the ensemble for an NDJSON body of
+    patients, one per line. The body is scored in chunks as it arrives and the
+    results of each chunk are streamed back, in the /predict_all layout, before
+    the next chunk is read, so memory use does not grow with the batch size.
+    """
+    model_names = _ensemble_selection(predictor, models)
+    return _streaming_response(
+        request, "/predict_all/stream", executor,
+        partial(predictor.predict_batch_with_all_models, model_names=model_names, fast=fast),
+        lambda all_predictions: all_predictions_content(predictor, all_predictions, model_names=model_names, compact=compact),
+        output_format
+    )
+
+@router.post("/predict/{model_name}", response_model=SingleModelResponse, summary="Get prediction from a specific model",
+             openapi_extra=PATIENT_BODY)
+async def predict_with_specific_model(model_name: str, request: Request, features: np.ndarray = Depends(get_patient_row),
+                                      compact: bool = Query(False, description=COMPACT_DESCRIPTION),
+                                      predictor: HeartDiseasePredictor = Depends(get_predictor),
+                                      executor: InferenceExecutor = Depends(get_executor)) -> FastJSONResponse:
     """
     Make a prediction using a specific model
     """
-    if model_name not in predictor.models:
+    if model_name not in predictor.get_available_models():
         raise HTTPException(status_code=404, detail=f"Model '{model_name}' not found")
-    
+
+    watch = _stopwatch(request, "/predict/{model_name}")
     try:
-        # Convert input data to numpy array
-        features = np.array([
-            data.age, data.sex, data.cp, data.trestbps, data.chol, 
-            data.fbs, data.restecg, data.thalach, data.exang, 
-            data.oldpeak, data.slope, data.ca, data.thal
-        ])
-        
         # Make prediction
-        prediction, probability, risk_level = predictor.predict_with_model(features, model_name)
-        
-        # Create recommendation
-        recommendation = "Please consult a healthcare professional for a thorough evaluation." if prediction == 1 else "Continue maintaining a healthy lifestyle with regular check-ups."
-        
-        return SingleModelResponse(
-            model=model_name,
-            prediction=prediction,
-            probability=float(probability) if probability is not None else 0.0,
-            risk_level=risk_level,
-            recommendation=recommendation
-        )
-    
+        prediction, probability, risk_level = await executor.run(predictor.predict_with_model, features, model_name)
+        watch.lap("inference")
+
+        response = FastJSONResponse(single_model_content(model_name, prediction, probability, risk_level, compact))
+        _finish(request, watch, "response")
+        return response
+
+    except ExecutorSaturatedError as e:
+        _record_error("/predict/{model_name}", e)
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+    except Exception as e:
+        _record_error("/predict/{model_name}", e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/predict/{model_name}/batch", response_model=BatchSingleModelResponse, summary="Get predictions from a specific model for many patients",
+             openapi_extra=PATIENTS_BODY)
+async def predict_batch_with_specific_model(model_name: str, request: Request, features: np.ndarray = Depends(get_batch_matrix),
+                                            compact: bool = Query(False, description=COMPACT_DESCRIPTION),
+                                            predictor: HeartDiseasePredictor = Depends(get_predictor),
+                                            executor: InferenceExecutor = Depends(get_executor)) -> FastJSONResponse:
+    """
+    Make predictions for a list of patients using a specific model
+    """
+    if model_name not in predictor.get_available_models():
+        raise HTTPException(status_code=404, detail=f"Model '{model_name}' not found")
+
+    if len(features) == 0:
+        return FastJSONResponse({"results": []})
+
+    watch = _stopwatch(request, "/predict/{model_name}/batch")
+    try:
+        # Make predictions
+        predictions = await executor.run(predictor.predict_batch_with_model, features, model_name)
+        watch.lap("inference")
+
+        response = FastJSONResponse({
+            "results": [
+                single_model_content(model_name, prediction, probability, risk_level, compact)
+                for prediction, probability, risk_level in predictions
+            ]
+        })
+        _finish(request, watch, "response")
+        return response
+
+    except ExecutorSaturatedError as e:
+        _record_error("/predict/{model_name}/batch", e)
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
     except Exception as e:
+        _record_error("/predict/{model_name}/batch", e)
         raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/predict/{model_name}/stream", summary="Stream predictions from a specific model for NDJSON patients",
+             openapi_extra=NDJSON_BODY)
+async def stream_with_specific_model(model_name: str, request: Request,
+                                     compact: bool = Query(False, description=COMPACT_DESCRIPTION),
+                                     output_format: Literal["ndjson", "sse"] = Query("ndjson", alias="format", description=FORMAT_DESCRIPTION),
+                                     predictor: HeartDiseasePredictor = Depends(get_predictor),
+                                     executor: InferenceExecutor = Depends(get_executor)) -> DuplexStreamingResponse:
+    """
+    Make predictions using a specific model for an NDJSON body of patients,
+    streamed back chunk by chunk
+    """
+    if model_name not in predictor.get_available_models():
+        raise HTTPException(status_code=404, detail=f"Model '{model_name}' not found")
+
+    return _streaming_response(
+        request, "/predict/{model_name}/stream", executor,
+        partial(predictor.predict_batch_with_model, model_name=model_name),
+        lambda result: single_model_content(model_name, *result, compact=compact),
+        output_format
+    )
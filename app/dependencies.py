@@ -0,0 +1,51 @@
+import numpy as np
+from fastapi import Request
+from app.config import settings
+from app.models.predictor import HeartDiseasePredictor
+from app.schemas.decoding import decode_patient, decode_patients
+from app.services.batcher import MicroBatcher
+from app.services.executor import InferenceExecutor
+from app.services.jobs import JobQueue
+
+def get_predictor(request: Request) -> HeartDiseasePredictor:
+    """
+    Return the process-wide predictor created by the application lifespan
+    """
+    return request.app.state.predictor
+
+def get_executor(request: Request) -> InferenceExecutor:
+    """
+    Return the process-wide inference executor created by the application lifespan
+    """
+    return request.app.state.executor
+
+def get_batcher(request: Request) -> MicroBatcher:
+    """
+    Return the process-wide micro-batcher for all-model predictions
+    """
+    return request.app.state.batcher
+
+def get_job_queue(request: Request) -> JobQueue:
+    """
+    Return the process-wide queue of asynchronous prediction jobs
+    """
+    return request.app.state.jobs
+
+async def get_patient_row(request: Request) -> np.ndarray:
+    """
+    Decode the PatientData request body into a feature row
+    """
+    return decode_patient(await request.body())
+
+async def get_patient_matrix(request: Request) -> np.ndarray:
+    """
+    Decode the list of PatientData request body into a feature matrix
+    """
+    return decode_patients(await request.body())
+
+async def get_batch_matrix(request: Request) -> np.ndarray:
+    """
+    Decode the list of PatientData request body of a batch route into a feature
+    matrix, answering 413 beyond HEART_BATCH_MAX_ROWS patients
+    """
+    return decode_patients(await request.body(), settings.batch_max_rows)
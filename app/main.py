@@ -1,13 +1,103 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
+from app.config import settings
+from app.models.predictor import HeartDiseasePredictor
+from app.services.batcher import MicroBatcher
+from app.services.executor import InferenceExecutor
+from app.services.jobs import JobQueue, JobStore
+from app.services.metrics import MetricsMiddleware, metrics
+from app.services.reloader import ModelDirectoryWatcher
 from app.controllers.prediction_controller import router as prediction_router
 from app.controllers.health_controller import router as health_router
+from app.controllers.admin_controller import router as admin_router
+from app.controllers.job_controller import router as job_router
+
+def _service_metrics(app: FastAPI):
+    """Read the statistics the services already keep, at scrape time"""
+    predictor = app.state.predictor
+    model_set = predictor.model_set
+    yield ("heart_model_set_version", "gauge", "Version of the active model set",
+           [("heart_model_set_version", {}, model_set.version)])
+    yield ("heart_models_loaded", "gauge", "Models loaded in the active model set",
+           [("heart_models_loaded", {}, len(model_set.models))])
+
+    executor = app.state.executor.stats()
+    yield ("heart_inference_in_flight", "gauge", "Inference jobs running or queued",
+           [("heart_inference_in_flight", {}, executor["in_flight"])])
+    yield ("heart_inference_rejected_total", "counter", "Inference jobs rejected because the queue was full",
+           [("heart_inference_rejected_total", {}, executor["rejected"])])
+
+    jobs = app.state.jobs.stats()
+    yield ("heart_job_chunks_in_flight", "gauge", "Job chunks being scored by the worker pool",
+           [("heart_job_chunks_in_flight", {}, jobs["in_flight"])])
+    yield ("heart_job_chunks_total", "counter", "Job chunks scored by result",
+           [("heart_job_chunks_total", {"result": "done"}, jobs["chunks_done"]),
+            ("heart_job_chunks_total", {"result": "failed"}, jobs["chunks_failed"])])
+    yield ("heart_job_rows_total", "counter", "Job rows scored",
+           [("heart_job_rows_total", {}, jobs["rows_done"])])
+
+    # The batcher keeps per-bucket counts, the exposition format wants cumulative ones
+    batching = app.state.batcher.stats()
+    samples, cumulative = [], 0
+    for bound, count in batching["batch_size_histogram"].items():
+        cumulative += count
+        samples.append(("heart_batch_size_bucket", {"le": bound}, cumulative))
+    samples.append(("heart_batch_size_bucket", {"le": "+Inf"}, batching["batches"]))
+    samples.append(("heart_batch_size_sum", {}, batching["rows"]))
+    samples.append(("heart_batch_size_count", {}, batching["batches"]))
+    yield ("heart_batch_size", "histogram", "Rows per /predict_all micro-batch", samples)
+
+    if predictor.cache is not None:
+        cache = predictor.cache.stats()
+        yield ("heart_cache_entries", "gauge", "Entries in the prediction cache",
+               [("heart_cache_entries", {}, cache["size"])])
+        yield ("heart_cache_lookups_total", "counter", "Prediction cache lookups by result",
+               [("heart_cache_lookups_total", {"result": "hit"}, cache["hits"]),
+                ("heart_cache_lookups_total", {"result": "miss"}, cache["misses"])])
+        yield ("heart_cache_evictions_total", "counter", "Prediction cache entries evicted",
+               [("heart_cache_evictions_total", {}, cache["evictions"])])
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Load the models once per process and share them with every router
+    app.state.predictor = HeartDiseasePredictor(settings.models_dir)
+    app.state.executor = InferenceExecutor(settings.inference_workers, settings.inference_queue_size)
+    app.state.batcher = MicroBatcher(
+        app.state.predictor.predict_batch_with_all_models,
+        app.state.executor,
+        max_batch_size=settings.batch_max_size,
+        max_wait_ms=settings.batch_window_ms
+    )
+    # Score submitted jobs in worker processes, picking up the chunks a previous run left behind
+    app.state.jobs = JobQueue(
+        JobStore(settings.job_db),
+        app.state.predictor,
+        workers=settings.job_workers,
+        chunk_size=settings.job_chunk_size,
+        retention=settings.job_retention
+    )
+    app.state.jobs.start()
+    # Hot reload the models when generate_model_pickles.py writes new ones
+    watcher = None
+    if settings.reload_interval > 0:
+        watcher = ModelDirectoryWatcher(app.state.predictor, settings.reload_interval)
+        watcher.start()
+    metrics.register_collector(lambda: _service_metrics(app))
+    yield
+    metrics.clear_collectors()
+    if watcher is not None:
+        watcher.stop()
+    app.state.jobs.stop()
+    app.state.executor.shutdown()
 
 # Create FastAPI app
 app = FastAPI(
     title="Cardiovascular Heart Disease Prediction API",
     description="API for predicting heart disease risk based on patient data using multiple ML models",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Configure CORS
@@ -19,10 +109,23 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Count and time every request by route
+app.add_middleware(MetricsMiddleware, registry=metrics)
+
 # Include routers
 app.include_router(prediction_router)
 app.include_router(health_router)
+app.include_router(admin_router)
+app.include_router(job_router)
 
 @app.get("/")
 async def root():
     return {"message": "Welcome to the Cardiovascular Heart Disease Prediction API"}
+
+@app.get("/metrics", response_class=PlainTextResponse, summary="Prometheus metrics")
+async def metrics_endpoint() -> PlainTextResponse:
+    """
+    Request, stage and per-model latency histograms, error counters and
+    cache, batching, inference executor and job worker statistics in the Prometheus text format
+    """
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
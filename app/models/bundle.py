@@ -0,0 +1,150 @@
+"""
+Single-file model bundle
+
+A bundle holds a manifest, both scalers, every model and their precomputed
+inference engines in one uncompressed joblib file. joblib writes NumPy arrays
+as raw buffers, so loading with mmap_mode='r' maps them straight from the file.
+Workers that load the same bundle then share those pages through the OS page
+cache instead of keeping private copies of the flattened random forest buffers
+and the KNN training matrices.
+
+Usage:
+    python -m app.models.bundle [pickles_dir] [bundle_path]
+"""
+
+import os
+import pickle
+import sys
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional, Tuple
+
+import joblib
+import sklearn
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.neighbors import KNeighborsClassifier
+
+from app.models.forest import FlatForest
+from app.models.neighbors import FlatKNN
+
+BUNDLE_FILENAME = 'model_bundle.joblib'
+BUNDLE_FORMAT = 'heart-disease-model-bundle'
+BUNDLE_FORMAT_VERSION = 1
+
+def build_engines(models: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Precompute the array-backed inference engines for the supported models
+    
+    Args:
+        models: Dictionary of fitted models keyed by model name
+        
+    Returns:
+        Dictionary of engines keyed by model name
+    """
+    engines = {}
+    for model_key, model in models.items():
+        if isinstance(model, RandomForestClassifier):
+            engines[model_key] = FlatForest(model)
+        elif isinstance(model, KNeighborsClassifier):
+            try:
+                engines[model_key] = FlatKNN(model)
+            except ValueError:
+                pass
+    return engines
+
+def write_bundle(path: str, scalers: Dict[str, Any], models: Dict[str, Any],
+                 metadata: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Write scalers, models and their engines to a single bundle file
+    
+    Args:
+        path: Destination file
+        scalers: Dictionary of fitted scalers
+        models: Dictionary of fitted models keyed by model name
+        metadata: Extra information stored in the manifest
+        
+    Returns:
+        The manifest written to the bundle
+    """
+    engines = build_engines(models)
+    manifest = {
+        "format": BUNDLE_FORMAT,
+        "format_version": BUNDLE_FORMAT_VERSION,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "sklearn_version": sklearn.__version__,
+        "scalers": sorted(scalers),
+        "models": list(models),
+        "engines": {model_key: type(engine).__name__ for model_key, engine in engines.items()},
+        **(metadata or {})
+    }
+    
+    # Write next to the destination and rename, so readers never see a partial file
+    temporary_path = f"{path}.tmp"
+    joblib.dump({"manifest": manifest, "scalers": scalers, "models": models, "engines": engines}, temporary_path)
+    os.replace(temporary_path, path)
+    return manifest
+
+def read_bundle(path: str, mmap: bool = True) -> Dict[str, Any]:
+    """
+    Load a bundle, memory-mapping its arrays
+    
+    Args:
+        path: Bundle file
+        mmap: Map arrays read-only from the file instead of reading them into memory
+        
+    Returns:
+        Dictionary with 'manifest', 'scalers', 'models' and 'engines'
+        
+    Raises:
+        ValueError: If the file is not a supported bundle
+    """
+    bundle = joblib.load(path, mmap_mode='r' if mmap else None)
+    manifest = bundle.get("manifest", {}) if isinstance(bundle, dict) else {}
+    if manifest.get("format") != BUNDLE_FORMAT:
+        raise ValueError(f"{path} is not a model bundle")
+    if manifest.get("format_version") != BUNDLE_FORMAT_VERSION:
+        raise ValueError(f"Unsupported model bundle version {manifest.get('format_version')}")
+    return bundle
+
+def read_pickles(pickles_dir: str) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """
+    Unpickle the scalers and every model of a directory of per-model pickles
+    
+    Args:
+        pickles_dir: Directory with the scaler and model pickle files
+        
+    Returns:
+        Tuple of (scalers, models keyed by model name)
+    """
+    scalers, models = {}, {}
+    for scaler_key, filename in (('standard', 'standard_scaler.pkl'), ('minmax', 'minmax_scaler.pkl')):
+        with open(os.path.join(pickles_dir, filename), 'rb') as file:
+            scalers[scaler_key] = pickle.load(file)
+    
+    for model_type in ['knn', 'logistic_regression', 'naive_bayes', 'random_forest']:
+        for scaling in ['scaled', 'normalized']:
+            model_path = os.path.join(pickles_dir, f"{model_type}_model_{scaling}.pkl")
+            if os.path.exists(model_path):
+                with open(model_path, 'rb') as file:
+                    models[f"{model_type}_{scaling}"] = pickle.load(file)
+    
+    return scalers, models
+
+def bundle_from_pickles(pickles_dir: str, path: str) -> Dict[str, Any]:
+    """
+    Convert a directory of per-model pickles into a bundle
+    
+    Args:
+        pickles_dir: Directory with the scaler and model pickle files
+        path: Destination bundle file
+        
+    Returns:
+        The manifest written to the bundle
+    """
+    scalers, models = read_pickles(pickles_dir)
+    return write_bundle(path, scalers, models)
+
+if __name__ == "__main__":
+    source = sys.argv[1] if len(sys.argv) > 1 else 'pickles'
+    destination = sys.argv[2] if len(sys.argv) > 2 else os.path.join(source, BUNDLE_FILENAME)
+    manifest = bundle_from_pickles(source, destination)
+    print(f"Wrote {destination} with models: {', '.join(manifest['models'])}")
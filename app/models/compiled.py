@@ -0,0 +1,182 @@
+import numpy as np
+from typing import Any, Dict, List, Optional, Tuple
+from scipy.special import expit, logsumexp
+from sklearn.linear_model import LogisticRegression
+from sklearn.naive_bayes import GaussianNB
+from sklearn.preprocessing import MinMaxScaler, StandardScaler
+
+class CompiledEnsemble:
+    """
+    Closed-form evaluation of the scalers and the linear and naive Bayes models
+
+    The parameters of both scalers, binary LogisticRegression models and GaussianNB
+    models are extracted into plain NumPy arrays at load time. Both scalings are then
+    produced by one affine transform, and every compiled model is evaluated by the
+    same pair of matrix products, without sklearn's per-call input validation.
+
+    GaussianNB's joint log-likelihood is quadratic in the features:
+        jll_c = log(prior_c) - 0.5 * sum(log(2 * pi * var_c)) - 0.5 * sum((x - theta_c)^2 / var_c)
+    so it expands into a linear term, a squared term and a constant, which is
+    what lets it share the matrix products with the logistic regression logits.
+    """
+
+    # Precision of the model parameters and of the scaled features they are applied to,
+    # the scalers themselves always run in float64
+    DTYPE = np.float64
+
+    def __init__(self, scalers: Dict[str, Any], models: Dict[str, Any]):
+        """
+        Extract the closed-form parameters of the supported scalers and models
+
+        Args:
+            scalers: Dictionary with fitted 'standard' and 'minmax' scalers
+            models: Dictionary of fitted models keyed by model name
+
+        Raises:
+            ValueError: If the scalers are not a StandardScaler and MinMaxScaler
+        """
+        standard, minmax = scalers.get('standard'), scalers.get('minmax')
+        if not isinstance(standard, StandardScaler) or not isinstance(minmax, MinMaxScaler):
+            raise ValueError("Compiled ensemble requires a StandardScaler and a MinMaxScaler")
+
+        self.n_features = standard.n_features_in_
+        self._scale, self._shift = self._compile_scalers(standard, minmax)
+        self._clip_range = minmax.feature_range if minmax.clip else None
+
+        # Column layout of the fused kernel: (model_key, kind, first column, classes)
+        self._layout: List[Tuple[str, str, int, np.ndarray]] = []
+        linear_columns, quadratic_columns, biases = [], [], []
+
+        for model_key, model in models.items():
+            offset = 0 if '_scaled' in model_key else self.n_features
+            column = len(biases)
+
+            if type(model) is LogisticRegression and len(model.classes_) == 2:
+                linear, quadratic, bias = self._compile_logistic_regression(model, offset)
+                kind = 'logistic_regression'
+            elif type(model) is GaussianNB:
+                linear, quadratic, bias = self._compile_naive_bayes(model, offset)
+                kind = 'naive_bayes'
+            else:
+                continue
+
+            self._layout.append((model_key, kind, column, model.classes_))
+            linear_columns.extend(linear)
+            quadratic_columns.extend(quadratic)
+            biases.extend(bias)
+
+        width = 2 * self.n_features
+        self._linear = (np.column_stack(linear_columns) if linear_columns else np.zeros((width, 0))).astype(self.DTYPE)
+        self._quadratic = (np.column_stack(quadratic_columns) if quadratic_columns else np.zeros((width, 0))).astype(self.DTYPE)
+        self._bias = np.asarray(biases, dtype=self.DTYPE)
+        self.model_keys = [model_key for model_key, _, _, _ in self._layout]
+
+    @staticmethod
+    def _compile_scalers(standard: StandardScaler, minmax: MinMaxScaler) -> Tuple[np.ndarray, np.ndarray]:
+        """Fold both scalers into one affine transform over the stacked feature copies"""
+        standard_scale = 1.0 / standard.scale_ if standard.with_std else np.ones(standard.n_features_in_)
+        standard_mean = standard.mean_ if standard.with_mean else np.zeros(standard.n_features_in_)
+
+        scale = np.concatenate([standard_scale, minmax.scale_])
+        shift = np.concatenate([-standard_mean * standard_scale, minmax.min_])
+        return scale, shift
+
+    def _block(self, values: np.ndarray, offset: int) -> np.ndarray:
+        """Place per-feature weights into the half of the stacked features a model reads"""
+        column = np.zeros(2 * self.n_features)
+        column[offset:offset + self.n_features] = values
+        return column
+
+    def _compile_logistic_regression(self, model: LogisticRegression, offset: int) -> Tuple[list, list, list]:
+        """Extract the logit of a binary logistic regression"""
+        linear = [self._block(model.coef_[0], offset)]
+        quadratic = [np.zeros(2 * self.n_features)]
+        bias = [float(model.intercept_[0])]
+        return linear, quadratic, bias
+
+    def _compile_naive_bayes(self, model: GaussianNB, offset: int) -> Tuple[list, list, list]:
+        """Expand the Gaussian joint log-likelihood of every class into linear, squared and constant terms"""
+        linear, quadratic, bias = [], [], []
+        for theta, var, prior in zip(model.theta_, model.var_, model.class_prior_):
+            linear.append(self._block(theta / var, offset))
+            quadratic.append(self._block(-0.5 / var, offset))
+            bias.append(float(
+                np.log(prior) - 0.5 * np.sum(np.log(2.0 * np.pi * var)) - 0.5 * np.sum(theta ** 2 / var)
+            ))
+        return linear, quadratic, bias
+
+    def transform(self, features: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Apply both scalers in one affine transform
+
+        Args:
+            features: 2D array of shape (n_patients, n_features)
+
+        Returns:
+            Tuple of (standard scaled features, min-max normalized features)
+        """
+        stacked = self._stack(features)
+        return stacked[:, :self.n_features], stacked[:, self.n_features:]
+
+    def _stack(self, features: np.ndarray) -> np.ndarray:
+        """Scale two side-by-side copies of the features, standard then min-max"""
+        features = np.asarray(features, dtype=np.float64)
+        stacked = np.tile(features, 2)
+        stacked *= self._scale
+        stacked += self._shift
+        if self._clip_range is not None:
+            np.clip(stacked[:, self.n_features:], self._clip_range[0], self._clip_range[1],
+                    out=stacked[:, self.n_features:])
+        return stacked.astype(self.DTYPE, copy=False)
+
+    def predict_proba_all(self, features_scaled: np.ndarray, features_normalized: np.ndarray) -> Dict[str, np.ndarray]:
+        """
+        Compute class probabilities of every compiled model
+
+        Args:
+            features_scaled: Standard scaled features
+            features_normalized: Min-max normalized features
+
+        Returns:
+            Dictionary of probability matrices keyed by model name
+        """
+        stacked = np.hstack([features_scaled, features_normalized])
+        scores = stacked @ self._linear + (stacked * stacked) @ self._quadratic + self._bias
+        return {
+            model_key: self._probabilities(kind, scores, column, classes)
+            for model_key, kind, column, classes in self._layout
+        }
+
+    def predict_proba(self, model_key: str, transformed_features: np.ndarray) -> Optional[np.ndarray]:
+        """
+        Compute class probabilities of a single compiled model
+
+        Args:
+            model_key: Name of the model
+            transformed_features: Features scaled the way the model expects
+
+        Returns:
+            Probability matrix, or None if the model is not compiled
+        """
+        for key, kind, column, classes in self._layout:
+            if key != model_key:
+                continue
+            offset = 0 if '_scaled' in model_key else self.n_features
+            width = 1 if kind == 'logistic_regression' else len(classes)
+            linear = self._linear[offset:offset + self.n_features, column:column + width]
+            quadratic = self._quadratic[offset:offset + self.n_features, column:column + width]
+            scores = (transformed_features @ linear
+                      + (transformed_features * transformed_features) @ quadratic
+                      + self._bias[column:column + width])
+            return self._probabilities(kind, scores, 0, classes)
+        return None
+
+    @staticmethod
+    def _probabilities(kind: str, scores: np.ndarray, column: int, classes: np.ndarray) -> np.ndarray:
+        """Turn raw logits or joint log-likelihoods into class probabilities"""
+        if kind == 'logistic_regression':
+            positive = expit(scores[:, column])
+            return np.column_stack([1.0 - positive, positive])
+
+        jll = scores[:, column:column + len(classes)]
+        return np.exp(jll - logsumexp(jll, axis=1, keepdims=True))
@@ -0,0 +1,107 @@
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+
+class FlatForest:
+    """
+    Array-backed random forest evaluator
+
+    The nodes of every tree are concatenated into contiguous NumPy buffers at load
+    time. Rows are evaluated for all trees at once, one tree level per step, which
+    avoids sklearn's per-call validation and joblib dispatch across the trees.
+    Leaves point back to themselves, so rows that reach a leaf early simply stay there.
+    """
+
+    # Rows evaluated per step, bounding the (rows x trees) node index matrix
+    CHUNK_SIZE = 4096
+
+    # Largest batch worth evaluating here, sklearn's compiled per-tree traversal
+    # overtakes the level-by-level gathers at about 400-500 rows
+    MAX_BATCH_ROWS = 384
+
+    def __init__(self, model: RandomForestClassifier):
+        """
+        Flatten the trees of a fitted random forest
+
+        Args:
+            model: Fitted RandomForestClassifier
+        """
+        trees = [estimator.tree_ for estimator in model.estimators_]
+        node_counts = np.array([tree.node_count for tree in trees])
+        offsets = np.concatenate([[0], np.cumsum(node_counts)[:-1]])
+
+        features, thresholds, lefts, rights, values = [], [], [], [], []
+        for tree, offset in zip(trees, offsets):
+            node_ids = np.arange(tree.node_count) + offset
+            is_leaf = tree.children_left == -1
+
+            features.append(np.where(is_leaf, 0, tree.feature))
+            thresholds.append(tree.threshold)
+            lefts.append(np.where(is_leaf, node_ids, tree.children_left + offset))
+            rights.append(np.where(is_leaf, node_ids, tree.children_right + offset))
+
+            # Normalize leaf values into class fractions the way DecisionTreeClassifier does
+            value = tree.value[:, 0, :model.n_classes_].astype(np.float64)
+            normalizer = value.sum(axis=1, keepdims=True)
+            normalizer[normalizer == 0.0] = 1.0
+            values.append(value / normalizer)
+
+        self.feature = np.ascontiguousarray(np.concatenate(features), dtype=np.intp)
+        self.threshold = np.ascontiguousarray(np.concatenate(thresholds), dtype=np.float64)
+        self.left = np.ascontiguousarray(np.concatenate(lefts), dtype=np.intp)
+        self.right = np.ascontiguousarray(np.concatenate(rights), dtype=np.intp)
+        self.value = np.ascontiguousarray(np.concatenate(values))
+        self.roots = offsets.astype(np.intp)
+        self.depth = max(tree.max_depth for tree in trees)
+        self.classes_ = model.classes_
+        self.n_features_in_ = model.n_features_in_
+
+    def __setstate__(self, state: dict) -> None:
+        # Arrays memory-mapped from a model bundle are viewed as plain ndarrays,
+        # which keeps the shared pages but avoids np.memmap overhead on every operation
+        self.__dict__.update({
+            name: np.asarray(value) if isinstance(value, np.ndarray) else value
+            for name, value in state.items()
+        })
+
+    def predict_proba(self, features: np.ndarray) -> np.ndarray:
+        """
+        Compute class probabilities averaged over all trees
+
+        Args:
+            features: 2D array of shape (n_rows, n_features)
+
+        Returns:
+            Probability matrix of shape (n_rows, n_classes)
+        """
+        # sklearn trees compare float32 inputs against float64 thresholds
+        features = np.asarray(features, dtype=np.float32)
+        if len(features) <= self.CHUNK_SIZE:
+            return self._predict_proba_chunk(features)
+
+        return np.vstack([
+            self._predict_proba_chunk(features[start:start + self.CHUNK_SIZE])
+            for start in range(0, len(features), self.CHUNK_SIZE)
+        ])
+
+    def _predict_proba_chunk(self, features: np.ndarray) -> np.ndarray:
+        """Walk all trees level by level for a chunk of rows"""
+        rows = np.arange(len(features))[:, None]
+        nodes = np.broadcast_to(self.roots, (len(features), len(self.roots)))
+
+        for _ in range(self.depth):
+            go_left = features[rows, self.feature[nodes]] <= self.threshold[nodes]
+            nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+
+        return self.value[nodes].mean(axis=1)
+
+    def predict(self, features: np.ndarray) -> np.ndarray:
+        """
+        Predict class labels
+
+        Args:
+            features: 2D array of shape (n_rows, n_features)
+
+        Returns:
+            Array of predicted labels
+        """
+        return self.classes_[self.predict_proba(features).argmax(axis=1)]
@@ -0,0 +1,403 @@
+import pickle
+import numpy as np
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+from app.config import settings
+from app.models.bundle import BUNDLE_FILENAME, read_bundle
+from app.models.compiled import CompiledEnsemble
+from app.models.forest import FlatForest
+from app.models.neighbors import FlatKNN
+from app.models.quantized import QuantizedEnsemble, model_digests, quantization_refusal, quantize_model, read_report
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.neighbors import KNeighborsClassifier
+
+class ModelSetValidationError(Exception):
+    """
+    Raised when a newly loaded model set fails its smoke prediction
+    """
+
+class ReloadInProgressError(Exception):
+    """
+    Raised when a model reload is requested while another one is running
+    """
+
+class ModelSet:
+    """
+    One loaded generation of scalers, models and inference engines
+    
+    A model set is never modified once it is fully loaded, so a predictor can
+    replace its active set with a single reference assignment while requests
+    that already hold the previous set finish on it.
+    """
+    
+    # Model families and scalings, in the order predictions are reported
+    MODEL_TYPES = ['knn', 'logistic_regression', 'naive_bayes', 'random_forest']
+    SCALING_METHODS = ['scaled', 'normalized']
+    
+    def __init__(self, models_dir: str, version: int, load_mode: str = 'eager', warm: bool = False,
+                 compiled: bool = False, flat_forest: bool = False, flat_knn: bool = False,
+                 quantized: bool = False):
+        """
+        Describe a model set without loading it yet
+        
+        Args:
+            models_dir: Directory containing the model pickle files or bundle
+            version: Version number of this model set, part of every cache key
+            load_mode: 'eager', 'parallel', 'background' or 'lazy'
+            warm: Run a dummy prediction through every model once it is loaded,
+                and record the time of a second one in model_costs
+            compiled: Evaluate the scalers and the linear and naive Bayes models
+                with the compiled ensemble
+            flat_forest: Evaluate random forests with the array-backed engine
+            flat_knn: Evaluate KNN models with the precomputed neighbour index
+            quantized: Evaluate every supported model with the quantized engines,
+                if the drift report of the models allows it
+        """
+        if load_mode not in ('eager', 'parallel', 'background', 'lazy'):
+            raise ValueError("Load mode must be 'eager', 'parallel', 'background' or 'lazy'")
+        
+        self.models_dir = models_dir
+        self.version = version
+        self.load_mode = load_mode
+        self.warm_models = warm
+        self.use_compiled = compiled
+        self.use_flat_forest = flat_forest
+        self.use_flat_knn = flat_knn
+        self.use_quantized = quantized
+        self.models = {}
+        self.scalers = {}
+        self.compiled = None
+        self._compiled_count = 0
+        # Alternative inference engines used in place of the matching sklearn models
+        self.engines = {}
+        # Single-row latency of every loaded model on the dummy patient, in seconds
+        self.model_costs = {}
+        # Loading state of every known model: pending, loading, loaded, missing or error
+        self.model_status = {}
+        self._model_paths = {}
+        self._loading = {}
+        # Manifest of the model bundle the models were loaded from, if any
+        self.bundle_manifest = None
+        # Why quantized mode was requested but not activated, if it was
+        self.quantization_refusal = None
+        self.source = models_dir
+        self.loaded_at = None
+        self._load_lock = threading.Lock()
+        self._ready = threading.Event()
+    
+    def compile(self) -> None:
+        """Extract closed-form parameters of the scalers and supported models"""
+        try:
+            models = dict(self.models)
+            ensemble_class = QuantizedEnsemble if self.use_quantized else CompiledEnsemble
+            self.compiled = ensemble_class(self.scalers, models)
+            self._compiled_count = len(models)
+            print(f"Compiled models: {', '.join(self.compiled.model_keys)}")
+        except ValueError as e:
+            print(f"Error compiling ensemble: {e}")
+            self.compiled = None
+    
+    def flatten_forests(self) -> None:
+        """Build array-backed engines for all loaded random forest models"""
+        for model_key, model in list(self.models.items()):
+            if isinstance(model, RandomForestClassifier):
+                self.engines[model_key] = FlatForest(model)
+                print(f"Flattened {model_key}")
+    
+    def index_neighbors(self, index: str = 'auto') -> None:
+        """
+        Build precomputed neighbour indexes for all loaded KNN models
+        
+        Args:
+            index: 'brute', 'tree' or 'auto' search strategy
+        """
+        for model_key, model in list(self.models.items()):
+            if isinstance(model, KNeighborsClassifier):
+                try:
+                    self.engines[model_key] = FlatKNN(model, index)
+                    print(f"Indexed {model_key} ({self.engines[model_key].index})")
+                except ValueError as e:
+                    print(f"Error indexing {model_key}: {e}")
+    
+    def load(self) -> None:
+        """
+        Load all available models and scalers from the models directory
+        
+        Scalers are always loaded immediately. Models are loaded according to
+        the load mode, and available_models lists them before they are loaded.
+        A model bundle, when enabled with HEART_MODEL_FORMAT, is memory-mapped
+        in one step regardless of the load mode.
+        """
+        bundle_path = self._bundle_path()
+        if bundle_path is not None:
+            self._load_bundle(bundle_path)
+            return
+        
+        # Load scalers
+        try:
+            with open(os.path.join(self.models_dir, 'standard_scaler.pkl'), 'rb') as file:
+                self.scalers['standard'] = pickle.load(file)
+            
+            with open(os.path.join(self.models_dir, 'minmax_scaler.pkl'), 'rb') as file:
+                self.scalers['minmax'] = pickle.load(file)
+        except FileNotFoundError as e:
+            print(f"Error loading scalers: {e}")
+        
+        # Find all available models
+        for model_type in self.MODEL_TYPES:
+            for scaling in self.SCALING_METHODS:
+                model_path = os.path.join(self.models_dir, f"{model_type}_model_{scaling}.pkl")
+                model_key = f"{model_type}_{scaling}"
+                
+                if os.path.exists(model_path):
+                    self._model_paths[model_key] = model_path
+                    self.model_status[model_key] = "pending"
+                else:
+                    self.model_status[model_key] = "missing"
+                    print(f"Model {model_path} not found")
+        
+        if self.use_quantized:
+            self._check_quantization(read_report(self.models_dir), model_digests(self._model_paths))
+        
+        pending = [model_key for model_key, status in self.model_status.items() if status == "pending"]
+        
+        if self.load_mode == 'lazy':
+            return
+        
+        if self.load_mode == 'eager':
+            for model_key in pending:
+                self._load_model(model_key)
+            self._finish_loading()
+            return
+        
+        # Unpickling is mostly I/O and C code, so models load well in parallel threads
+        pool = ThreadPoolExecutor(max_workers=settings.load_workers, thread_name_prefix="model-loader")
+        self._loading = {model_key: pool.submit(self._load_model, model_key) for model_key in pending}
+        pool.shutdown(wait=False)
+        
+        if self.load_mode == 'parallel':
+            self._finish_loading()
+        else:  # 'background'
+            threading.Thread(target=self._finish_loading, name="model-warmup", daemon=True).start()
+    
+    def _bundle_path(self) -> Optional[str]:
+        """Resolve the model bundle to load, or None to load the per-model pickles"""
+        if settings.model_format == 'pickle':
+            return None
+        
+        bundle_path = settings.bundle_path or os.path.join(self.models_dir, BUNDLE_FILENAME)
+        if os.path.exists(bundle_path):
+            return bundle_path
+        if settings.model_format == 'bundle':
+            raise FileNotFoundError(f"Model bundle {bundle_path} not found")
+        return None
+    
+    def _load_bundle(self, bundle_path: str) -> None:
+        """Memory-map scalers, models and precomputed engines from a model bundle"""
+        if self.load_mode != 'eager':
+            print(f"Load mode '{self.load_mode}' does not apply to a model bundle, loading every model from {bundle_path}")
+        bundle = read_bundle(bundle_path, mmap=settings.bundle_mmap)
+        self.bundle_manifest = bundle["manifest"]
+        self.source = bundle_path
+        self.scalers.update(bundle["scalers"])
+        if self.use_quantized:
+            self._check_quantization(self.bundle_manifest.get("quantization"))
+        
+        for model_type in self.MODEL_TYPES:
+            for scaling in self.SCALING_METHODS:
+                model_key = f"{model_type}_{scaling}"
+                model = bundle["models"].get(model_key)
+                if model is None:
+                    self.model_status[model_key] = "missing"
+                    print(f"Model {model_key} not found in {bundle_path}")
+                    continue
+                self._install_model(model_key, model, bundle["engines"].get(model_key))
+                print(f"Loaded {model_key} from bundle")
+        
+        self._finish_loading()
+    
+    def _check_quantization(self, report: Optional[Dict[str, Any]], digests: Optional[Dict[str, str]] = None) -> None:
+        """
+        Fall back to the float64 engines unless the drift report allows quantized mode
+        
+        Args:
+            report: Drift report of the models, if any
+            digests: Digests of the model files the report must match, None for a bundle
+        """
+        self.quantization_refusal = quantization_refusal(report, settings.quantized_max_drift, digests)
+        if self.quantization_refusal is not None:
+            print(f"Quantized mode refused: {self.quantization_refusal}")
+            self.use_quantized = False
+        else:
+            print(f"Quantized mode active, label drift {report['max_drift']:.2%} on {report['rows']} held-out rows")
+    
+    def _load_model(self, model_key: str) -> None:
+        """Unpickle one model and build its alternative inference engine"""
+        self.model_status[model_key] = "loading"
+        try:
+            with open(self._model_paths[model_key], 'rb') as file:
+                model = pickle.load(file)
+            
+            self._install_model(model_key, model)
+            print(f"Loaded {model_key}")
+        except Exception as e:
+            self.model_status[model_key] = "error"
+            print(f"Error loading model {model_key}: {e}")
+    
+    def _install_model(self, model_key: str, model: Any, engine: Any = None) -> None:
+        """
+        Make a loaded model available for predictions
+        
+        Args:
+            model_key: Name of the model
+            model: Fitted estimator
+            engine: Precomputed inference engine for the model, if any
+        """
+        if self.use_quantized:
+            engine = quantize_model(model)
+            if engine is not None:
+                self.engines[model_key] = engine
+        elif self.use_flat_forest and isinstance(model, RandomForestClassifier):
+            self.engines[model_key] = engine if isinstance(engine, FlatForest) else FlatForest(model)
+        elif self.use_flat_knn and isinstance(model, KNeighborsClassifier):
+            if isinstance(engine, FlatKNN) and settings.knn_index in ('auto', engine.index):
+                self.engines[model_key] = engine
+            else:
+                try:
+                    self.engines[model_key] = FlatKNN(model, settings.knn_index)
+                except ValueError as e:
+                    print(f"Error indexing {model_key}: {e}")
+        
+        # Time the model while it loads, so fast consensus can report the latency
+        # of the models it skips without timing them inside a request
+        if self.warm_models:
+            self._profile_model(model_key, model)
+        
+        self.models[model_key] = model
+        self.model_status[model_key] = "loaded"
+    
+    def _finish_loading(self) -> None:
+        """Wait for every model, then compile the loaded model set"""
+        self.ensure_loaded(list(self._model_paths))
+        self.loaded_at = time.time()
+        self._ready.set()
+    
+    def ensure_loaded(self, model_keys: List[str]) -> None:
+        """
+        Make sure the given models are loaded before they are used
+        
+        Waits for models that are loading in the background and unpickles
+        lazily loaded models on first use.
+        
+        Args:
+            model_keys: Names of the models that are about to be used
+        """
+        for model_key in model_keys:
+            future = self._loading.get(model_key)
+            if future is not None:
+                future.result()
+            elif self.model_status.get(model_key) == "pending":
+                with self._load_lock:
+                    if self.model_status.get(model_key) == "pending":
+                        self._load_model(model_key)
+        
+        # Recompile whenever more models have been loaded since the last compile
+        if (self.use_compiled or self.use_quantized) and self._compiled_count != len(self.models):
+            with self._load_lock:
+                if self._compiled_count != len(self.models):
+                    self.compile()
+    
+    def warm(self) -> None:
+        """
+        Run a dummy prediction through every model so the first real request
+        does not pay one-time initialization costs
+        """
+        self.ensure_loaded(list(self._model_paths))
+        for model_key, model in list(self.models.items()):
+            self._profile_model(model_key, model)
+    
+    def dummy_features(self) -> Optional[np.ndarray]:
+        """
+        Build a dummy patient, the training mean of every feature
+        
+        Returns:
+            2D array with a single row, or None if the standard scaler is missing
+        """
+        dummy = getattr(self.scalers.get('standard'), 'mean_', None)
+        if dummy is None:
+            return None
+        return np.asarray(dummy, dtype=np.float64).reshape(1, -1)
+    
+    def _profile_model(self, model_key: str, model: Any) -> None:
+        """Warm one model with the dummy patient, then record how long a second, warm run takes"""
+        if not self._warm_model(model_key, model):
+            return
+        start = time.perf_counter()
+        if self._warm_model(model_key, model):
+            self.model_costs[model_key] = time.perf_counter() - start
+    
+    def _warm_model(self, model_key: str, model: Any) -> bool:
+        """
+        Run the dummy patient through one model
+        
+        Returns:
+            True if the prediction ran
+        """
+        scaler = self.scalers.get('standard' if '_scaled' in model_key else 'minmax')
+        dummy = self.dummy_features()
+        if scaler is None or dummy is None:
+            return False
+        try:
+            engine = self.engines.get(model_key, model)
+            transformed_features = scaler.transform(dummy)
+            if hasattr(engine, "predict_proba"):
+                engine.predict_proba(transformed_features)
+            else:
+                engine.predict(transformed_features)
+            return True
+        except Exception as e:
+            print(f"Error warming model {model_key}: {e}")
+            return False
+    
+    def is_ready(self) -> bool:
+        """
+        Check whether every model has finished loading (and warming, if enabled)
+        
+        Returns:
+            True when the model set can serve without waiting on a model load
+        """
+        if self.load_mode == 'lazy':
+            return all(status != "pending" and status != "loading" for status in self.model_status.values())
+        return self._ready.is_set()
+    
+    def available_models(self) -> List[str]:
+        """
+        Get a list of all available models, including those not loaded yet
+        
+        Returns:
+            List of model names
+        """
+        return [
+            model_key for model_key, status in self.model_status.items()
+            if status not in ("missing", "error")
+        ]
+    
+    def info(self) -> Dict[str, Any]:
+        """
+        Describe the model set for the health and model listing endpoints
+        
+        Returns:
+            Dictionary with the version, source, load time, model count and
+            whether the quantized engines are used
+        """
+        return {
+            "version": self.version,
+            "source": self.source,
+            "loaded_at": self.loaded_at,
+            "models_loaded": len(self.models),
+            "quantized": self.use_quantized,
+            "bundle_created_at": (self.bundle_manifest or {}).get("created_at")
+        }
@@ -0,0 +1,174 @@
+import numpy as np
+from typing import Tuple
+from sklearn.neighbors import KDTree, KNeighborsClassifier
+
+class FlatKNN:
+    """
+    Dedicated inference path for Euclidean KNeighborsClassifier models
+
+    The training matrix is kept as a contiguous float64 array together with its
+    squared row norms. In brute mode the squared distances of a whole batch come
+    from one matrix multiply, and argpartition picks a few candidates beyond k.
+    Their distances are then recomputed exactly and ordered by distance and
+    training index. Rows whose k-th and (k+1)-th distances tie are re-queried
+    through the model's own index, so tie-breaking matches sklearn.
+
+    For larger retrained datasets the engine can query a KD-tree instead.
+    """
+
+    # Training set size from which 'auto' switches from brute force to a KD-tree
+    TREE_THRESHOLD = 20000
+
+    # Rows evaluated per step, bounding the (rows x training rows) distance matrix
+    CHUNK_SIZE = 1024
+
+    # Candidates kept beyond k to absorb rounding in the matrix multiply distances
+    EXTRA_CANDIDATES = 4
+
+    # Precision of the stored training matrix and of the brute force distances
+    DTYPE = np.float64
+
+    # Relative and absolute gap under which the k-th and (k+1)-th distances count as tied
+    TIE_TOLERANCE = 1e-12
+
+    def __init__(self, model: KNeighborsClassifier, index: str = 'auto'):
+        """
+        Extract the training data of a fitted KNN classifier
+
+        Args:
+            model: Fitted KNeighborsClassifier using the Euclidean metric
+            index: 'brute' for matrix multiply search, 'tree' for a KD-tree,
+                or 'auto' to choose by training set size
+
+        Raises:
+            ValueError: If the model's metric, weights or index are not supported
+        """
+        metric = model.effective_metric_
+        if metric != 'euclidean' and not (metric == 'minkowski' and model.effective_metric_params_.get('p', 2) == 2):
+            raise ValueError(f"FlatKNN supports the Euclidean metric only, got '{metric}'")
+        if model.weights not in ('uniform', 'distance'):
+            raise ValueError(f"FlatKNN supports uniform or distance weights only, got '{model.weights}'")
+        if model.outputs_2d_:
+            raise ValueError("FlatKNN supports single-output classifiers only")
+        if index not in ('auto', 'brute', 'tree'):
+            raise ValueError("Index must be 'auto', 'brute' or 'tree'")
+
+        self.fit_X = np.ascontiguousarray(model._fit_X, dtype=self.DTYPE)
+        self.sq_norms = np.einsum('ij,ij->i', self.fit_X, self.fit_X)
+        self.y = np.ascontiguousarray(model._y, dtype=np.intp)
+        self.classes_ = model.classes_
+        self.n_neighbors = model.n_neighbors
+        self.weights = model.weights
+        self.n_features_in_ = model.n_features_in_
+        self._one_hot = np.eye(len(self.classes_))[self.y]
+
+        if index == 'auto':
+            index = 'tree' if len(self.fit_X) >= self.TREE_THRESHOLD else 'brute'
+        self.index = index
+
+        # Reuse the model's own tree when it has one so tie-breaking is identical
+        self._tree = getattr(model, '_tree', None)
+        if self._tree is None and index == 'tree':
+            self._tree = KDTree(self.fit_X, leaf_size=model.leaf_size)
+        self._model = model
+
+    def kneighbors(self, features: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Find the k nearest training rows
+
+        Args:
+            features: 2D array of shape (n_rows, n_features)
+
+        Returns:
+            Tuple of (distances, indices), each of shape (n_rows, k), nearest first
+        """
+        features = np.asarray(features, dtype=self.DTYPE)
+        if self.index == 'tree':
+            return self._tree.query(features, k=self.n_neighbors)
+
+        chunks = [
+            self._kneighbors_brute(features[start:start + self.CHUNK_SIZE])
+            for start in range(0, len(features), self.CHUNK_SIZE)
+        ]
+        if not chunks:
+            empty = np.empty((0, self.n_neighbors))
+            return empty, empty.astype(np.intp)
+        return np.vstack([d for d, _ in chunks]), np.vstack([i for _, i in chunks])
+
+    def _kneighbors_brute(self, features: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Matrix multiply search for one chunk of rows"""
+        k = self.n_neighbors
+        n_train = len(self.fit_X)
+        n_candidates = min(n_train, k + self.EXTRA_CANDIDATES)
+
+        # ||x - y||^2 = ||x||^2 - 2 x.y + ||y||^2, the ||x||^2 term does not change the ranking
+        approximate = self.sq_norms - 2.0 * (features @ self.fit_X.T)
+        if n_candidates < n_train:
+            candidates = np.argpartition(approximate, n_candidates - 1, axis=1)[:, :n_candidates]
+        else:
+            candidates = np.broadcast_to(np.arange(n_train), (len(features), n_train))
+
+        # Exact distances for the candidates, ordered by distance then training index
+        differences = self.fit_X[candidates] - features[:, None, :]
+        exact = np.einsum('ijk,ijk->ij', differences, differences)
+        order = np.lexsort((candidates, exact), axis=1)
+        exact = np.take_along_axis(exact, order, axis=1)
+        candidates = np.take_along_axis(candidates, order, axis=1)
+
+        distances = np.sqrt(exact[:, :k])
+        indices = np.ascontiguousarray(candidates[:, :k])
+
+        # Resolve ties at the k-th neighbour with the model's own search
+        if n_candidates > k:
+            ties = np.isclose(exact[:, k - 1], exact[:, k], rtol=self.TIE_TOLERANCE, atol=self.TIE_TOLERANCE)
+            if ties.any():
+                tie_distances, tie_indices = self._model.kneighbors(features[ties])
+                distances[ties] = tie_distances
+                indices[ties] = tie_indices
+
+        return distances, indices
+
+    def __setstate__(self, state: dict) -> None:
+        # Same as FlatForest: drop the np.memmap subclass but keep the mapped pages
+        self.__dict__.update({
+            name: np.asarray(value) if isinstance(value, np.ndarray) else value
+            for name, value in state.items()
+        })
+
+    def predict_proba(self, features: np.ndarray) -> np.ndarray:
+        """
+        Compute class probabilities from the nearest neighbours' votes
+
+        Args:
+            features: 2D array of shape (n_rows, n_features)
+
+        Returns:
+            Probability matrix of shape (n_rows, n_classes)
+        """
+        distances, indices = self.kneighbors(features)
+        votes = self._one_hot[indices]
+
+        if self.weights == 'distance':
+            # Like sklearn, exact matches take all the weight when present
+            with np.errstate(divide='ignore'):
+                weights = 1.0 / distances
+            exact_match = np.isinf(weights).any(axis=1)
+            weights[exact_match] = np.isinf(weights[exact_match]).astype(np.float64)
+            votes = votes * weights[:, :, None]
+
+        totals = votes.sum(axis=1)
+        normalizer = totals.sum(axis=1, keepdims=True)
+        normalizer[normalizer == 0.0] = 1.0
+        return totals / normalizer
+
+    def predict(self, features: np.ndarray) -> np.ndarray:
+        """
+        Predict class labels
+
+        Args:
+            features: 2D array of shape (n_rows, n_features)
+
+        Returns:
+            Array of predicted labels
+        """
+        return self.classes_[self.predict_proba(features).argmax(axis=1)]
@@ -1,110 +1,583 @@
-import pickle
 import numpy as np
-import os
-from typing import Dict, Tuple, Optional, Any, List
+import threading
+import time
+from typing import Callable, Dict, Tuple, Optional, Any, List
+from app.config import settings
+from app.models.model_set import ModelSet, ModelSetValidationError, ReloadInProgressError
+from app.services.cache import PredictionCache
+from app.services.metrics import metrics
 
 class HeartDiseasePredictor:
     """
     A class for loading and managing multiple heart disease prediction models
+    
+    The scalers, models and engines live in an immutable ModelSet. Every prediction
+    takes one reference to the active set, so reload can swap in a new set while
+    requests already in flight finish on the previous one.
     """
     
-    def __init__(self, models_dir: str = '/Users/shubhamkumar/Developer/cardiovascular-heart-disease-prediction-system/pickles'):
+    # Model families and scalings, in the order predictions are reported
+    MODEL_TYPES = ModelSet.MODEL_TYPES
+    SCALING_METHODS = ModelSet.SCALING_METHODS
+    
+    # Model families from the cheapest to the most expensive single-row prediction,
+    # the order in which fast consensus runs them
+    CONSENSUS_ORDER = ['logistic_regression', 'naive_bayes', 'knn', 'random_forest']
+    
+    def __init__(self, models_dir: Optional[str] = None, compiled: Optional[bool] = None,
+                 flat_forest: Optional[bool] = None, flat_knn: Optional[bool] = None,
+                 load_mode: Optional[str] = None, warm: Optional[bool] = None,
+                 ensemble_models: Optional[List[str]] = None, fast_consensus: Optional[bool] = None,
+                 quantized: Optional[bool] = None):
         """
         Initialize the predictor with models from the specified directory
         
         Args:
-            models_dir: Directory containing the model pickle files
+            models_dir: Directory containing the model pickle files,
+                defaults to the configured models directory
+            compiled: Evaluate the scalers and the linear and naive Bayes models
+                with the compiled ensemble, defaults to the configured mode
+            flat_forest: Evaluate random forests with the array-backed engine,
+                defaults to the configured mode
+            flat_knn: Evaluate KNN models with the precomputed neighbour index,
+                defaults to the configured mode
+            load_mode: 'eager' to unpickle models one after another, 'parallel' to
+                unpickle them concurrently, 'background' to unpickle them concurrently
+                without blocking, or 'lazy' to unpickle each model on first use,
+                defaults to the configured mode
+            warm: Run a dummy prediction through every model once it is loaded,
+                defaults to the configured setting. Fast consensus warms the models
+                as well, since it reports their latency
+            ensemble_models: Models taking part in the consensus of predict_with_all_models,
+                defaults to the configured ensemble or every available model
+            fast_consensus: Stop running models once the majority vote is settled,
+                defaults to the configured mode
+            quantized: Evaluate the models with the quantized engines when their drift
+                report allows it, defaults to the configured mode
         """
-        self.models_dir = models_dir
-        self.models = {}
-        self.scalers = {}
+        if (load_mode or settings.load_mode) not in ('eager', 'parallel', 'background', 'lazy'):
+            raise ValueError("Load mode must be 'eager', 'parallel', 'background' or 'lazy'")
+        
+        self.models_dir = models_dir or settings.models_dir
+        self.load_mode = load_mode or settings.load_mode
+        self.warm_models = settings.warm_models if warm is None else warm
+        self.use_compiled = settings.compiled_ensemble if compiled is None else compiled
+        self.use_flat_forest = settings.flat_forest if flat_forest is None else flat_forest
+        self.use_flat_knn = settings.flat_knn if flat_knn is None else flat_knn
+        self.use_quantized = settings.quantized if quantized is None else quantized
+        self.ensemble_models = settings.ensemble_models if ensemble_models is None else ensemble_models
+        self.fast_consensus = settings.fast_consensus if fast_consensus is None else fast_consensus
+        # Running mean of every model's single-row latency in seconds
+        self._model_costs: Dict[str, float] = {}
+        self.cache = PredictionCache(settings.cache_size, settings.cache_ttl) if settings.cache_size > 0 else None
+        self._model_set = None
+        self._reload_lock = threading.Lock()
         self.load_models_and_scalers()
+    
+    @property
+    def model_set(self) -> ModelSet:
+        """The active model set"""
+        return self._model_set
+    
+    @property
+    def models(self) -> Dict[str, Any]:
+        """Loaded models of the active model set, keyed by model name"""
+        return self._model_set.models
+    
+    @property
+    def scalers(self) -> Dict[str, Any]:
+        """Scalers of the active model set"""
+        return self._model_set.scalers
+    
+    @property
+    def engines(self) -> Dict[str, Any]:
+        """Alternative inference engines of the active model set"""
+        return self._model_set.engines
+    
+    @property
+    def compiled(self) -> Any:
+        """Compiled ensemble of the active model set, if any"""
+        return self._model_set.compiled
+    
+    @property
+    def model_status(self) -> Dict[str, str]:
+        """Loading state of every model of the active model set"""
+        return self._model_set.model_status
+    
+    @property
+    def bundle_manifest(self) -> Optional[Dict[str, Any]]:
+        """Manifest of the bundle the active model set came from, if any"""
+        return self._model_set.bundle_manifest
+    
+    @property
+    def version(self) -> int:
+        """Version of the active model set, part of every cache key"""
+        return self._model_set.version if self._model_set is not None else 0
+    
+    def compile(self) -> None:
+        """Extract closed-form parameters of the scalers and supported models"""
+        self._model_set.compile()
+    
+    def flatten_forests(self) -> None:
+        """Build array-backed engines for all loaded random forest models"""
+        self._model_set.flatten_forests()
+    
+    def index_neighbors(self, index: str = 'auto') -> None:
+        """
+        Build precomputed neighbour indexes for all loaded KNN models
         
+        Args:
+            index: 'brute', 'tree' or 'auto' search strategy
+        """
+        self._model_set.index_neighbors(index)
+    
+    def _new_model_set(self, load_mode: str) -> ModelSet:
+        """Create an unloaded model set with the next version number"""
+        return ModelSet(
+            self.models_dir, self.version + 1, load_mode, self.warm_models or self.fast_consensus,
+            self.use_compiled, self.use_flat_forest, self.use_flat_knn, self.use_quantized
+        )
+    
     def load_models_and_scalers(self) -> None:
-        """Load all available models and scalers from the models directory"""
-        # Load scalers
+        """
+        Load all available models and scalers from the models directory
+        
+        Scalers are always loaded immediately. Models are loaded according to
+        the load mode, and get_available_models lists them before they are loaded.
+        A model bundle, when used, is memory-mapped in one step regardless of the load mode.
+        """
+        model_set = self._new_model_set(self.load_mode)
+        self._model_set = model_set
+        # A new model set makes every cached prediction stale
+        if self.cache is not None:
+            self.cache.clear()
+        model_set.load()
+    
+    def reload(self) -> Dict[str, Any]:
+        """
+        Load a new model set from the models directory and swap it in
+        
+        The new set is fully loaded and validated with a smoke prediction while
+        the active set keeps serving. It then replaces the active set in one
+        reference assignment, so no request is dropped or sees a mix of both sets.
+        If validation fails the active set is kept.
+        
+        Returns:
+            Description of the new active model set
+            
+        Raises:
+            ReloadInProgressError: If another reload is running
+            ModelSetValidationError: If the new model set fails validation
+        """
+        if not self._reload_lock.acquire(blocking=False):
+            raise ReloadInProgressError("A model reload is already in progress")
         try:
-            with open(os.path.join(self.models_dir, 'standard_scaler.pkl'), 'rb') as file:
-                self.scalers['standard'] = pickle.load(file)
-            
-            with open(os.path.join(self.models_dir, 'minmax_scaler.pkl'), 'rb') as file:
-                self.scalers['minmax'] = pickle.load(file)
-        except FileNotFoundError as e:
-            print(f"Error loading scalers: {e}")
-            
-        # Define model types and scaling methods
-        model_types = ['knn', 'logistic_regression', 'naive_bayes', 'random_forest']
-        scaling_methods = ['scaled', 'normalized']
-        
-        # Load all available models
-        for model_type in model_types:
-            for scaling in scaling_methods:
-                model_path = os.path.join(self.models_dir, f"{model_type}_model_{scaling}.pkl")
-                model_key = f"{model_type}_{scaling}"
-                
-                try:
-                    with open(model_path, 'rb') as file:
-                        self.models[model_key] = pickle.load(file)
-                        print(f"Loaded {model_key}")
-                except FileNotFoundError:
-                    print(f"Model {model_path} not found")
-    
-    def predict_with_all_models(self, features: np.ndarray) -> Dict[str, Dict[str, Any]]:
-        """
-        Make predictions using all available models
+            # Reloads always load every model up front so the smoke prediction covers them all
+            model_set = self._new_model_set('eager' if self.load_mode == 'eager' else 'parallel')
+            model_set.load()
+            self._validate(model_set)
+            
+            self._model_set = model_set
+            if self.cache is not None:
+                self.cache.clear()
+            print(f"Swapped in model set version {model_set.version}")
+            return model_set.info()
+        finally:
+            self._reload_lock.release()
+    
+    def _validate(self, model_set: ModelSet) -> None:
+        """
+        Run a smoke prediction through every model of a new model set
+        
+        Args:
+            model_set: Fully loaded model set
+            
+        Raises:
+            ModelSetValidationError: If the scalers are missing, no model loaded,
+                or any model fails to predict
+        """
+        features = model_set.dummy_features()
+        if features is None or 'minmax' not in model_set.scalers:
+            raise ModelSetValidationError("Model set is missing its scalers")
+        if not model_set.models:
+            raise ModelSetValidationError("Model set contains no loadable models")
+        
+        failed = [
+            model_key for model_key, pred in self._compute_batch_with_all_models(features, model_set)[0].items()
+            if pred["prediction"] is None
+        ]
+        failed += [model_key for model_key, status in model_set.model_status.items() if status == "error"]
+        if failed:
+            raise ModelSetValidationError(f"Smoke prediction failed for: {', '.join(sorted(set(failed)))}")
+    
+    def warm(self) -> None:
+        """
+        Run a dummy prediction through every model so the first real request
+        does not pay one-time initialization costs
+        """
+        self._model_set.warm()
+    
+    def is_ready(self) -> bool:
+        """
+        Check whether every model has finished loading (and warming, if enabled)
+        
+        Returns:
+            True when the predictor can serve without waiting on a model load
+        """
+        return self._model_set.is_ready()
+    
+    def predict_with_all_models(self, features: np.ndarray, model_names: Optional[List[str]] = None,
+                                fast: Optional[bool] = None) -> Dict[str, Dict[str, Any]]:
+        """
+        Make predictions using all models of the ensemble
         
         Args:
             features: Array of features for prediction
+            model_names: Models taking part in the consensus, defaults to the configured ensemble
+            fast: Skip the models that can no longer change the majority vote,
+                defaults to the configured mode
             
         Returns:
             Dictionary of model predictions
         """
-        results = {}
+        return self.predict_batch_with_all_models(features.reshape(1, -1), model_names, fast)[0]
+    
+    def predict_batch_with_all_models(self, features: np.ndarray, model_names: Optional[List[str]] = None,
+                                      fast: Optional[bool] = None) -> List[Dict[str, Dict[str, Any]]]:
+        """
+        Make predictions for many patients using all models of the ensemble
         
-        # Reshape features for transformation
-        features_reshaped = features.reshape(1, -1)
+        Each scaler and each model is run once over the rows missing from the cache.
+        In fast consensus mode the models run from the cheapest to the most expensive,
+        each only over the rows whose majority vote is not settled yet.
         
-        # Transform features with both scalers
-        features_scaled = self.scalers['standard'].transform(features_reshaped)
-        features_normalized = self.scalers['minmax'].transform(features_reshaped)
-        
-        # Make predictions with all models
-        for model_key, model in self.models.items():
-            try:
-                # Use appropriate features based on model type
-                if '_scaled' in model_key:
-                    transformed_features = features_scaled
-                else:  # '_normalized' in model_key
-                    transformed_features = features_normalized
-                
-                # Make prediction
-                prediction = model.predict(transformed_features)[0]
-                
-                # Get probability if available
-                try:
-                    probability = model.predict_proba(transformed_features)[0][prediction]
-                except (AttributeError, IndexError):
-                    probability = None
-                
-                # Create risk level
-                risk_level = "High risk of heart disease" if prediction == 1 else "Low risk of heart disease"
-                
-                # Store results
-                results[model_key] = {
+        Args:
+            features: 2D array of shape (n_patients, n_features)
+            model_names: Models taking part in the consensus, defaults to the configured ensemble
+            fast: Skip the models that can no longer change the majority vote,
+                defaults to the configured mode
+            
+        Returns:
+            List with one dictionary of model predictions per patient, without the
+            models fast consensus skipped for that patient
+            
+        Raises:
+            ValueError: If a requested model is not available
+        """
+        model_set = self._model_set
+        model_keys = self._ensemble_keys(model_set, model_names)
+        fast = self.fast_consensus if fast is None else fast
+        
+        if fast:
+            return self._cached_batch(
+                features, f"fast:{','.join(model_keys)}", model_set,
+                lambda rows, model_set: self._compute_fast_consensus(rows, model_set, model_keys)
+            )
+        
+        # The full ensemble keeps the scope it was always cached under
+        scope = None if model_keys == model_set.available_models() else f"all:{','.join(model_keys)}"
+        return self._cached_batch(
+            features, scope, model_set,
+            lambda rows, model_set: self._compute_batch_with_all_models(rows, model_set, model_keys)
+        )
+    
+    def ensemble_keys(self, model_names: Optional[List[str]] = None) -> List[str]:
+        """
+        Resolve the models taking part in the consensus
+        
+        Args:
+            model_names: Requested models, defaults to the configured ensemble
+            
+        Returns:
+            Model names in the order predictions are reported
+            
+        Raises:
+            ValueError: If a requested model is not available
+        """
+        return self._ensemble_keys(self._model_set, model_names)
+    
+    def _ensemble_keys(self, model_set: ModelSet, model_names: Optional[List[str]]) -> List[str]:
+        """Resolve the ensemble against the available models of a model set"""
+        available = model_set.available_models()
+        model_names = model_names or self.ensemble_models
+        if not model_names:
+            return available
+        
+        unknown = [model_name for model_name in model_names if model_name not in available]
+        if unknown:
+            raise ValueError(f"Models not found: {', '.join(unknown)}")
+        return [model_key for model_key in available if model_key in model_names]
+    
+    def _compute_batch_with_all_models(self, features: np.ndarray, model_set: ModelSet,
+                                       model_keys: Optional[List[str]] = None) -> List[Dict[str, Dict[str, Any]]]:
+        """Run every scaler and the given models of a model set once over the whole feature matrix"""
+        n_rows = features.shape[0]
+        results = [{} for _ in range(n_rows)]
+        if model_keys is None:
+            model_keys = model_set.available_models()
+        
+        for model_key, outcome in self._predict_arrays(features, model_set, model_keys).items():
+            if isinstance(outcome, Exception):
+                for row in range(n_rows):
+                    results[row][model_key] = {
+                        "prediction": None,
+                        "probability": None,
+                        "risk_level": f"Error: {str(outcome)}"
+                    }
+                continue
+            
+            # Store results
+            predictions, probabilities = outcome
+            for row, prediction in enumerate(predictions):
+                results[row][model_key] = {
                     "prediction": int(prediction),
-                    "probability": float(probability) if probability is not None else None,
-                    "risk_level": risk_level
-                }
-            except Exception as e:
-                print(f"Error with model {model_key}: {e}")
-                results[model_key] = {
-                    "prediction": None,
-                    "probability": None,
-                    "risk_level": f"Error: {str(e)}"
+                    "probability": float(probabilities[row]) if probabilities is not None else None,
+                    "risk_level": self._risk_level(prediction)
                 }
         
         return results
     
+    def _compute_fast_consensus(self, features: np.ndarray, model_set: ModelSet,
+                                model_keys: List[str]) -> List[Dict[str, Dict[str, Any]]]:
+        """
+        Run the given models from the cheapest to the most expensive, over each
+        row only until the remaining models can no longer change its majority vote
+        
+        get_consensus_prediction predicts 1 when more than half of the valid predictions
+        are 1. With p positive out of v valid predictions and r models left to run, the
+        vote is settled at 1 once 2p > v + r and at 0 once 2p + r <= v, whatever the
+        remaining models would predict and even if they failed.
+        
+        Returns:
+            List with one dictionary of model predictions per patient, holding only
+            the models that ran for that patient
+        """
+        n_rows = features.shape[0]
+        results = [{} for _ in range(n_rows)]
+        model_set.ensure_loaded(model_keys)
+        ordered = [model_key for model_key in self._cost_order(model_keys) if model_key in model_set.models]
+        features_scaled, features_normalized, compiled_probabilities = self._transform(features, model_set)
+        
+        positive = np.zeros(n_rows, dtype=np.int64)
+        valid = np.zeros(n_rows, dtype=np.int64)
+        rows = np.arange(n_rows)
+        for index, model_key in enumerate(ordered):
+            remaining = len(ordered) - index
+            settled = ((2 * positive[rows] > valid[rows] + remaining)
+                       | (2 * positive[rows] + remaining <= valid[rows]))
+            rows = rows[~settled]
+            if len(rows) == 0:
+                for skipped_key in ordered[index:]:
+                    metrics.consensus_skipped.inc(skipped_key, amount=n_rows)
+                break
+            if len(rows) < n_rows:
+                metrics.consensus_skipped.inc(model_key, amount=n_rows - len(rows))
+            
+            compiled = compiled_probabilities.get(model_key)
+            outcome = self._predict_model(
+                model_set, model_key, features_scaled[rows], features_normalized[rows],
+                compiled[rows] if compiled is not None else None
+            )
+            if isinstance(outcome, Exception):
+                for row in rows.tolist():
+                    results[row][model_key] = {
+                        "prediction": None,
+                        "probability": None,
+                        "risk_level": f"Error: {str(outcome)}"
+                    }
+                continue
+            
+            predictions, probabilities = outcome
+            positive[rows] += predictions == 1
+            valid[rows] += 1
+            for position, row in enumerate(rows.tolist()):
+                results[row][model_key] = {
+                    "prediction": int(predictions[position]),
+                    "probability": float(probabilities[position]) if probabilities is not None else None,
+                    "risk_level": self._risk_level(predictions[position])
+                }
+        
+        # Report the predictions in the usual model order
+        return [
+            {model_key: result[model_key] for model_key in model_keys if model_key in result}
+            for result in results
+        ]
+    
+    @classmethod
+    def _cost_order(cls, model_keys: List[str]) -> List[str]:
+        """Sort models from the cheapest family to the most expensive, keeping the order within a family"""
+        def rank(model_key: str) -> int:
+            family = model_key.rsplit('_', 1)[0]
+            return cls.CONSENSUS_ORDER.index(family) if family in cls.CONSENSUS_ORDER else len(cls.CONSENSUS_ORDER)
+        return sorted(model_keys, key=rank)
+    
+    def estimated_latency(self, model_keys: List[str]) -> float:
+        """
+        Estimate the single-row latency of the given models
+        
+        Args:
+            model_keys: Names of the models
+            
+        Returns:
+            Sum of the running mean latencies in seconds. Models that have not
+            run on a single row yet count with the time they took for the dummy
+            patient when they were loaded, and models not loaded yet as 0
+        """
+        load_costs = self._model_set.model_costs
+        return sum(self._model_costs.get(model_key, load_costs.get(model_key, 0.0)) for model_key in model_keys)
+    
+    def _record_cost(self, model_key: str, seconds: float) -> None:
+        """Update the running mean latency of a model with a single-row measurement"""
+        previous = self._model_costs.get(model_key)
+        self._model_costs[model_key] = seconds if previous is None else previous + 0.1 * (seconds - previous)
+    
+    def predict_arrays(self, features: np.ndarray,
+                       model_names: Optional[List[str]] = None) -> Dict[str, Tuple[np.ndarray, Optional[np.ndarray]]]:
+        """
+        Make predictions for many patients as arrays, bypassing the cache
+        
+        Meant for bulk scoring, where building a dictionary per patient and model
+        would cost more than the inference itself.
+        
+        Args:
+            features: 2D array of shape (n_patients, n_features)
+            model_names: Models to run, defaults to all available models
+            
+        Returns:
+            Dictionary of (predictions, probability of each predicted class or None)
+            keyed by model name
+            
+        Raises:
+            ValueError: If a requested model is not available
+        """
+        model_set = self._model_set
+        available = model_set.available_models()
+        if model_names is None:
+            model_names = available
+        unknown = [model_name for model_name in model_names if model_name not in available]
+        if unknown:
+            raise ValueError(f"Models not found: {', '.join(unknown)}")
+        
+        outcomes = self._predict_arrays(features, model_set, model_names)
+        for model_key, outcome in outcomes.items():
+            if isinstance(outcome, Exception):
+                raise outcome
+        return outcomes
+    
+    def predict_probabilities(self, features: np.ndarray,
+                              model_name: str) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        """
+        Make predictions for many patients with a specific model, with the
+        probability of every class, bypassing the cache
+        
+        Args:
+            features: 2D array of shape (n_patients, n_features)
+            model_name: Name of the model to use
+            
+        Returns:
+            Tuple of (predictions, class probabilities of shape (n_patients, n_classes)
+            in the order of the model's classes_, or None if the model has no probabilities)
+            
+        Raises:
+            ValueError: If the model is not available
+        """
+        model_set = self._model_set
+        if model_name not in model_set.available_models():
+            raise ValueError(f"Model '{model_name}' not found")
+        
+        model_set.ensure_loaded([model_name])
+        model = model_set.models.get(model_name)
+        if model is None:
+            raise ValueError(f"Model '{model_name}' failed to load")
+        
+        features_scaled, features_normalized, compiled_probabilities = self._transform(features, model_set)
+        transformed_features = features_scaled if '_scaled' in model_name else features_normalized
+        engine = self._engine(model_set, model_name, len(features))
+        
+        probabilities = compiled_probabilities.get(model_name)
+        if probabilities is None and hasattr(engine, "predict_proba"):
+            probabilities = engine.predict_proba(transformed_features)
+        if probabilities is None:
+            return engine.predict(transformed_features), None
+        return model.classes_[probabilities.argmax(axis=1)], probabilities
+    
+    def _predict_arrays(self, features: np.ndarray, model_set: ModelSet, model_keys: List[str]) -> Dict[str, Any]:
+        """
+        Run the scalers once and the given models of a model set over a feature matrix
+        
+        Returns:
+            Dictionary keyed by model name of (predictions, probabilities) tuples,
+            or of the exception raised by a model that failed
+        """
+        model_set.ensure_loaded(model_keys)
+        features_scaled, features_normalized, compiled_probabilities = self._transform(features, model_set)
+        
+        # Make predictions with the requested models
+        outcomes = {}
+        for model_key in model_keys:
+            if model_key not in model_set.models:
+                continue
+            outcomes[model_key] = self._predict_model(
+                model_set, model_key, features_scaled, features_normalized, compiled_probabilities.get(model_key)
+            )
+        
+        return outcomes
+    
+    def _transform(self, features: np.ndarray, model_set: ModelSet) -> Tuple[np.ndarray, np.ndarray, Dict[str, np.ndarray]]:
+        """
+        Run both scalers, and the compiled models when enabled, over a feature matrix
+        
+        Returns:
+            Tuple of (standardized features, min-max normalized features,
+            compiled probabilities keyed by model name)
+        """
+        # Transform features with both scalers
+        start = time.perf_counter()
+        if model_set.compiled is not None:
+            features_scaled, features_normalized = model_set.compiled.transform(features)
+            scaled_at = time.perf_counter()
+            compiled_probabilities = model_set.compiled.predict_proba_all(features_scaled, features_normalized)
+            metrics.observe_stage('compiled', time.perf_counter() - scaled_at)
+        else:
+            features_scaled = model_set.scalers['standard'].transform(features)
+            features_normalized = model_set.scalers['minmax'].transform(features)
+            scaled_at = time.perf_counter()
+            compiled_probabilities = {}
+        metrics.observe_stage('scaling', scaled_at - start)
+        
+        return features_scaled, features_normalized, compiled_probabilities
+    
+    def _predict_model(self, model_set: ModelSet, model_key: str, features_scaled: np.ndarray,
+                       features_normalized: np.ndarray, compiled_probabilities: Optional[np.ndarray]) -> Any:
+        """
+        Run one model over transformed features
+        
+        Returns:
+            Tuple of (predictions, probabilities), or the exception raised by the model
+        """
+        # Use appropriate features based on model type
+        if '_scaled' in model_key:
+            transformed_features = features_scaled
+        else:  # '_normalized' in model_key
+            transformed_features = features_normalized
+        
+        start = time.perf_counter()
+        try:
+            outcome = self._predict_batch(
+                self._engine(model_set, model_key, len(transformed_features)), transformed_features,
+                compiled_probabilities
+            )
+        except Exception as e:
+            print(f"Error with model {model_key}: {e}")
+            metrics.model_errors.inc(model_key)
+            outcome = e
+        elapsed = time.perf_counter() - start
+        metrics.observe_model(model_key, elapsed)
+        
+        if len(transformed_features) == 1 and not isinstance(outcome, Exception):
+            self._record_cost(model_key, elapsed)
+        return outcome
+    
     def predict_with_model(self, features: np.ndarray, model_name: str) -> Tuple[int, Optional[float], str]:
         """
         Make a prediction using a specific model
@@ -116,32 +589,158 @@ class HeartDiseasePredictor:
         Returns:
             Tuple of (prediction, probability, risk_level)
         """
-        if model_name not in self.models:
+        return self.predict_batch_with_model(features.reshape(1, -1), model_name)[0]
+    
+    def predict_batch_with_model(self, features: np.ndarray, model_name: str) -> List[Tuple[int, Optional[float], str]]:
+        """
+        Make predictions for many patients using a specific model
+        
+        Args:
+            features: 2D array of shape (n_patients, n_features)
+            model_name: Name of the model to use
+            
+        Returns:
+            List of (prediction, probability, risk_level) tuples, one per patient
+        """
+        model_set = self._model_set
+        if model_name not in model_set.available_models():
             raise ValueError(f"Model '{model_name}' not found")
         
-        # Reshape features for transformation
-        features_reshaped = features.reshape(1, -1)
+        model_set.ensure_loaded([model_name])
+        if model_name not in model_set.models:
+            raise ValueError(f"Model '{model_name}' failed to load")
         
+        return self._cached_batch(
+            features, model_name, model_set,
+            lambda rows, model_set: self._compute_batch_with_model(rows, model_set, model_name)
+        )
+    
+    def _compute_batch_with_model(self, features: np.ndarray, model_set: ModelSet,
+                                  model_name: str) -> List[Tuple[int, Optional[float], str]]:
+        """Run one model of a model set over the whole feature matrix"""
         # Use appropriate scaler based on model name
-        if '_scaled' in model_name:
-            transformed_features = self.scalers['standard'].transform(features_reshaped)
-        else:  # '_normalized' in model_name
-            transformed_features = self.scalers['minmax'].transform(features_reshaped)
-        
-        # Make prediction
-        model = self.models[model_name]
-        prediction = model.predict(transformed_features)[0]
+        start = time.perf_counter()
+        if model_set.compiled is not None:
+            features_scaled, features_normalized = model_set.compiled.transform(features)
+            transformed_features = features_scaled if '_scaled' in model_name else features_normalized
+            scaled_at = time.perf_counter()
+            compiled_probabilities = model_set.compiled.predict_proba(model_name, transformed_features)
+        else:
+            if '_scaled' in model_name:
+                transformed_features = model_set.scalers['standard'].transform(features)
+            else:  # '_normalized' in model_name
+                transformed_features = model_set.scalers['minmax'].transform(features)
+            scaled_at = time.perf_counter()
+            compiled_probabilities = None
+        metrics.observe_stage('scaling', scaled_at - start)
         
-        # Get probability if available
         try:
-            probability = model.predict_proba(transformed_features)[0][prediction]
-        except (AttributeError, IndexError):
-            probability = None
+            predictions, probabilities = self._predict_batch(
+                self._engine(model_set, model_name, len(features)), transformed_features, compiled_probabilities
+            )
+        except Exception:
+            metrics.model_errors.inc(model_name)
+            raise
+        finally:
+            metrics.observe_model(model_name, time.perf_counter() - scaled_at)
         
-        # Create risk level
-        risk_level = "High risk of heart disease" if prediction == 1 else "Low risk of heart disease"
+        return [
+            (
+                int(prediction),
+                float(probabilities[row]) if probabilities is not None else None,
+                self._risk_level(prediction)
+            )
+            for row, prediction in enumerate(predictions)
+        ]
+    
+    def _cached_batch(self, features: np.ndarray, scope: Optional[str], model_set: ModelSet,
+                      compute: Callable[[np.ndarray, ModelSet], List[Any]]) -> List[Any]:
+        """
+        Serve rows from the prediction cache and compute only the missing ones
         
-        return int(prediction), probability, risk_level
+        Args:
+            features: 2D array of shape (n_patients, n_features)
+            scope: Model name, ensemble selection, or None for the predictions
+                of all available models
+            model_set: Model set the request was started on
+            compute: Function producing one result per row of a feature matrix
+            
+        Returns:
+            List with one result per patient
+        """
+        if self.cache is None:
+            return compute(features, model_set)
+        
+        # Canonicalize to float64 so integer and float inputs share cache entries
+        features = np.asarray(features, dtype=np.float64)
+        keys = [(model_set.version, scope, tuple(row)) for row in features.tolist()]
+        results = [self.cache.get(key) for key in keys]
+        
+        missing = [row for row, result in enumerate(results) if result is None]
+        results = [self._copy_result(result) if result is not None else None for result in results]
+        
+        if missing:
+            for row, result in zip(missing, compute(features[missing], model_set)):
+                if self._cacheable(result):
+                    self.cache.put(keys[row], self._copy_result(result))
+                results[row] = result
+        
+        return results
+    
+    @staticmethod
+    def _cacheable(result: Any) -> bool:
+        """Only cache results in which every model produced a prediction"""
+        if isinstance(result, dict):
+            return all(pred["prediction"] is not None for pred in result.values())
+        return True
+    
+    @staticmethod
+    def _copy_result(result: Any) -> Any:
+        """Copy the mutable parts of a result so callers cannot alter cached entries"""
+        if isinstance(result, dict):
+            return {model_key: dict(pred) for model_key, pred in result.items()}
+        return result
+    
+    @staticmethod
+    def _engine(model_set: ModelSet, model_key: str, n_rows: int) -> Any:
+        """Pick the alternative engine of a model unless the batch is too large for it"""
+        engine = model_set.engines.get(model_key)
+        if engine is None or n_rows > getattr(engine, 'MAX_BATCH_ROWS', n_rows):
+            return model_set.models[model_key]
+        return engine
+    
+    @staticmethod
+    def _predict_batch(model: Any, transformed_features: np.ndarray,
+                       probabilities: Optional[np.ndarray] = None) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        """
+        Run a single model over a transformed feature matrix
+        
+        Probabilities are computed once and the class label is derived from them,
+        so expensive models such as random forests and KNN do the work only once.
+        
+        Args:
+            model: Fitted estimator or alternative inference engine
+            transformed_features: Scaled or normalized 2D feature matrix
+            probabilities: Class probabilities already computed by the compiled
+                ensemble, if any
+            
+        Returns:
+            Tuple of (predictions, probability of each predicted class or None)
+        """
+        if probabilities is None:
+            if not hasattr(model, "predict_proba"):
+                return model.predict(transformed_features), None
+            probabilities = model.predict_proba(transformed_features)
+        
+        best = probabilities.argmax(axis=1)
+        predictions = model.classes_[best]
+        
+        return predictions, probabilities[np.arange(len(best)), best]
+    
+    @staticmethod
+    def _risk_level(prediction: int) -> str:
+        """Create the risk level label for a prediction"""
+        return "High risk of heart disease" if prediction == 1 else "Low risk of heart disease"
     
     def get_consensus_prediction(self, predictions: Dict[str, Dict[str, Any]]) -> Tuple[int, str, float]:
         """
@@ -171,11 +770,33 @@ class HeartDiseasePredictor:
         
         return consensus, risk_level, agreement_percentage
     
+    @staticmethod
+    def get_consensus_predictions(predictions: Dict[str, np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Calculate the consensus prediction of many patients at once
+        
+        Vectorized counterpart of get_consensus_prediction for prediction arrays.
+        
+        Args:
+            predictions: Dictionary of prediction arrays keyed by model name
+            
+        Returns:
+            Tuple of (consensus predictions, agreement percentages)
+        """
+        stacked = np.vstack([np.asarray(p) for p in predictions.values()])
+        positive_count = (stacked == 1).sum(axis=0)
+        total_count = stacked.shape[0]
+        
+        consensus = (positive_count / total_count > 0.5).astype(np.int64)
+        agreement_percentage = np.maximum(positive_count, total_count - positive_count) / total_count * 100
+        
+        return consensus, agreement_percentage
+    
     def get_available_models(self) -> List[str]:
         """
-        Get a list of all available models
+        Get a list of all available models, including those not loaded yet
         
         Returns:
             List of model names
         """
-        return list(self.models.keys())
+        return self._model_set.available_models()
@@ -0,0 +1,304 @@
+"""
+Quantized inference engines and their accuracy drift report
+
+The quantized engines keep the model parameters in single precision and smaller
+integers: the logistic regression and naive Bayes parameters and the scaled
+features in float32, the random forest thresholds in float32 with 32-bit node links,
+16-bit feature indices and 16-bit fixed-point leaf values, and the KNN training
+matrix in float32. The arrays every prediction reads shrink by more than half,
+so more of them stay in the CPU caches.
+
+Lower precision can change a prediction, so quantized mode is only activated
+with a drift report showing how often the quantized engines disagree with the
+float64 models on the held-out rows. generate_model_pickles.py writes the report
+next to the pickles and into the bundle manifest, and this module writes it for
+existing pickles.
+
+Usage:
+    python -m app.models.quantized [pickles_dir] [store_path]
+"""
+
+import hashlib
+import json
+import os
+import sys
+from typing import Any, Dict, Optional
+
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.neighbors import KNeighborsClassifier
+
+from app.models.bundle import read_pickles
+from app.models.compiled import CompiledEnsemble
+from app.models.forest import FlatForest
+from app.models.neighbors import FlatKNN
+
+REPORT_FILENAME = 'quantization_report.json'
+
+class QuantizedEnsemble(CompiledEnsemble):
+    """
+    Compiled ensemble with float32 model parameters
+
+    The scalers still run in float64 and their output is rounded to float32 once,
+    which is the rounding sklearn's trees apply to their inputs anyway. The fused
+    logistic regression and naive Bayes scores are then computed in single precision.
+    """
+
+    DTYPE = np.float32
+
+class QuantizedForest(FlatForest):
+    """
+    Flattened random forest with float32 thresholds and 16-bit leaf values
+
+    sklearn compares float32 features against float64 thresholds. Every threshold
+    is rounded down to the nearest float32, so for float32 features each comparison,
+    and the leaf a row reaches, is exactly that of the float64 forest. The leaf
+    class fractions are stored as 16-bit fixed point and summed as integers, which
+    moves a probability by at most half a fixed-point step.
+
+    sklearn grows trees depth first, so the left child of a node is the next node
+    and only the right links are stored, as int32. Leaves get a -inf threshold and
+    loop back to themselves through their right link. The node indices being walked
+    stay intp, since NumPy would convert narrower index arrays on every gather.
+    """
+
+    # Fixed-point scale of the leaf class fractions
+    VALUE_SCALE = np.iinfo(np.uint16).max
+
+    def __init__(self, model: RandomForestClassifier):
+        """
+        Flatten and quantize the trees of a fitted random forest
+
+        Args:
+            model: Fitted RandomForestClassifier
+
+        Raises:
+            ValueError: If the trees were not grown depth first or are too large
+        """
+        super().__init__(model)
+        node_ids = np.arange(len(self.left))
+        is_leaf = self.left == node_ids
+        if not np.array_equal(self.left[~is_leaf], node_ids[~is_leaf] + 1):
+            raise ValueError("QuantizedForest supports depth-first trees only")
+        if len(node_ids) > np.iinfo(np.int32).max or self.n_features_in_ > np.iinfo(np.int16).max:
+            raise ValueError("QuantizedForest supports up to 2**31 nodes and 2**15 features")
+
+        threshold = self.threshold.astype(np.float32)
+        rounded_up = threshold > self.threshold
+        threshold[rounded_up] = np.nextafter(threshold[rounded_up], np.float32(-np.inf))
+        threshold[is_leaf] = -np.inf
+
+        self.threshold = threshold
+        self.feature = self.feature.astype(np.int16)
+        self.right = self.right.astype(np.int32)
+        self.value = np.rint(self.value * self.VALUE_SCALE).astype(np.uint16)
+        del self.left
+
+    def _predict_proba_chunk(self, features: np.ndarray) -> np.ndarray:
+        """Walk all trees level by level for a chunk of rows and average the fixed-point leaves"""
+        flat_features = np.ascontiguousarray(features).ravel()
+        row_offsets = (np.arange(len(features)) * features.shape[1])[:, None]
+        nodes = np.broadcast_to(self.roots, (len(features), len(self.roots)))
+
+        for _ in range(self.depth):
+            go_left = flat_features[row_offsets + self.feature[nodes]] <= self.threshold[nodes]
+            nodes = np.where(go_left, nodes + 1, self.right[nodes])
+
+        totals = self.value[nodes].sum(axis=1, dtype=np.int64)
+        return totals / (len(self.roots) * float(self.VALUE_SCALE))
+
+class QuantizedKNN(FlatKNN):
+    """
+    Brute force neighbour search over a float32 training matrix
+
+    Distances are ranked and refined in single precision, which carries about seven
+    significant digits. Rows whose k-th and (k+1)-th distances are that close are
+    re-queried through the model's own float64 search, the way FlatKNN resolves
+    exact ties. A KD-tree would keep its own float64 copy of the training rows,
+    so the quantized engine always searches by brute force.
+    """
+
+    DTYPE = np.float32
+
+    TIE_TOLERANCE = 1e-5
+
+    def __init__(self, model: KNeighborsClassifier):
+        """
+        Extract the training data of a fitted KNN classifier as float32
+
+        Args:
+            model: Fitted KNeighborsClassifier using the Euclidean metric
+
+        Raises:
+            ValueError: If the model's metric or weights are not supported
+        """
+        super().__init__(model, 'brute')
+
+def quantize_model(model: Any) -> Optional[Any]:
+    """
+    Build the quantized engine of a random forest or KNN model
+
+    Args:
+        model: Fitted estimator
+
+    Returns:
+        Quantized engine, or None if the model has none
+    """
+    try:
+        if isinstance(model, RandomForestClassifier):
+            return QuantizedForest(model)
+        if isinstance(model, KNeighborsClassifier):
+            return QuantizedKNN(model)
+    except ValueError as e:
+        print(f"Cannot quantize {type(model).__name__}: {e}")
+    return None
+
+def engine_nbytes(engine: Any) -> int:
+    """Bytes held by the NumPy arrays of an inference engine"""
+    return sum(value.nbytes for value in vars(engine).values() if isinstance(value, np.ndarray))
+
+def model_digests(model_paths: Dict[str, str]) -> Dict[str, str]:
+    """
+    Identify the model files a drift report was computed for
+
+    Args:
+        model_paths: Pickle file of every model keyed by model name
+
+    Returns:
+        SHA-256 of every file keyed by model name
+    """
+    digests = {}
+    for model_key, path in model_paths.items():
+        with open(path, 'rb') as file:
+            digests[model_key] = hashlib.sha256(file.read()).hexdigest()
+    return digests
+
+def drift_report(scalers: Dict[str, Any], models: Dict[str, Any], features: np.ndarray,
+                 targets: np.ndarray) -> Dict[str, Any]:
+    """
+    Compare the quantized engines with the float64 models on held-out rows
+
+    Args:
+        scalers: Dictionary with fitted 'standard' and 'minmax' scalers
+        models: Dictionary of fitted models keyed by model name
+        features: Unscaled held-out feature matrix
+        targets: Labels of the held-out rows
+
+    Returns:
+        Report with the label drift (share of rows whose predicted label changed),
+        the largest probability error and both accuracies of every model and of the
+        consensus, the largest label drift under 'max_drift', and the engine memory
+        of both precisions
+    """
+    features = np.asarray(features, dtype=np.float64)
+    ensemble = QuantizedEnsemble(scalers, models)
+    features_scaled, features_normalized = ensemble.transform(features)
+    quantized_probabilities = ensemble.predict_proba_all(features_scaled, features_normalized)
+    float64_bytes = engine_nbytes(CompiledEnsemble(scalers, models))
+    quantized_bytes = engine_nbytes(ensemble)
+
+    report_models, reference_labels, quantized_labels = {}, [], []
+    for model_key, model in models.items():
+        scaler = scalers['standard' if '_scaled' in model_key else 'minmax']
+        reference = model.predict_proba(scaler.transform(features))
+
+        quantized = quantized_probabilities.get(model_key)
+        if quantized is None:
+            engine = quantize_model(model)
+            transformed_features = features_scaled if '_scaled' in model_key else features_normalized
+            quantized = (engine or model).predict_proba(transformed_features)
+            if engine is not None:
+                float64_bytes += engine_nbytes(FlatForest(model) if isinstance(engine, FlatForest) else FlatKNN(model, 'brute'))
+                quantized_bytes += engine_nbytes(engine)
+
+        reference_labels.append(model.classes_[reference.argmax(axis=1)])
+        quantized_labels.append(model.classes_[quantized.argmax(axis=1)])
+        report_models[model_key] = {
+            "label_drift": float(np.mean(reference_labels[-1] != quantized_labels[-1])),
+            "max_probability_error": float(np.abs(reference - quantized).max(initial=0.0)),
+            "accuracy": float(np.mean(reference_labels[-1] == targets)),
+            "quantized_accuracy": float(np.mean(quantized_labels[-1] == targets))
+        }
+
+    # Majority vote of HeartDiseasePredictor.get_consensus_predictions
+    reference_consensus = (np.mean(np.vstack(reference_labels) == 1, axis=0) > 0.5).astype(np.int64)
+    quantized_consensus = (np.mean(np.vstack(quantized_labels) == 1, axis=0) > 0.5).astype(np.int64)
+    consensus = {
+        "label_drift": float(np.mean(reference_consensus != quantized_consensus)),
+        "accuracy": float(np.mean(reference_consensus == targets)),
+        "quantized_accuracy": float(np.mean(quantized_consensus == targets))
+    }
+
+    return {
+        "rows": len(targets),
+        "max_drift": max([consensus["label_drift"]] + [entry["label_drift"] for entry in report_models.values()]),
+        "consensus": consensus,
+        "models": report_models,
+        "memory": {"float64_bytes": float64_bytes, "quantized_bytes": quantized_bytes}
+    }
+
+def write_report(path: str, report: Dict[str, Any]) -> None:
+    """Write a drift report next to its destination and move it into place"""
+    temporary_path = f"{path}.tmp"
+    with open(temporary_path, 'w') as file:
+        json.dump(report, file, indent=2, sort_keys=True)
+    os.replace(temporary_path, path)
+
+def read_report(models_dir: str) -> Optional[Dict[str, Any]]:
+    """
+    Read the drift report of a models directory
+
+    Returns:
+        The report, or None if the directory has none
+    """
+    path = os.path.join(models_dir, REPORT_FILENAME)
+    if not os.path.exists(path):
+        return None
+    with open(path) as file:
+        return json.load(file)
+
+def quantization_refusal(report: Optional[Dict[str, Any]], max_drift: float,
+                         digests: Optional[Dict[str, str]] = None) -> Optional[str]:
+    """
+    Decide whether the quantized engines may replace the float64 ones
+
+    Args:
+        report: Drift report of the models, if any
+        max_drift: Largest label drift allowed
+        digests: Digests of the model files to check the report against, None
+            when the report comes with the models, as in a bundle manifest
+
+    Returns:
+        Why quantized mode must stay off, or None to activate it
+    """
+    if report is None:
+        return "no drift report, run python -m app.models.quantized"
+    if digests is not None and report.get("model_digests") != digests:
+        return "the drift report was computed for other models"
+    if report["max_drift"] > max_drift:
+        return f"label drift {report['max_drift']:.2%} exceeds the allowed {max_drift:.2%}"
+    return None
+
+if __name__ == "__main__":
+    from feature_store import STORE_PATH, FeatureStore
+
+    source = sys.argv[1] if len(sys.argv) > 1 else 'pickles'
+    store_path = sys.argv[2] if len(sys.argv) > 2 else STORE_PATH
+    scalers, models = read_pickles(source)
+    features, targets = FeatureStore.open_or_create(store_path, 'Data/heart.csv').read(holdout=True)
+
+    report = drift_report(scalers, models, features, targets)
+    model_paths = {}
+    for model_key in models:
+        model_name, scaling = model_key.rsplit('_', 1)
+        model_paths[model_key] = os.path.join(source, f"{model_name}_model_{scaling}.pkl")
+    report["model_digests"] = model_digests(model_paths)
+    write_report(os.path.join(source, REPORT_FILENAME), report)
+
+    for model_key, entry in report["models"].items():
+        print(f"{model_key:<32} drift {entry['label_drift']:>6.2%}  accuracy {entry['accuracy']:.2%} -> "
+              f"{entry['quantized_accuracy']:.2%}  max probability error {entry['max_probability_error']:.2e}")
+    print(f"{'consensus':<32} drift {report['consensus']['label_drift']:>6.2%}  accuracy "
+          f"{report['consensus']['accuracy']:.2%} -> {report['consensus']['quantized_accuracy']:.2%}")
+    print(f"Engine memory {report['memory']['float64_bytes'] / 1024:.0f} KiB -> "
+          f"{report['memory']['quantized_bytes'] / 1024:.0f} KiB, wrote {os.path.join(source, REPORT_FILENAME)}")
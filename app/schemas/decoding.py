@@ -0,0 +1,203 @@
+import json
+from itertools import chain
+from operator import itemgetter
+from typing import Any, AsyncIterator, Dict, List, Tuple
+
+import numpy as np
+import pydantic_core
+from fastapi import HTTPException
+from fastapi.encoders import jsonable_encoder
+from fastapi.exceptions import RequestValidationError
+from pydantic import TypeAdapter, ValidationError
+
+from app.schemas.patient import FEATURE_BOUNDS, FEATURE_COLUMNS, INTEGER_FEATURES, PatientData
+
+N_FEATURES = len(FEATURE_COLUMNS)
+
+# Reads the feature values of a patient payload in training order
+_feature_values = itemgetter(*FEATURE_COLUMNS)
+
+# Middle and half-width of the accepted range of every feature column, and 1.0
+# for the integer columns, for checking a whole feature matrix at once
+_MINIMUM = np.array([FEATURE_BOUNDS[column][0] for column in FEATURE_COLUMNS], dtype=np.float64)
+_MAXIMUM = np.array([FEATURE_BOUNDS[column][1] for column in FEATURE_COLUMNS], dtype=np.float64)
+_CENTER = (_MINIMUM + _MAXIMUM) / 2
+_RADIUS = (_MAXIMUM - _MINIMUM) / 2
+_INTEGER = np.array([column in INTEGER_FEATURES for column in FEATURE_COLUMNS], dtype=np.float64)
+
+_patients_adapter = TypeAdapter(List[PatientData])
+
+# Longest NDJSON line accepted, so a body without line breaks cannot grow the line buffer without bound
+MAX_LINE_BYTES = 65536
+
+def decode_patient(body: bytes) -> np.ndarray:
+    """
+    Decode a PatientData JSON body straight into a feature row
+
+    Well-formed bodies never build a PatientData. Bodies that fail the fast
+    path are validated by PatientData, so they are rejected with the same errors
+    as a PatientData body parameter.
+
+    Args:
+        body: Raw request body
+
+    Returns:
+        Contiguous float64 array of shape (n_features,)
+
+    Raises:
+        RequestValidationError: If the body is not a valid patient
+    """
+    payload = _parse(body)
+    try:
+        row = np.array(_feature_values(payload), dtype=np.float64)
+    except (KeyError, TypeError, ValueError):
+        row = None
+    if row is not None and _in_bounds(row):
+        return row
+
+    try:
+        # FastAPI validates body parameters with from_attributes, which changes the error a non-object reports
+        patient = PatientData.model_validate(payload, from_attributes=True)
+    except ValidationError as e:
+        raise _validation_error(e)
+    return np.array(_patient_values(patient), dtype=np.float64)
+
+def decode_patients(body: bytes, max_rows: int = 0) -> np.ndarray:
+    """
+    Decode a JSON list of PatientData straight into a feature matrix
+
+    Args:
+        body: Raw request body
+        max_rows: Most patients accepted, 0 for no limit
+
+    Returns:
+        Contiguous float64 array of shape (n_patients, n_features)
+
+    Raises:
+        RequestValidationError: If the body is not a list of valid patients
+        HTTPException: 413 if the list holds more than max_rows patients
+    """
+    payload = _parse(body)
+    if isinstance(payload, list) and 0 < max_rows < len(payload):
+        # Rejected before any patient is validated or scored
+        raise HTTPException(
+            status_code=413,
+            detail=f"A batch holds at most {max_rows} patients, submit larger ones to /jobs or the /stream routes"
+        )
+    if isinstance(payload, list):
+        try:
+            # Fill a preallocated matrix without building a row list first
+            matrix = np.fromiter(
+                chain.from_iterable(map(_feature_values, payload)), dtype=np.float64, count=len(payload) * N_FEATURES
+            ).reshape(len(payload), N_FEATURES)
+        except (KeyError, TypeError, ValueError):
+            matrix = None
+        if matrix is not None and _in_bounds(matrix):
+            return matrix
+
+    try:
+        patients = _patients_adapter.validate_python(payload, from_attributes=True)
+    except ValidationError as e:
+        raise _validation_error(e)
+    return np.array([_patient_values(patient) for patient in patients], dtype=np.float64).reshape(-1, N_FEATURES)
+
+def decode_patient_lines(lines: List[bytes]) -> Tuple[np.ndarray, Dict[int, Any]]:
+    """
+    Decode NDJSON lines of PatientData into a feature matrix
+
+    The lines are decoded together as one JSON list and only decoded one by
+    one when that fails, to find the invalid ones.
+
+    Args:
+        lines: One PatientData JSON object per line
+
+    Returns:
+        Feature matrix of the valid lines in line order, and the validation
+        errors of the invalid lines keyed by their position in lines
+    """
+    try:
+        matrix = decode_patients(b"[" + b",".join(lines) + b"]")
+        # A line holding several comma-separated objects would add rows
+        if len(matrix) == len(lines):
+            return matrix, {}
+    except (RequestValidationError, HTTPException):
+        pass
+
+    rows, errors = [], {}
+    for position, line in enumerate(lines):
+        try:
+            rows.append(decode_patient(line))
+        except RequestValidationError as e:
+            errors[position] = jsonable_encoder(e.errors())
+        except HTTPException as e:
+            errors[position] = e.detail
+    return np.array(rows, dtype=np.float64).reshape(-1, N_FEATURES), errors
+
+async def iter_ndjson_lines(stream: AsyncIterator[bytes], chunk_size: int) -> AsyncIterator[List[Tuple[int, bytes]]]:
+    """
+    Split a streamed NDJSON body into chunks of non-blank lines
+
+    Args:
+        stream: Body data as it arrives
+        chunk_size: Lines per chunk
+
+    Yields:
+        Lists of up to chunk_size (line number, line) pairs, numbered from 1
+
+    Raises:
+        ValueError: If a line is longer than MAX_LINE_BYTES
+    """
+    lines, pending, line_number = [], b"", 0
+    async for data in stream:
+        *complete, pending = (pending + data).split(b"\n")
+        if len(pending) > MAX_LINE_BYTES:
+            raise ValueError(f"Line {line_number + len(complete) + 1} is longer than {MAX_LINE_BYTES} bytes")
+        for line in complete:
+            line_number += 1
+            if line.strip():
+                lines.append((line_number, line))
+                if len(lines) == chunk_size:
+                    yield lines
+                    lines = []
+    if pending.strip():
+        lines.append((line_number + 1, pending))
+    if lines:
+        yield lines
+
+def _parse(body: bytes) -> Any:
+    """Parse a JSON body, reporting a missing or malformed body the way FastAPI does"""
+    if not body:
+        raise RequestValidationError([{"type": "missing", "loc": ("body",), "msg": "Field required", "input": None}])
+    try:
+        # pydantic's JSON parser is several times faster than json.loads on small bodies
+        return pydantic_core.from_json(body)
+    except ValueError:
+        pass
+    # Parse again with json.loads for the error position FastAPI reports
+    try:
+        return json.loads(body)
+    except json.JSONDecodeError as e:
+        raise RequestValidationError([
+            {"type": "json_invalid", "loc": ("body", e.pos), "msg": "JSON decode error", "input": {}, "ctx": {"error": e.msg}}
+        ])
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail="There was an error parsing the body")
+
+def _in_bounds(features: np.ndarray) -> bool:
+    """
+    Check every value against its feature's limits in one vectorized pass
+
+    NaN fails the comparison and infinity the limits, so only finite values within
+    bounds pass. Integer features must also be whole numbers, the fractional
+    features are multiplied by 0 and always pass that test.
+    """
+    valid = (np.abs(features - _CENTER) <= _RADIUS) & (np.fmod(features * _INTEGER, 1) == 0)
+    return np.count_nonzero(valid) == features.size
+
+def _patient_values(patient: PatientData) -> List[float]:
+    """Read the features of a validated patient in training order"""
+    return [getattr(patient, column) for column in FEATURE_COLUMNS]
+
+def _validation_error(error: ValidationError) -> RequestValidationError:
+    """Turn pydantic errors into request errors located in the body"""
+    return RequestValidationError([dict(item, loc=("body",) + tuple(item["loc"])) for item in error.errors()])
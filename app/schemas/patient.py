@@ -1,23 +1,55 @@
-from pydantic import BaseModel
-from typing import Dict, Optional
+from pydantic import BaseModel, Field
+from typing import Any, Dict, List, Optional
+
+# Feature columns in the order the models were trained on, shared by the
+# training script, request decoding and bulk scoring
+FEATURE_COLUMNS = [
+    'age', 'sex', 'cp', 'trestbps', 'chol', 'fbs', 'restecg',
+    'thalach', 'exang', 'oldpeak', 'slope', 'ca', 'thal'
+]
+
+# Accepted (minimum, maximum) of every feature, wide enough for any plausible patient
+FEATURE_BOUNDS = {
+    'age': (0, 120),
+    'sex': (0, 1),
+    'cp': (0, 3),
+    'trestbps': (50, 250),
+    'chol': (50, 700),
+    'fbs': (0, 1),
+    'restecg': (0, 2),
+    'thalach': (50, 250),
+    'exang': (0, 1),
+    'oldpeak': (0, 10),
+    'slope': (0, 2),
+    'ca': (0, 4),
+    'thal': (0, 3)
+}
+
+# Categorical features, which must be whole numbers
+INTEGER_FEATURES = {'sex', 'cp', 'fbs', 'restecg', 'exang', 'slope', 'ca', 'thal'}
+
+def _bounds(name: str) -> Any:
+    """Field limits of a feature from FEATURE_BOUNDS"""
+    minimum, maximum = FEATURE_BOUNDS[name]
+    return Field(ge=minimum, le=maximum)
 
 class PatientData(BaseModel):
-    age: float
-    sex: int  # 1 = male, 0 = female
-    cp: int  # Chest Pain Type (0-3)
-    trestbps: float  # Resting Blood Pressure (in mm Hg)
-    chol: float  # Serum Cholesterol (in mg/dl)
-    fbs: int  # Fasting Blood Sugar > 120 mg/dl (1 = true, 0 = false)
-    restecg: int  # Resting ECG Results (0-2)
-    thalach: float  # Maximum Heart Rate Achieved
-    exang: int  # Exercise Induced Angina (1 = yes, 0 = no)
-    oldpeak: float  # ST Depression Induced by Exercise
-    slope: int  # Slope of Peak Exercise ST Segment (0-2)
-    ca: int  # Number of Major Vessels Colored by Fluoroscopy (0-3)
-    thal: int  # Thalassemia (0 = normal, 1 = fixed defect, 2 = reversible defect)
+    age: float = _bounds('age')
+    sex: int = _bounds('sex')  # 1 = male, 0 = female
+    cp: int = _bounds('cp')  # Chest Pain Type (0-3)
+    trestbps: float = _bounds('trestbps')  # Resting Blood Pressure (in mm Hg)
+    chol: float = _bounds('chol')  # Serum Cholesterol (in mg/dl)
+    fbs: int = _bounds('fbs')  # Fasting Blood Sugar > 120 mg/dl (1 = true, 0 = false)
+    restecg: int = _bounds('restecg')  # Resting ECG Results (0-2)
+    thalach: float = _bounds('thalach')  # Maximum Heart Rate Achieved
+    exang: int = _bounds('exang')  # Exercise Induced Angina (1 = yes, 0 = no)
+    oldpeak: float = _bounds('oldpeak')  # ST Depression Induced by Exercise
+    slope: int = _bounds('slope')  # Slope of Peak Exercise ST Segment (0-2)
+    ca: int = _bounds('ca')  # Number of Major Vessels Colored by Fluoroscopy (0-4)
+    thal: int = _bounds('thal')  # Thalassemia (0 = normal, 1 = fixed defect, 2 = reversible defect)
 
     class Config:
-        schema_extra = {
+        json_schema_extra = {
             "example": {
                 "age": 63,
                 "sex": 1,
@@ -46,6 +78,8 @@ class AllPredictionsResponse(BaseModel):
     consensus_risk_level: str
     recommendation: str
     model_agreement_percentage: float
+    skipped_models: List[str] = []  # Models fast consensus did not need to run
+    estimated_latency_saved_ms: float = 0.0
 
 class SingleModelResponse(BaseModel):
     model: str
@@ -53,3 +87,9 @@ class SingleModelResponse(BaseModel):
     probability: float
     risk_level: str
     recommendation: str
+
+class BatchPredictionsResponse(BaseModel):
+    results: List[AllPredictionsResponse]
+
+class BatchSingleModelResponse(BaseModel):
+    results: List[SingleModelResponse]
@@ -0,0 +1,88 @@
+from typing import Any, Dict, List, Optional
+
+from app.models.predictor import HeartDiseasePredictor
+from app.services.metrics import Stopwatch
+
+# Recommendation of each consensus prediction, shared by every response
+RECOMMENDATIONS = {
+    0: "Continue maintaining a healthy lifestyle with regular check-ups.",
+    1: "Please consult a healthcare professional for a thorough evaluation."
+}
+
+# Fixed consensus fields of the all-model response for each consensus prediction
+_CONSENSUS_FIELDS = {
+    prediction: {
+        "consensus_prediction": prediction,
+        "consensus_risk_level": HeartDiseasePredictor._risk_level(prediction),
+        "recommendation": recommendation
+    }
+    for prediction, recommendation in RECOMMENDATIONS.items()
+}
+
+def recommendation(prediction: int) -> str:
+    """Create a recommendation based on a prediction"""
+    return RECOMMENDATIONS[1 if prediction == 1 else 0]
+
+def all_predictions_content(predictor: HeartDiseasePredictor, all_predictions: Dict[str, Dict[str, Any]],
+                            watch: Optional[Stopwatch] = None, model_names: Optional[List[str]] = None,
+                            compact: bool = False) -> Dict[str, Any]:
+    """
+    Build the consensus response from the predictions of all models of the ensemble
+
+    The content is plain data in the AllPredictionsResponse layout, or in the
+    compact layout with only the numeric fields and [prediction, probability]
+    per model.
+    """
+    # Get consensus prediction
+    consensus, risk_level, agreement = predictor.get_consensus_prediction(all_predictions)
+    if watch is not None:
+        watch.lap("consensus")
+    if consensus is None:
+        raise ValueError("No model produced a prediction")
+
+    # Models of the ensemble without a prediction were skipped by fast consensus
+    skipped_models = [model_key for model_key in predictor.ensemble_keys(model_names) if model_key not in all_predictions]
+    latency_saved_ms = predictor.estimated_latency(skipped_models) * 1000 if skipped_models else 0.0
+
+    if compact:
+        return {
+            "predictions": {
+                model_key: [pred["prediction"], pred["probability"] if pred["probability"] is not None else 0.0]
+                for model_key, pred in all_predictions.items() if pred["prediction"] is not None
+            },
+            "consensus_prediction": consensus,
+            "model_agreement_percentage": agreement,
+            "estimated_latency_saved_ms": latency_saved_ms
+        }
+
+    # The predictor's risk level strings are constants, so they are shared rather than copied
+    formatted_predictions = {
+        model_key: {
+            "prediction": pred["prediction"],
+            "probability": pred["probability"] if pred["probability"] is not None else 0.0,
+            "risk_level": pred["risk_level"]
+        }
+        for model_key, pred in all_predictions.items() if pred["prediction"] is not None
+    }
+
+    return {
+        "predictions": formatted_predictions,
+        **_CONSENSUS_FIELDS[consensus],
+        "model_agreement_percentage": agreement,
+        "skipped_models": skipped_models,
+        "estimated_latency_saved_ms": latency_saved_ms
+    }
+
+def single_model_content(model_name: str, prediction: int, probability: Optional[float], risk_level: str,
+                         compact: bool = False) -> Dict[str, Any]:
+    """Build the response of one model's prediction in the SingleModelResponse or the compact layout"""
+    probability = float(probability) if probability is not None else 0.0
+    if compact:
+        return {"prediction": prediction, "probability": probability}
+    return {
+        "model": model_name,
+        "prediction": prediction,
+        "probability": probability,
+        "risk_level": risk_level,
+        "recommendation": recommendation(prediction)
+    }
@@ -0,0 +1,153 @@
+import asyncio
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.services.executor import ExecutorSaturatedError, InferenceExecutor
+
+class MicroBatcher:
+    """
+    Collects concurrent single-row predictions into one feature matrix.
+    
+    A row that arrives while no batch is pending or running and the inference
+    executor is idle is dispatched at once, since nothing would batch with it.
+    Otherwise the first row to arrive opens a batch window. The batch is dispatched
+    to the inference executor when the window closes or when it reaches the maximum
+    size, and every waiting caller receives the result for its own row.
+    """
+    
+    def __init__(self, predict_batch: Callable[[np.ndarray], List[Any]], executor: InferenceExecutor,
+                 max_batch_size: int, max_wait_ms: float):
+        """
+        Initialize the batcher
+        
+        Args:
+            predict_batch: Function mapping a 2D feature matrix to one result per row
+            executor: Executor that runs the batched inference
+            max_batch_size: Maximum number of rows per batch
+            max_wait_ms: How long the first row of a batch waits for others while
+                the executor is busy, 0 dispatches every row immediately
+        """
+        self.predict_batch = predict_batch
+        self.executor = executor
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait_ms = max(0.0, max_wait_ms)
+        self._pending: List[Tuple[np.ndarray, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        # Batches dispatched and not finished yet, counted before they reach the executor
+        self._running = 0
+        
+        # Histogram of dispatched batch sizes, keyed by power-of-two upper bound
+        self._bucket_bounds = self._make_bucket_bounds(self.max_batch_size)
+        self._bucket_counts = [0] * len(self._bucket_bounds)
+        self._batches = 0
+        self._rows = 0
+    
+    @staticmethod
+    def _make_bucket_bounds(max_batch_size: int) -> List[int]:
+        """Create power-of-two histogram bounds up to the maximum batch size"""
+        bounds = []
+        bound = 1
+        while bound < max_batch_size:
+            bounds.append(bound)
+            bound *= 2
+        bounds.append(max_batch_size)
+        return bounds
+    
+    async def submit(self, features: np.ndarray) -> Any:
+        """
+        Queue one row of features and wait for its prediction
+        
+        Args:
+            features: 1D array of features for a single patient
+            
+        Returns:
+            The result produced by predict_batch for this row
+        """
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((features, future))
+        
+        if len(self._pending) >= self.max_batch_size or self.max_wait_ms == 0 or self._idle():
+            self._flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.max_wait_ms / 1000, self._flush)
+        
+        return await future
+    
+    def _idle(self) -> bool:
+        """Whether a lone pending row would wait for nothing"""
+        return len(self._pending) == 1 and self._running == 0 and self.executor.idle
+    
+    def _flush(self) -> None:
+        """Dispatch the pending rows as one batch"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        
+        batch, self._pending = self._pending, []
+        if batch:
+            self._record(len(batch))
+            self._running += 1
+            asyncio.ensure_future(self._dispatch(batch))
+    
+    async def _dispatch(self, batch: List[Tuple[np.ndarray, asyncio.Future]]) -> None:
+        """Run a dispatched batch and count it as finished"""
+        try:
+            await self._run(batch)
+        finally:
+            self._running -= 1
+    
+    async def _run(self, batch: List[Tuple[np.ndarray, asyncio.Future]]) -> None:
+        """Run a batch and fan the results out to the waiting callers"""
+        try:
+            matrix = np.vstack([features for features, _ in batch])
+            results = await self.executor.run(self.predict_batch, matrix)
+        except Exception as e:
+            if len(batch) == 1 or isinstance(e, ExecutorSaturatedError):
+                for _, future in batch:
+                    self._resolve(future, exception=e)
+                return
+            # Retry row by row so one bad input does not fail its neighbours
+            await asyncio.gather(*(self._run([item]) for item in batch))
+            return
+        
+        for (_, future), result in zip(batch, results):
+            self._resolve(future, result=result)
+    
+    @staticmethod
+    def _resolve(future: asyncio.Future, result: Any = None, exception: Optional[Exception] = None) -> None:
+        """Complete a caller's future unless the caller has gone away"""
+        if future.done():
+            return
+        if exception is not None:
+            future.set_exception(exception)
+        else:
+            future.set_result(result)
+    
+    def _record(self, batch_size: int) -> None:
+        """Add a dispatched batch to the size histogram"""
+        self._batches += 1
+        self._rows += batch_size
+        for index, bound in enumerate(self._bucket_bounds):
+            if batch_size <= bound:
+                self._bucket_counts[index] += 1
+                break
+    
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get the batching configuration and achieved batch sizes
+        
+        Returns:
+            Dictionary with batch counts and a histogram of batch sizes keyed
+            by the inclusive upper bound of each bucket
+        """
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait_ms,
+            "batches": self._batches,
+            "rows": self._rows,
+            "mean_batch_size": self._rows / self._batches if self._batches else 0.0,
+            "batch_size_histogram": {
+                str(bound): count for bound, count in zip(self._bucket_bounds, self._bucket_counts)
+            }
+        }
@@ -0,0 +1,94 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+class PredictionCache:
+    """
+    Bounded LRU cache for prediction results with an optional time to live
+    
+    The cache is shared by the inference threads, so every operation holds a lock.
+    """
+    
+    def __init__(self, max_size: int, ttl_seconds: Optional[float] = None):
+        """
+        Initialize the cache
+        
+        Args:
+            max_size: Maximum number of cached results
+            ttl_seconds: Seconds a result stays valid, None or 0 keeps results
+                until they are evicted
+        """
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds or None
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+    
+    def get(self, key: Hashable) -> Optional[Any]:
+        """
+        Look up a cached result and mark it as recently used
+        
+        Args:
+            key: Cache key
+            
+        Returns:
+            The cached value, or None on a miss or an expired entry
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._misses += 1
+                return None
+            
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._entries[key]
+                self._misses += 1
+                return None
+            
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return value
+    
+    def put(self, key: Hashable, value: Any) -> None:
+        """
+        Store a result, evicting the least recently used entries beyond the maximum size
+        
+        Args:
+            key: Cache key
+            value: Result to cache
+        """
+        expires_at = time.monotonic() + self.ttl_seconds if self.ttl_seconds else None
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+    
+    def clear(self) -> None:
+        """Drop every cached result"""
+        with self._lock:
+            self._entries.clear()
+    
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get the cache size and hit/miss counters
+        
+        Returns:
+            Dictionary with size, limits, hits, misses, evictions and hit ratio
+        """
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+                "hit_ratio": self._hits / lookups if lookups else 0.0
+            }
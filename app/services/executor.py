@@ -0,0 +1,80 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict
+
+class ExecutorSaturatedError(Exception):
+    """Raised when the inference executor has no room for another job"""
+
+class InferenceExecutor:
+    """
+    Runs CPU-bound inference in a bounded thread pool so the event loop stays responsive.
+    
+    NumPy and scikit-learn release the GIL inside their heavy kernels, so threads are
+    enough to keep the loop free without copying the models into separate processes.
+    """
+    
+    def __init__(self, max_workers: int, max_queue_size: int):
+        """
+        Initialize the executor
+        
+        Args:
+            max_workers: Number of inference threads
+            max_queue_size: Number of jobs allowed to wait for a free thread
+                before new jobs are rejected
+        """
+        self.max_workers = max_workers
+        self.max_queue_size = max_queue_size
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="inference")
+        # Only touched from the event loop thread, so no lock is needed
+        self._in_flight = 0
+        self._rejected = 0
+    
+    async def run(self, func: Callable[..., Any], *args: Any) -> Any:
+        """
+        Run a function in the inference pool and wait for its result
+        
+        Args:
+            func: Function to call
+            *args: Positional arguments for the function
+            
+        Returns:
+            The function's return value
+            
+        Raises:
+            ExecutorSaturatedError: If all threads are busy and the queue is full
+        """
+        if self._in_flight >= self.max_workers + self.max_queue_size:
+            self._rejected += 1
+            raise ExecutorSaturatedError("Inference queue is full, please retry later")
+        
+        self._in_flight += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._pool, functools.partial(func, *args))
+        finally:
+            self._in_flight -= 1
+    
+    @property
+    def idle(self) -> bool:
+        """Whether no inference job is running or waiting for a thread"""
+        return self._in_flight == 0
+    
+    def stats(self) -> Dict[str, int]:
+        """
+        Get the current load of the executor
+        
+        Returns:
+            Dictionary with worker, queue and rejection counts
+        """
+        return {
+            "max_workers": self.max_workers,
+            "max_queue_size": self.max_queue_size,
+            "in_flight": self._in_flight,
+            "queued": max(0, self._in_flight - self.max_workers),
+            "rejected": self._rejected
+        }
+    
+    def shutdown(self) -> None:
+        """Wait for running jobs to finish and stop the worker threads"""
+        self._pool.shutdown(wait=True)
@@ -0,0 +1,629 @@
+import json
+import multiprocessing
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.models.predictor import HeartDiseasePredictor
+from app.schemas.encoding import dumps
+from app.schemas.patient import FEATURE_COLUMNS
+from app.schemas.responses import all_predictions_content
+
+# Jobs are 'queued', 'running', 'completed' or 'failed', and do not change again once finished
+FINISHED_STATES = ('completed', 'failed')
+
+# Predictor of a job worker process, created by _init_worker
+_predictor: Optional[HeartDiseasePredictor] = None
+
+def _init_worker(options: Dict[str, Any]) -> None:
+    """Load the models in a job worker process"""
+    global _predictor
+    _predictor = HeartDiseasePredictor(**options)
+
+def _score_chunk(features: np.ndarray, model_names: Optional[List[str]], fast: Optional[bool], compact: bool) -> bytes:
+    """Score one chunk of a job in a worker process and encode its results as a JSON array"""
+    batch_predictions = _predictor.predict_batch_with_all_models(features, model_names, fast)
+    return dumps([
+        all_predictions_content(_predictor, all_predictions, model_names=model_names, compact=compact)
+        for all_predictions in batch_predictions
+    ])
+
+class JobNotFoundError(Exception):
+    """Raised when a job is not in the job store"""
+
+class JobStore:
+    """
+    SQLite-backed store of prediction jobs and their chunks.
+    
+    The features of a job are split into chunks when it is submitted. A chunk row
+    holds its features as raw float64 bytes until it is scored, then its results
+    as an encoded JSON array, so results are served without decoding them again.
+    The API threads and the job dispatcher share one connection under a lock.
+    
+    Every API process of a server runs its own dispatcher on the same database.
+    A dispatcher claims a chunk by writing its owner id and a lease expiry into it
+    within one write transaction, stores the results only while it still owns the
+    chunk, and takes over the chunks whose lease has expired.
+    """
+    
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS jobs (
+            id TEXT PRIMARY KEY,
+            status TEXT NOT NULL,
+            options TEXT NOT NULL,
+            rows INTEGER NOT NULL,
+            rows_done INTEGER NOT NULL DEFAULT 0,
+            chunks INTEGER NOT NULL,
+            chunks_done INTEGER NOT NULL DEFAULT 0,
+            error TEXT,
+            created_at REAL NOT NULL,
+            started_at REAL,
+            finished_at REAL
+        );
+        CREATE TABLE IF NOT EXISTS chunks (
+            job_id TEXT NOT NULL,
+            chunk INTEGER NOT NULL,
+            rows INTEGER NOT NULL,
+            status TEXT NOT NULL,
+            features BLOB,
+            result BLOB,
+            owner TEXT,
+            lease_until REAL,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (job_id, chunk)
+        );
+        CREATE INDEX IF NOT EXISTS chunks_status ON chunks (status);
+    """
+    
+    # Columns added to the chunks table since its first version, with their definitions
+    CHUNK_COLUMNS = {
+        "owner": "TEXT",
+        "lease_until": "REAL",
+        "attempts": "INTEGER NOT NULL DEFAULT 0"
+    }
+    
+    def __init__(self, path: str):
+        """
+        Open the job store, creating the database if needed
+        
+        Args:
+            path: Path of the SQLite database file
+        """
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        # Write transactions start with BEGIN IMMEDIATE, so they take the database's
+        # write lock before reading and no other process can claim the same chunks
+        self._conn = sqlite3.connect(path, timeout=30.0, check_same_thread=False, isolation_level='IMMEDIATE')
+        # Readers never wait for the dispatcher's writes in write-ahead logging mode
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(self.SCHEMA)
+        self._migrate()
+        self._lock = threading.Lock()
+    
+    def _migrate(self) -> None:
+        """Add the columns a job store created by an older version lacks"""
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(chunks)")}
+        with self._conn:
+            for column, definition in self.CHUNK_COLUMNS.items():
+                if column not in columns:
+                    self._conn.execute(f"ALTER TABLE chunks ADD COLUMN {column} {definition}")
+    
+    def close(self) -> None:
+        """Close the database connection"""
+        with self._lock:
+            self._conn.close()
+    
+    @staticmethod
+    def _status(row: Tuple) -> Dict[str, Any]:
+        """Job status dictionary of a jobs table row"""
+        job_id, status, rows, rows_done, chunks, chunks_done, error, created_at, started_at, finished_at = row
+        return {
+            "job_id": job_id,
+            "status": status,
+            "rows": rows,
+            "rows_done": rows_done,
+            "chunks": chunks,
+            "chunks_done": chunks_done,
+            "progress": rows_done / rows if rows else 1.0,
+            "error": error,
+            "created_at": created_at,
+            "started_at": started_at,
+            "finished_at": finished_at
+        }
+    
+    def _get(self, job_id: str) -> Dict[str, Any]:
+        row = self._conn.execute(
+            "SELECT id, status, rows, rows_done, chunks, chunks_done, error, created_at, started_at, finished_at "
+            "FROM jobs WHERE id = ?", (job_id,)
+        ).fetchone()
+        if row is None:
+            raise JobNotFoundError(f"Job '{job_id}' not found")
+        return self._status(row)
+    
+    def create(self, features: np.ndarray, chunk_size: int, options: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Add a job and split its features into queued chunks
+        
+        Args:
+            features: 2D array of shape (n_patients, n_features)
+            chunk_size: Rows per chunk
+            options: Prediction options passed to every chunk
+        
+        Returns:
+            Status of the new job, already completed when it has no rows
+        """
+        features = np.ascontiguousarray(features, dtype=np.float64)
+        job_id = uuid.uuid4().hex
+        starts = range(0, len(features), chunk_size)
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO jobs (id, status, options, rows, chunks, created_at, finished_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (job_id, 'queued' if len(starts) else 'completed', json.dumps(options), len(features), len(starts),
+                 now, None if len(starts) else now)
+            )
+            self._conn.executemany(
+                "INSERT INTO chunks (job_id, chunk, rows, status, features) VALUES (?, ?, ?, 'queued', ?)",
+                (
+                    (job_id, index, len(features[start:start + chunk_size]), features[start:start + chunk_size].tobytes())
+                    for index, start in enumerate(starts)
+                )
+            )
+            return self._get(job_id)
+    
+    def get(self, job_id: str) -> Dict[str, Any]:
+        """
+        Get the status and progress of a job
+        
+        Raises:
+            JobNotFoundError: If the job does not exist
+        """
+        with self._lock:
+            return self._get(job_id)
+    
+    def results(self, job_id: str) -> Tuple[Dict[str, Any], int]:
+        """
+        Get the status of a job and how many of its chunks have results to serve
+        
+        Returns:
+            The job status and the number of chunks finished so far in row order,
+            up to the first chunk that is not finished
+        
+        Raises:
+            JobNotFoundError: If the job does not exist
+        """
+        with self._lock:
+            status = self._get(job_id)
+            pending, = self._conn.execute(
+                "SELECT MIN(chunk) FROM chunks WHERE job_id = ? AND status != 'done'", (job_id,)
+            ).fetchone()
+            return status, status["chunks"] if pending is None else pending
+    
+    def chunk_results(self, job_id: str, start: int, limit: int) -> List[bytes]:
+        """
+        Get the results of consecutive finished chunks of a job
+        
+        Args:
+            job_id: Id of the job
+            start: Index of the first chunk
+            limit: Maximum number of chunks
+        
+        Returns:
+            The encoded JSON arrays of the chunks in row order, up to the first chunk
+            that is not finished, empty once the job is deleted
+        """
+        with self._lock:
+            results = []
+            for chunk_status, result in self._conn.execute(
+                "SELECT status, result FROM chunks WHERE job_id = ? AND chunk >= ? ORDER BY chunk LIMIT ?",
+                (job_id, start, limit)
+            ):
+                if chunk_status != 'done':
+                    break
+                results.append(result)
+            return results
+    
+    def claim(self, limit: int, owner: str, lease: float) -> List[Tuple[str, int, int, int, np.ndarray, Dict[str, Any]]]:
+        """
+        Mark the oldest queued chunks as running under an owner
+        
+        The chunks are selected and updated by one statement in a write
+        transaction, so a chunk is claimed by one dispatcher only.
+        
+        Args:
+            limit: Maximum number of chunks to claim
+            owner: Id of the claiming dispatcher
+            lease: Seconds the chunks stay claimed unless the lease is renewed
+        
+        Returns:
+            Job id, chunk index, row count, attempt number, features and job options
+            of each claimed chunk, oldest first
+        """
+        now = time.time()
+        with self._lock, self._conn:
+            rows = self._conn.execute(
+                "UPDATE chunks SET status = 'running', owner = ?, lease_until = ?, attempts = attempts + 1 "
+                "WHERE rowid IN (SELECT chunks.rowid FROM chunks JOIN jobs ON jobs.id = chunks.job_id "
+                "WHERE chunks.status = 'queued' ORDER BY jobs.created_at, chunks.chunk LIMIT ?) AND status = 'queued' "
+                "RETURNING job_id, chunk, rows, attempts, features",
+                (owner, now + lease, limit)
+            ).fetchall()
+            if not rows:
+                return []
+            job_ids = sorted({row[0] for row in rows})
+            self._conn.executemany(
+                "UPDATE jobs SET status = 'running', started_at = COALESCE(started_at, ?) WHERE id = ? AND status = 'queued'",
+                ((now, job_id) for job_id in job_ids)
+            )
+            jobs = {
+                job_id: (created_at, options) for job_id, created_at, options in self._conn.execute(
+                    f"SELECT id, created_at, options FROM jobs WHERE id IN ({', '.join('?' * len(job_ids))})", job_ids
+                )
+            }
+        # RETURNING gives the rows in no particular order
+        rows.sort(key=lambda row: (jobs[row[0]][0], row[1]))
+        return [
+            (job_id, chunk, n_rows, attempts,
+             np.frombuffer(features, dtype=np.float64).reshape(n_rows, len(FEATURE_COLUMNS)), json.loads(jobs[job_id][1]))
+            for job_id, chunk, n_rows, attempts, features in rows
+        ]
+    
+    def renew(self, owner: str, lease: float) -> int:
+        """
+        Extend the lease of every chunk an owner is scoring
+        
+        Args:
+            owner: Id of the dispatcher
+            lease: Seconds from now the chunks stay claimed
+        
+        Returns:
+            Number of chunks whose lease was extended
+        """
+        with self._lock, self._conn:
+            return self._conn.execute(
+                "UPDATE chunks SET lease_until = ? WHERE owner = ? AND status = 'running'", (time.time() + lease, owner)
+            ).rowcount
+    
+    def complete_chunk(self, job_id: str, chunk: int, rows: int, result: bytes, owner: str) -> bool:
+        """
+        Store the results of a chunk and complete its job with the last one
+        
+        Returns:
+            False, storing nothing, when the chunk is no longer running under the owner,
+            because its lease expired and another dispatcher took it over
+        """
+        with self._lock, self._conn:
+            stored = self._conn.execute(
+                "UPDATE chunks SET status = 'done', features = NULL, result = ?, owner = NULL, lease_until = NULL "
+                "WHERE job_id = ? AND chunk = ? AND status = 'running' AND owner = ?",
+                (result, job_id, chunk, owner)
+            ).rowcount
+            if not stored:
+                return False
+            # SET expressions see the values before the update
+            self._conn.execute(
+                "UPDATE jobs SET chunks_done = chunks_done + 1, rows_done = rows_done + ?, "
+                "status = CASE WHEN chunks_done + 1 = chunks THEN 'completed' ELSE status END, "
+                "finished_at = CASE WHEN chunks_done + 1 = chunks THEN ? ELSE finished_at END "
+                "WHERE id = ? AND status = 'running'",
+                (rows, time.time(), job_id)
+            )
+            return True
+    
+    def fail(self, job_id: str, error: str) -> None:
+        """Mark a job as failed and cancel its chunks that have not run yet"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE jobs SET status = 'failed', error = ?, finished_at = ? WHERE id = ? AND status NOT IN ('completed', 'failed')",
+                (error, time.time(), job_id)
+            )
+            self._conn.execute(
+                "UPDATE chunks SET status = 'cancelled', features = NULL WHERE job_id = ? AND status IN ('queued', 'running')",
+                (job_id,)
+            )
+    
+    def requeue_expired(self) -> int:
+        """
+        Queue the running chunks whose lease has expired again
+        
+        Their dispatcher stopped renewing the lease, because its process exited.
+        
+        Returns:
+            Number of chunks queued again
+        """
+        with self._lock, self._conn:
+            return self._conn.execute(
+                "UPDATE chunks SET status = 'queued', owner = NULL, lease_until = NULL "
+                "WHERE status = 'running' AND (lease_until IS NULL OR lease_until < ?)", (time.time(),)
+            ).rowcount
+    
+    def release(self, owner: str, job_id: Optional[str] = None, chunk: Optional[int] = None) -> int:
+        """
+        Queue chunks an owner claimed but will not score again
+        
+        Args:
+            owner: Id of the dispatcher
+            job_id: Job of the chunk to queue again, None for every chunk of the owner
+            chunk: Index of the chunk to queue again
+        
+        Returns:
+            Number of chunks queued again
+        """
+        with self._lock, self._conn:
+            if job_id is None:
+                cursor = self._conn.execute(
+                    "UPDATE chunks SET status = 'queued', owner = NULL, lease_until = NULL "
+                    "WHERE owner = ? AND status = 'running'", (owner,)
+                )
+            else:
+                cursor = self._conn.execute(
+                    "UPDATE chunks SET status = 'queued', owner = NULL, lease_until = NULL "
+                    "WHERE job_id = ? AND chunk = ? AND owner = ? AND status = 'running'",
+                    (job_id, chunk, owner)
+                )
+            return cursor.rowcount
+    
+    def delete(self, job_id: str) -> None:
+        """
+        Delete a job and its chunks, cancelling the chunks that have not run yet
+        
+        Raises:
+            JobNotFoundError: If the job does not exist
+        """
+        with self._lock, self._conn:
+            if self._conn.execute("DELETE FROM jobs WHERE id = ?", (job_id,)).rowcount == 0:
+                raise JobNotFoundError(f"Job '{job_id}' not found")
+            self._conn.execute("DELETE FROM chunks WHERE job_id = ?", (job_id,))
+    
+    def purge(self, finished_before: float) -> int:
+        """
+        Delete the jobs that finished before a point in time
+        
+        Args:
+            finished_before: Unix timestamp
+        
+        Returns:
+            Number of jobs deleted
+        """
+        with self._lock, self._conn:
+            job_ids = [
+                (job_id,) for job_id, in self._conn.execute(
+                    "SELECT id FROM jobs WHERE finished_at < ?", (finished_before,)
+                )
+            ]
+            self._conn.executemany("DELETE FROM chunks WHERE job_id = ?", job_ids)
+            self._conn.executemany("DELETE FROM jobs WHERE id = ?", job_ids)
+            return len(job_ids)
+
+class JobQueue:
+    """
+    Scores the chunks of queued jobs in a pool of worker processes.
+    
+    A dispatcher thread claims queued chunks from the job store, keeps up to two
+    chunks per worker in flight and stores each result as soon as it arrives. The
+    workers are separate processes with their own copy of the models, so they do not
+    share the GIL with the API and throughput grows with the number of cores. The
+    pool is replaced after a hot reload, so chunks claimed afterwards are scored by
+    the new models.
+    
+    The claimed chunks are leased to this queue and the dispatcher renews the lease
+    while they are being scored. Chunks of a process that exited are queued again
+    once their lease expires, by whichever queue notices first, and chunks lost to
+    a crashed worker process are retried a few times before their job fails.
+    """
+    
+    # Seconds between purges of expired jobs
+    PURGE_INTERVAL = 60.0
+    
+    # Seconds a claimed chunk stays leased without a renewal, and between renewals
+    LEASE_SECONDS = 60.0
+    RENEW_INTERVAL = 15.0
+    
+    # Times a chunk is scored before a worker crash fails its job
+    MAX_ATTEMPTS = 3
+    
+    def __init__(self, store: JobStore, predictor: HeartDiseasePredictor, workers: int,
+                 chunk_size: int, retention: float = 0.0):
+        """
+        Initialize the job queue
+        
+        Args:
+            store: Job store holding the jobs and their chunks
+            predictor: Predictor of the API, whose options and model set version
+                the worker processes follow
+            workers: Number of worker processes
+            chunk_size: Rows per chunk
+            retention: Seconds finished jobs are kept, 0 keeps them until deleted
+        """
+        self.store = store
+        self.predictor = predictor
+        self.workers = max(1, workers)
+        self.chunk_size = max(1, chunk_size)
+        self.retention = retention
+        # Identifies the chunks claimed by this queue in the shared job store
+        self.owner = f"{os.getpid()}-{uuid.uuid4().hex}"
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._pool_version = None
+        self._pool_broken = False
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        # Updated from the pool's result thread and read by the dispatcher
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._chunks_done = 0
+        self._chunks_failed = 0
+        self._rows_done = 0
+    
+    def start(self) -> None:
+        """Start dispatching, after queueing the chunks whose lease has expired again"""
+        self._requeue_expired()
+        self._thread = threading.Thread(target=self._run, name="job-dispatcher", daemon=True)
+        self._thread.start()
+    
+    def stop(self) -> None:
+        """
+        Stop dispatching, wait for the running chunks and close the job store
+        
+        Chunks waiting in the pool are cancelled and queued again for the other
+        API processes or the next start.
+        """
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+        self.store.release(self.owner)
+        self.store.close()
+    
+    def _requeue_expired(self) -> None:
+        """Queue the chunks of dispatchers that stopped renewing their lease again"""
+        requeued = self.store.requeue_expired()
+        if requeued:
+            print(f"Queued {requeued} interrupted job chunks again")
+    
+    def submit(self, features: np.ndarray, model_names: Optional[List[str]] = None,
+               fast: Optional[bool] = None, compact: bool = False) -> Dict[str, Any]:
+        """
+        Queue a batch of patients for prediction by all models of the ensemble
+        
+        Args:
+            features: 2D array of shape (n_patients, n_features)
+            model_names: Models taking part in the consensus, defaults to the configured ensemble
+            fast: Skip the models that can no longer change the majority vote,
+                defaults to the configured mode
+            compact: Store the results in the compact layout
+        
+        Returns:
+            Status of the new job
+        """
+        job = self.store.create(features, self.chunk_size, {"models": model_names, "fast": fast, "compact": compact})
+        self._wake.set()
+        return job
+    
+    def _worker_options(self) -> Dict[str, Any]:
+        """Predictor arguments making the workers score the way the API does"""
+        return {
+            "models_dir": self.predictor.models_dir,
+            "compiled": self.predictor.use_compiled,
+            "flat_forest": self.predictor.use_flat_forest,
+            "flat_knn": self.predictor.use_flat_knn,
+            "quantized": self.predictor.use_quantized,
+            "load_mode": "eager",
+            "ensemble_models": self.predictor.ensemble_models,
+            "fast_consensus": self.predictor.fast_consensus
+        }
+    
+    def _worker_pool(self) -> ProcessPoolExecutor:
+        """Get the worker pool, replacing it after a reload or a worker crash"""
+        version = self.predictor.version
+        if self._pool is not None and (self._pool_version != version or self._pool_broken):
+            # Chunks already submitted finish on the old workers
+            self._pool.shutdown(wait=False)
+            self._pool = None
+        if self._pool is None:
+            # The API process runs threads, which forked children could inherit in a locked state
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker, initargs=(self._worker_options(),)
+            )
+            self._pool_version = version
+            self._pool_broken = False
+        return self._pool
+    
+    def _run(self) -> None:
+        """Claim queued chunks whenever a worker has room for them"""
+        last_purge = 0.0
+        last_renewal = time.monotonic()
+        while not self._stop.is_set():
+            self._wake.clear()
+            with self._lock:
+                capacity = 2 * self.workers - self._in_flight
+            try:
+                claimed = self.store.claim(capacity, self.owner, self.LEASE_SECONDS) if capacity > 0 else []
+                for job_id, chunk, rows, attempts, features, options in claimed:
+                    self._dispatch(job_id, chunk, rows, attempts, features, options)
+                
+                if time.monotonic() - last_renewal > self.RENEW_INTERVAL:
+                    self.store.renew(self.owner, self.LEASE_SECONDS)
+                    self._requeue_expired()
+                    last_renewal = time.monotonic()
+                
+                if self.retention > 0 and time.monotonic() - last_purge > self.PURGE_INTERVAL:
+                    self.store.purge(time.time() - self.retention)
+                    last_purge = time.monotonic()
+            except Exception as e:
+                print(f"Job dispatcher error: {e}")
+            # Submissions and finished chunks wake the dispatcher early
+            self._wake.wait(1.0)
+    
+    def _dispatch(self, job_id: str, chunk: int, rows: int, attempts: int, features: np.ndarray,
+                  options: Dict[str, Any]) -> None:
+        """Send one chunk to the worker pool"""
+        try:
+            future = self._worker_pool().submit(_score_chunk, features, options["models"], options["fast"], options["compact"])
+        except BrokenProcessPool:
+            self._pool_broken = True
+            self.store.release(self.owner, job_id, chunk)
+            return
+        with self._lock:
+            self._in_flight += 1
+        future.add_done_callback(partial(self._chunk_done, job_id, chunk, rows, attempts))
+    
+    def _chunk_done(self, job_id: str, chunk: int, rows: int, attempts: int, future: Future) -> None:
+        """Store a chunk's results, retry it after a worker crash, or fail its job when scoring raised"""
+        try:
+            if future.cancelled():
+                return
+            error = future.exception()
+            stored = retried = False
+            if error is None:
+                stored = self.store.complete_chunk(job_id, chunk, rows, future.result(), self.owner)
+            elif isinstance(error, BrokenProcessPool):
+                # A crashed worker breaks every chunk in the pool, not only the one that crashed it
+                self._pool_broken = True
+                if attempts < self.MAX_ATTEMPTS:
+                    retried = self.store.release(self.owner, job_id, chunk) > 0
+                else:
+                    self.store.fail(job_id, f"A job worker process exited unexpectedly, {attempts} times")
+            else:
+                self.store.fail(job_id, str(error))
+            with self._lock:
+                if stored:
+                    self._chunks_done += 1
+                    self._rows_done += rows
+                elif error is not None and not retried:
+                    self._chunks_failed += 1
+        except Exception as e:
+            print(f"Could not store chunk {chunk} of job {job_id}: {e}")
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+            self._wake.set()
+    
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get the worker configuration and the chunks scored by this process
+        
+        Returns:
+            Dictionary with worker, in-flight chunk and completed chunk and row counts
+        """
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "chunk_size": self.chunk_size,
+                "in_flight": self._in_flight,
+                "chunks_done": self._chunks_done,
+                "chunks_failed": self._chunks_failed,
+                "rows_done": self._rows_done
+            }
@@ -0,0 +1,269 @@
+import threading
+import time
+from bisect import bisect_left
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+from app.config import settings
+
+# Latency buckets in seconds, from the cheapest model call to a saturated request
+LATENCY_BUCKETS = (
+    0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005,
+    0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0
+)
+
+# A sample rendered by a collector: (metric name, labels, value)
+Sample = Tuple[str, Dict[str, str], float]
+
+def _format_labels(labels: Iterable[Tuple[str, str]]) -> str:
+    """Render label pairs as {name="value",...}"""
+    pairs = [f'{name}="{str(value)}"' for name, value in labels]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+class Counter:
+    """
+    Monotonic counter family, one value per label combination
+    """
+    
+    def __init__(self, name: str, help_text: str, label_names: Tuple[str, ...] = (),
+                 registry: Optional["MetricsRegistry"] = None):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        # Registry whose enabled flag switches recording off, if any
+        self.registry = registry
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+    
+    def inc(self, *label_values: str, amount: float = 1.0) -> None:
+        """
+        Increase the counter
+        
+        Args:
+            *label_values: Values of the family's labels, in order
+            amount: Amount to add
+        """
+        if self.registry is not None and not self.registry.enabled:
+            return
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0.0) + amount
+    
+    def render(self) -> List[str]:
+        """Render the family in the text exposition format"""
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            values = sorted(self._values.items())
+        for label_values, value in values:
+            lines.append(f"{self.name}{_format_labels(zip(self.label_names, label_values))} {value:g}")
+        return lines
+
+class Histogram:
+    """
+    Histogram family with fixed buckets, one set of buckets per label combination
+    """
+    
+    def __init__(self, name: str, help_text: str, label_names: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = buckets
+        # label values -> [count per bucket (last is +Inf), sum]
+        self._series: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+    
+    def observe(self, value: float, *label_values: str) -> None:
+        """
+        Record one observation
+        
+        Args:
+            value: Observed value, in seconds for latencies
+            *label_values: Values of the family's labels, in order
+        """
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+    
+    def render(self) -> List[str]:
+        """Render the family in the text exposition format, with cumulative buckets"""
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = sorted((label_values, list(counts), total) for label_values, (counts, total) in self._series.items())
+        for label_values, counts, total in series:
+            labels = list(zip(self.label_names, label_values))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                lines.append(f"{self.name}_bucket{_format_labels(labels + [('le', le)])} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(labels)} {total:.9g}")
+            lines.append(f"{self.name}_count{_format_labels(labels)} {cumulative}")
+        return lines
+
+class Stopwatch:
+    """
+    Times consecutive stages of one request into the stage histogram
+    """
+    
+    def __init__(self, registry: "MetricsRegistry", route: str, start: Optional[float] = None):
+        self.registry = registry
+        self.route = route
+        self._last = start if start is not None else time.perf_counter()
+    
+    def lap(self, stage: str) -> float:
+        """
+        Record the time since the previous lap as the given stage
+        
+        Returns:
+            perf_counter() value at the end of the stage
+        """
+        now = time.perf_counter()
+        if self.registry.enabled:
+            self.registry.stage_duration.observe(now - self._last, self.route, stage)
+        self._last = now
+        return now
+
+class MetricsRegistry:
+    """
+    Process-wide metrics rendered in the Prometheus text exposition format.
+    
+    Hot paths record into fixed counters and histograms under a short lock.
+    Statistics that other components already keep, such as the cache and the
+    micro-batcher, are read by collectors only when /metrics is scraped.
+    """
+    
+    def __init__(self, enabled: bool = True):
+        """
+        Initialize the registry and the metrics recorded on the hot path
+        
+        Args:
+            enabled: Record observations, when False every recording call returns immediately
+        """
+        self.enabled = enabled
+        self.requests = Counter(
+            "heart_http_requests_total", "HTTP requests by route, method and status code",
+            ("route", "method", "status"), self
+        )
+        self.request_duration = Histogram(
+            "heart_http_request_duration_seconds", "Time from receiving a request to sending its response",
+            ("route",)
+        )
+        self.stage_duration = Histogram(
+            "heart_request_stage_duration_seconds",
+            "Time spent in each stage of a prediction request: parse, inference, consensus, response, serialize",
+            ("route", "stage")
+        )
+        self.predictor_stage_duration = Histogram(
+            "heart_predictor_stage_duration_seconds", "Time spent in each predictor stage per batch: scaling, compiled",
+            ("stage",)
+        )
+        self.model_duration = Histogram(
+            "heart_model_duration_seconds", "Time spent in one model per batch",
+            ("model",)
+        )
+        self.model_errors = Counter(
+            "heart_model_errors_total", "Model calls that raised an exception",
+            ("model",), self
+        )
+        self.consensus_skipped = Counter(
+            "heart_consensus_skipped_total", "Model runs fast consensus skipped because the majority vote was settled",
+            ("model",), self
+        )
+        self.request_errors = Counter(
+            "heart_request_errors_total", "Prediction requests that failed, by route and error type",
+            ("route", "error"), self
+        )
+        self._collectors: List[Callable[[], Iterable[Tuple[str, str, str, List[Sample]]]]] = []
+    
+    def stopwatch(self, route: str, start: Optional[float] = None) -> Stopwatch:
+        """
+        Start timing the stages of a request
+        
+        Args:
+            route: Route template used as the label of every stage
+            start: perf_counter() value of the first stage's start, defaults to now
+        """
+        return Stopwatch(self, route, start)
+    
+    def observe_stage(self, stage: str, seconds: float) -> None:
+        """Record the duration of a predictor stage"""
+        if self.enabled:
+            self.predictor_stage_duration.observe(seconds, stage)
+    
+    def observe_model(self, model_key: str, seconds: float) -> None:
+        """Record the duration of one model call"""
+        if self.enabled:
+            self.model_duration.observe(seconds, model_key)
+    
+    def register_collector(self, collector: Callable[[], Iterable[Tuple[str, str, str, List[Sample]]]]) -> None:
+        """
+        Add a callback producing (name, type, help, samples) families at scrape time
+        """
+        self._collectors.append(collector)
+    
+    def clear_collectors(self) -> None:
+        """Remove the collectors of a shut down application"""
+        self._collectors = []
+    
+    def render(self) -> str:
+        """
+        Render every metric in the Prometheus text exposition format
+        
+        Returns:
+            Text with one line per sample
+        """
+        lines = []
+        for metric in (self.requests, self.request_duration, self.stage_duration, self.predictor_stage_duration,
+                       self.model_duration, self.model_errors, self.consensus_skipped, self.request_errors):
+            lines.extend(metric.render())
+        
+        for collector in self._collectors:
+            for name, metric_type, help_text, samples in collector():
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {metric_type}")
+                for sample_name, labels, value in samples:
+                    lines.append(f"{sample_name}{_format_labels(labels.items())} {float(value):g}")
+        return "\n".join(lines) + "\n"
+
+class MetricsMiddleware:
+    """
+    ASGI middleware counting requests and timing them by route template
+    """
+    
+    def __init__(self, app: Any, registry: "MetricsRegistry"):
+        self.app = app
+        self.registry = registry
+    
+    async def __call__(self, scope: Dict[str, Any], receive: Callable, send: Callable) -> None:
+        if scope["type"] != "http" or not self.registry.enabled:
+            await self.app(scope, receive, send)
+            return
+        
+        start = time.perf_counter()
+        # Shared with the endpoint through request.state, which times the parse stage from it
+        scope.setdefault("state", {})["request_start"] = start
+        status = 500
+        
+        async def send_with_status(message: Dict[str, Any]) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+        
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = scope.get("route")
+            path = route.path if route is not None else "unmatched"
+            end = time.perf_counter()
+            self.registry.requests.inc(path, scope["method"], str(status))
+            self.registry.request_duration.observe(end - start, path)
+            
+            # Time between the handler returning and the response going out
+            handler_end = scope["state"].get("handler_end")
+            if handler_end is not None:
+                self.registry.stage_duration.observe(end - handler_end, path, "serialize")
+
+metrics = MetricsRegistry(enabled=settings.metrics_enabled)
@@ -0,0 +1,85 @@
+import os
+import threading
+from typing import Optional, Tuple
+from app.config import settings
+from app.models.model_set import ReloadInProgressError
+from app.models.predictor import HeartDiseasePredictor
+from app.models.quantized import REPORT_FILENAME
+
+class ModelDirectoryWatcher:
+    """
+    Polls the models directory and hot reloads the predictor when its artifacts change.
+    
+    A reload only starts once the directory has looked the same for two polls in a
+    row, so pickles that generate_model_pickles.py is still writing are not picked up
+    half-written. A model set that fails validation is not retried until the files
+    change again.
+    """
+    
+    def __init__(self, predictor: HeartDiseasePredictor, interval: float):
+        """
+        Initialize the watcher
+        
+        Args:
+            predictor: HeartDiseasePredictor to reload
+            interval: Seconds between polls of the models directory
+        """
+        self.predictor = predictor
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = None
+    
+    def _fingerprint(self) -> Tuple:
+        """Name, size and modification time of every model artifact and the drift report"""
+        paths = []
+        if os.path.isdir(self.predictor.models_dir):
+            paths = [
+                os.path.join(self.predictor.models_dir, name)
+                for name in sorted(os.listdir(self.predictor.models_dir))
+                if name.endswith(('.pkl', '.joblib')) or name == REPORT_FILENAME
+            ]
+        if settings.bundle_path:
+            paths.append(settings.bundle_path)
+        
+        fingerprint = []
+        for path in paths:
+            try:
+                stat = os.stat(path)
+                fingerprint.append((path, stat.st_size, stat.st_mtime_ns))
+            except FileNotFoundError:
+                continue
+        return tuple(fingerprint)
+    
+    def start(self) -> None:
+        """Start polling in a daemon thread"""
+        self._thread = threading.Thread(target=self._run, name="model-watcher", daemon=True)
+        self._thread.start()
+    
+    def stop(self) -> None:
+        """Stop polling and wait for the thread to exit"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+    
+    def _run(self) -> None:
+        """Reload whenever the artifacts changed and then stayed unchanged for one poll"""
+        loaded = self._fingerprint()
+        previous: Optional[Tuple] = loaded
+        
+        while not self._stop.wait(self.interval):
+            current = self._fingerprint()
+            stable = current == previous
+            previous = current
+            if not stable or current == loaded:
+                continue
+            
+            # Remember the attempt either way so a broken model set is not retried every poll
+            loaded = current
+            try:
+                print("Model files changed, reloading")
+                self.predictor.reload()
+            except ReloadInProgressError:
+                # A reload from the admin endpoint is already picking up the new files
+                pass
+            except Exception as e:
+                print(f"Error reloading models, keeping version {self.predictor.version}: {e}")
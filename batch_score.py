@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+"""
+Bulk Scoring for Large Patient Files
+
+This script scores CSV or Parquet files in the Data/heart.csv column layout with
+the trained models. The input is streamed in fixed-size chunks, every model runs
+vectorized over each chunk, and the scores are appended to the output file, so
+files with millions of rows never have to fit in memory.
+
+For every selected model the output holds a `<model>_prediction` and a
+`<model>_probability` column, followed by `consensus_prediction` and
+`consensus_agreement`. Rows with missing or non-numeric features are kept with
+empty scores.
+
+Usage:
+    python batch_score.py screening.csv scores.csv
+    python batch_score.py screening.parquet scores.parquet --workers 4 --chunk-size 200000
+    python batch_score.py screening.csv scores.csv --models logistic_regression_scaled,random_forest_scaled
+
+Parquet input and output require pyarrow.
+"""
+
+import argparse
+import resource
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterator, List, Optional
+import numpy as np
+import pandas as pd
+from app.models.predictor import HeartDiseasePredictor
+from app.schemas.patient import FEATURE_COLUMNS
+
+# Predictor of the current process, inherited by forked workers or created by _init_worker
+_predictor: Optional[HeartDiseasePredictor] = None
+
+def _is_parquet(path: str) -> bool:
+    return path.lower().endswith(('.parquet', '.pq'))
+
+def _parquet():
+    """Import pyarrow's Parquet module, which is only needed for Parquet files"""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        sys.exit("Error: Parquet files require pyarrow, install it with 'pip install pyarrow'")
+    return pa, pq
+
+def create_predictor(models_dir: Optional[str], use_sklearn: bool) -> HeartDiseasePredictor:
+    """
+    Load the models for bulk scoring
+
+    Args:
+        models_dir: Directory containing the model pickles or bundle
+        use_sklearn: Run every model through sklearn instead of the faster engines
+
+    Returns:
+        Predictor without a prediction cache, which bulk scoring would only fill up
+    """
+    fast = not use_sklearn
+    predictor = HeartDiseasePredictor(
+        models_dir, compiled=fast, flat_forest=fast, flat_knn=fast, load_mode='eager'
+    )
+    predictor.cache = None
+    return predictor
+
+def read_chunks(path: str, chunk_size: int) -> Iterator[pd.DataFrame]:
+    """
+    Stream an input file as DataFrames of at most chunk_size rows
+
+    Args:
+        path: CSV or Parquet file
+        chunk_size: Rows per chunk
+
+    Yields:
+        One DataFrame per chunk
+    """
+    if _is_parquet(path):
+        _, pq = _parquet()
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(path, chunksize=chunk_size)
+
+class ChunkWriter:
+    """
+    Appends scored chunks to a CSV or Parquet file
+    """
+
+    def __init__(self, path: str):
+        """
+        Initialize the writer, the file is created with the first chunk
+
+        Args:
+            path: Output file, Parquet when it ends in .parquet or .pq, CSV otherwise
+        """
+        self.path = path
+        self._file = None
+        self._parquet_writer = None
+        self._schema = None
+
+    def write(self, frame: pd.DataFrame) -> None:
+        """Append one chunk"""
+        if _is_parquet(self.path):
+            pa, pq = _parquet()
+            if self._parquet_writer is None:
+                table = pa.Table.from_pandas(frame, preserve_index=False)
+                self._schema = table.schema
+                self._parquet_writer = pq.ParquetWriter(self.path, self._schema)
+            else:
+                # Later chunks are cast to the first chunk's schema
+                table = pa.Table.from_pandas(frame, schema=self._schema, preserve_index=False)
+            self._parquet_writer.write_table(table)
+            return
+
+        first = self._file is None
+        if first:
+            self._file = open(self.path, 'w', newline='')
+        frame.to_csv(self._file, header=first, index=False)
+
+    def close(self) -> None:
+        """Flush and close the output file"""
+        if self._parquet_writer is not None:
+            self._parquet_writer.close()
+        if self._file is not None:
+            self._file.close()
+
+def extract_features(frame: pd.DataFrame) -> np.ndarray:
+    """
+    Build the feature matrix of a chunk, with NaN for missing or non-numeric values
+
+    Args:
+        frame: Chunk of the input file
+
+    Returns:
+        Float64 array of shape (n_rows, n_features)
+
+    Raises:
+        ValueError: If feature columns are missing from the input
+    """
+    missing = [column for column in FEATURE_COLUMNS if column not in frame.columns]
+    if missing:
+        raise ValueError(f"Input is missing feature columns: {', '.join(missing)}")
+
+    return np.column_stack([
+        pd.to_numeric(frame[column], errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan)
+        for column in FEATURE_COLUMNS
+    ])
+
+def score_features(predictor: HeartDiseasePredictor, features: np.ndarray,
+                   model_names: List[str]) -> Dict[str, np.ndarray]:
+    """
+    Run the selected models and the consensus over a feature matrix
+
+    Args:
+        predictor: Predictor holding the models
+        features: 2D array of valid feature rows
+        model_names: Models to run
+
+    Returns:
+        Dictionary of score columns keyed by output column name
+    """
+    if len(features) == 0:
+        columns = {}
+        for model_name in model_names:
+            columns[f"{model_name}_prediction"] = np.empty(0, dtype=np.int8)
+            columns[f"{model_name}_probability"] = np.empty(0)
+        columns["consensus_prediction"] = np.empty(0, dtype=np.int8)
+        columns["consensus_agreement"] = np.empty(0)
+        return columns
+
+    outcomes = predictor.predict_arrays(features, model_names)
+
+    columns = {}
+    for model_name in model_names:
+        predictions, probabilities = outcomes[model_name]
+        columns[f"{model_name}_prediction"] = predictions.astype(np.int8)
+        columns[f"{model_name}_probability"] = (
+            probabilities if probabilities is not None else np.full(len(predictions), np.nan)
+        )
+
+    consensus, agreement = predictor.get_consensus_predictions(
+        {model_name: predictions for model_name, (predictions, _) in outcomes.items()}
+    )
+    columns["consensus_prediction"] = consensus.astype(np.int8)
+    columns["consensus_agreement"] = agreement
+    return columns
+
+def _init_worker(models_dir: Optional[str], use_sklearn: bool) -> None:
+    """Load the models in a worker process unless they were inherited through fork"""
+    global _predictor
+    if _predictor is None:
+        _predictor = create_predictor(models_dir, use_sklearn)
+
+def _score_chunk(features: np.ndarray, model_names: List[str]) -> Dict[str, np.ndarray]:
+    return score_features(_predictor, features, model_names)
+
+def assemble(frame: pd.DataFrame, valid: np.ndarray, scores: Dict[str, np.ndarray],
+             scores_only: bool) -> pd.DataFrame:
+    """
+    Spread the scores of the valid rows back over the whole chunk
+
+    Args:
+        frame: Chunk of the input file
+        valid: Boolean mask of the rows that were scored
+        scores: Score columns of the valid rows
+        scores_only: Leave the input columns out of the output
+
+    Returns:
+        Output chunk, with empty scores for rows that could not be scored
+    """
+    output = {}
+    for name, values in scores.items():
+        if values.dtype == np.int8:
+            full = np.zeros(len(frame), dtype=np.int8)
+            full[valid] = values
+            output[name] = pd.arrays.IntegerArray(full, ~valid)
+        else:
+            full = np.full(len(frame), np.nan)
+            full[valid] = values
+            output[name] = full
+
+    scored = pd.DataFrame(output, index=frame.index)
+    if scores_only:
+        return scored
+    return pd.concat([frame, scored], axis=1)
+
+def _peak_memory_mb(who: int) -> float:
+    # ru_maxrss is reported in kilobytes on Linux
+    return resource.getrusage(who).ru_maxrss / 1024
+
+def main() -> None:
+    global _predictor
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input", help="CSV or Parquet file in the Data/heart.csv column layout")
+    parser.add_argument("output", help="CSV or Parquet file to write the scores to")
+    parser.add_argument("--models", help="Comma-separated models to run (default: all available)")
+    parser.add_argument("--chunk-size", type=int, default=100000, help="Rows per chunk (default: 100000)")
+    parser.add_argument("--workers", type=int, default=1, help="Processes scoring chunks in parallel (default: 1)")
+    parser.add_argument("--models-dir", help="Directory containing the model pickles or bundle")
+    parser.add_argument("--scores-only", action="store_true", help="Leave the input columns out of the output")
+    parser.add_argument("--sklearn", action="store_true",
+                        help="Run every model through sklearn instead of the compiled and array-backed engines")
+    args = parser.parse_args()
+
+    if args.chunk_size < 1 or args.workers < 1:
+        parser.error("--chunk-size and --workers must be at least 1")
+
+    _predictor = create_predictor(args.models_dir, args.sklearn)
+    model_names = args.models.split(',') if args.models else _predictor.get_available_models()
+    unknown = [model_name for model_name in model_names if model_name not in _predictor.get_available_models()]
+    if unknown:
+        parser.error(f"Unknown models: {', '.join(unknown)}")
+
+    pool = None
+    if args.workers > 1:
+        pool = ProcessPoolExecutor(
+            max_workers=args.workers, initializer=_init_worker, initargs=(args.models_dir, args.sklearn)
+        )
+
+    writer = ChunkWriter(args.output)
+    # Chunks waiting for their scores, bounded so reading never runs far ahead of writing
+    pending = deque()
+    max_pending = 2 * args.workers
+    rows = invalid_rows = 0
+    start = time.perf_counter()
+
+    try:
+        for frame in read_chunks(args.input, args.chunk_size):
+            features = extract_features(frame)
+            valid = np.isfinite(features).all(axis=1)
+            rows += len(frame)
+            invalid_rows += int((~valid).sum())
+
+            if pool is None:
+                writer.write(assemble(frame, valid, score_features(_predictor, features[valid], model_names), args.scores_only))
+                continue
+
+            pending.append((frame, valid, pool.submit(_score_chunk, features[valid], model_names)))
+            while len(pending) >= max_pending:
+                frame, valid, future = pending.popleft()
+                writer.write(assemble(frame, valid, future.result(), args.scores_only))
+
+        while pending:
+            frame, valid, future = pending.popleft()
+            writer.write(assemble(frame, valid, future.result(), args.scores_only))
+    finally:
+        writer.close()
+        if pool is not None:
+            pool.shutdown()
+
+    elapsed = time.perf_counter() - start
+    print(f"Scored {rows:,} rows ({invalid_rows:,} without valid features) with {len(model_names)} models "
+          f"in {elapsed:.2f}s: {rows / elapsed if elapsed > 0 else 0:,.0f} rows/s")
+    print(f"Peak memory: {_peak_memory_mb(resource.RUSAGE_SELF):.1f} MB main process", end="")
+    if pool is not None:
+        print(f", {_peak_memory_mb(resource.RUSAGE_CHILDREN):.1f} MB largest worker")
+    else:
+        print()
+
+if __name__ == "__main__":
+    main()
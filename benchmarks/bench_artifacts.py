@@ -0,0 +1,99 @@
+"""
+Per-model pickles against the memory-mapped model bundle.
+
+Builds a bundle from the configured pickles, then starts several worker
+processes at once for each format. Every worker loads a predictor with the
+flattened random forest and KNN engines, waits until all workers are loaded,
+and reports its load time and memory from /proc/self/smaps_rollup. Pss splits
+shared pages between the processes that map them, so it shows how much of the
+bundle the workers share through the page cache.
+
+Usage:
+    python -m benchmarks.bench_artifacts [--workers 4]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+import numpy as np
+
+from app.config import settings
+
+def memory_kb() -> Dict[str, int]:
+    """Read Rss, Pss and shared memory of the current process in kB"""
+    fields = {}
+    with open('/proc/self/smaps_rollup') as file:
+        for line in file:
+            parts = line.split()
+            if parts[0] in ('Rss:', 'Pss:', 'Shared_Clean:', 'Private_Dirty:'):
+                fields[parts[0].rstrip(':')] = int(parts[1])
+    return fields
+
+def child(hold_seconds: float) -> None:
+    """Load a predictor, hold it while the other workers load, then report"""
+    from app.models.predictor import HeartDiseasePredictor
+
+    before = memory_kb()
+    start = time.perf_counter()
+    predictor = HeartDiseasePredictor()
+    load_seconds = time.perf_counter() - start
+
+    # Touch every engine buffer so its pages are resident
+    rows = np.zeros((1, 13))
+    predictor.predict_batch_with_all_models(rows)
+    time.sleep(hold_seconds)
+
+    after = memory_kb()
+    print(json.dumps({
+        "load_ms": load_seconds * 1000,
+        "rss_delta_kb": after["Rss"] - before["Rss"],
+        "pss_delta_kb": after["Pss"] - before["Pss"],
+        "private_dirty_delta_kb": after["Private_Dirty"] - before["Private_Dirty"]
+    }))
+
+def run_workers(model_format: str, bundle_path: str, workers: int, hold_seconds: float) -> List[dict]:
+    """Start the workers for one artifact format at the same time and collect their reports"""
+    env = dict(os.environ, HEART_MODEL_FORMAT=model_format, HEART_MODEL_BUNDLE=bundle_path,
+               HEART_FLAT_FOREST="1", HEART_FLAT_KNN="1", HEART_COMPILED_ENSEMBLE="1",
+               HEART_CACHE_SIZE="0")
+    processes = [
+        subprocess.Popen([sys.executable, "-m", "benchmarks.bench_artifacts", "--child",
+                          "--hold", str(hold_seconds)],
+                         env=env, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+        for _ in range(workers)
+    ]
+    return [json.loads(process.communicate()[0].strip().splitlines()[-1]) for process in processes]
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=4, help="Concurrent worker processes per format")
+    parser.add_argument("--hold", type=float, default=3.0, help="Seconds each worker keeps its models loaded")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.hold)
+        return
+
+    from app.models.bundle import bundle_from_pickles
+
+    with tempfile.TemporaryDirectory() as directory:
+        bundle_path = os.path.join(directory, 'model_bundle.joblib')
+        bundle_from_pickles(settings.models_dir, bundle_path)
+        print(f"bundle size: {os.path.getsize(bundle_path) / 1024:.0f} kB")
+
+        for model_format in ('pickle', 'bundle'):
+            reports = run_workers(model_format, bundle_path, args.workers, args.hold)
+            mean = {key: float(np.mean([report[key] for report in reports])) for key in reports[0]}
+            print(f"{model_format:<8} workers={args.workers} load={mean['load_ms']:.1f}ms "
+                  f"rss/worker={mean['rss_delta_kb']:.0f}kB pss/worker={mean['pss_delta_kb']:.0f}kB "
+                  f"private/worker={mean['private_dirty_delta_kb']:.0f}kB")
+
+if __name__ == "__main__":
+    main()
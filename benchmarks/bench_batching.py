@@ -0,0 +1,61 @@
+"""
+Throughput of /predict_all with micro-batching at different batch windows.
+
+Each configuration runs the in-process API under the same number of concurrent
+single-patient clients and reports throughput, latency and the batch-size
+histogram reported by /health.
+
+Usage:
+    python -m benchmarks.bench_batching [--clients 32] [--duration 3] [--windows 0 1 2 5]
+"""
+
+import argparse
+import asyncio
+import time
+from typing import Dict, List
+
+from app.config import settings
+from benchmarks.common import app_client, format_summary, latency_summary, load_patients
+
+async def client_loop(client, patients: List[Dict[str, float]], deadline: float,
+                      latencies: List[float], offset: int) -> None:
+    """Send single-patient /predict_all requests until the deadline"""
+    index = offset
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        response = await client.post("/predict_all", json=patients[index % len(patients)])
+        index += 1
+        if response.status_code == 200:
+            latencies.append(time.perf_counter() - start)
+        else:
+            await asyncio.sleep(0.05)
+
+async def run_window(window_ms: float, max_size: int, clients: int, duration: float) -> None:
+    settings.batch_window_ms = window_ms
+    settings.batch_max_size = max_size
+    patients = load_patients()
+    async with app_client() as client:
+        await client.post("/predict_all", json=patients[0])
+        latencies: List[float] = []
+        deadline = time.perf_counter() + duration
+        await asyncio.gather(*(
+            client_loop(client, patients, deadline, latencies, i) for i in range(clients)
+        ))
+        batching = (await client.get("/health")).json()["batching"]
+
+    print(format_summary(f"window={window_ms}ms max={max_size}", latency_summary(latencies)))
+    print(f"    throughput={len(latencies) / duration:.1f} req/s "
+          f"mean batch={batching['mean_batch_size']:.2f} histogram={batching['batch_size_histogram']}")
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=32, help="Concurrent single-patient clients")
+    parser.add_argument("--duration", type=float, default=3.0, help="Seconds per configuration")
+    parser.add_argument("--windows", type=float, nargs="+", default=[0, 1, 2, 5], help="Batch windows in ms")
+    parser.add_argument("--max-size", type=int, default=64, help="Maximum rows per batch")
+    args = parser.parse_args()
+    for window_ms in args.windows:
+        asyncio.run(run_window(window_ms, args.max_size, args.clients, args.duration))
+
+if __name__ == "__main__":
+    main()
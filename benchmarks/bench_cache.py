@@ -0,0 +1,69 @@
+"""
+Prediction cache under a realistic resubmission pattern.
+
+Replays a stream of single-patient predict_with_all_models calls in which a
+fraction of requests repeat a recently seen patient (form retries, refreshes,
+repeat screenings), with the cache disabled and enabled.
+
+Usage:
+    python -m benchmarks.bench_cache [--requests 3000] [--repeat-ratio 0.4]
+"""
+
+import argparse
+import time
+from typing import List
+
+import numpy as np
+
+from app.config import settings
+from app.models.predictor import HeartDiseasePredictor
+from benchmarks.common import format_summary, latency_summary, load_features
+
+def build_stream(features: np.ndarray, requests: int, repeat_ratio: float, seed: int) -> List[np.ndarray]:
+    """Mix new patients with resubmissions of the last 100 patients"""
+    rng = np.random.default_rng(seed)
+    stream, recent = [], []
+    for _ in range(requests):
+        if recent and rng.random() < repeat_ratio:
+            stream.append(recent[rng.integers(len(recent))])
+            continue
+        # Jitter age and cholesterol so new patients are distinct
+        patient = features[rng.integers(len(features))].copy()
+        patient[0] += rng.integers(-5, 6)
+        patient[4] += rng.integers(-20, 21)
+        stream.append(patient)
+        recent = (recent + [patient])[-100:]
+    return stream
+
+def replay(predictor: HeartDiseasePredictor, stream: List[np.ndarray]) -> List[float]:
+    """Time one predict_with_all_models call per request"""
+    samples = []
+    for patient in stream:
+        start = time.perf_counter()
+        predictor.predict_with_all_models(patient)
+        samples.append(time.perf_counter() - start)
+    return samples
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=3000, help="Requests in the replayed stream")
+    parser.add_argument("--repeat-ratio", type=float, default=0.4, help="Fraction of resubmitted patients")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed of the stream")
+    args = parser.parse_args()
+
+    stream = build_stream(load_features(), args.requests, args.repeat_ratio, args.seed)
+
+    settings.cache_size = 0
+    uncached = HeartDiseasePredictor()
+    settings.cache_size = 10000
+    cached = HeartDiseasePredictor()
+
+    for name, predictor in (("cache disabled", uncached), ("cache enabled", cached)):
+        samples = replay(predictor, stream)
+        summary = latency_summary(samples)
+        print(format_summary(name, summary) + f" total={sum(samples):.2f}s")
+
+    print(f"cache stats: {cached.cache.stats()}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+Compiled ensemble against the sklearn path.
+
+Times single-row and full-dataset predictions for the scalers plus the linear
+and naive Bayes models, and reports the largest probability difference.
+
+Usage:
+    python -m benchmarks.bench_compiled [--repeat 300]
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from app.models.predictor import HeartDiseasePredictor
+from benchmarks.common import format_summary, latency_summary, load_features
+
+COMPILED_MODELS = [
+    'logistic_regression_scaled', 'logistic_regression_normalized',
+    'naive_bayes_scaled', 'naive_bayes_normalized'
+]
+
+def time_single_rows(predictor: HeartDiseasePredictor, features: np.ndarray, repeat: int) -> list:
+    """Time one pass of every compiled model over single rows"""
+    samples = []
+    for index in range(repeat):
+        row = features[index % len(features)]
+        start = time.perf_counter()
+        for model_key in COMPILED_MODELS:
+            predictor.predict_with_model(row, model_key)
+        samples.append(time.perf_counter() - start)
+    return samples
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=300, help="Single-row iterations")
+    args = parser.parse_args()
+
+    features = load_features()
+    sklearn_predictor = HeartDiseasePredictor(compiled=False)
+    compiled_predictor = HeartDiseasePredictor(compiled=True)
+
+    for name, predictor in (("sklearn", sklearn_predictor), ("compiled", compiled_predictor)):
+        print(format_summary(f"{name} single row, 4 models", latency_summary(
+            time_single_rows(predictor, features, args.repeat)
+        )))
+        start = time.perf_counter()
+        for model_key in COMPILED_MODELS:
+            predictor.predict_batch_with_model(features, model_key)
+        print(f"{name} batch of {len(features)} rows, 4 models: {(time.perf_counter() - start) * 1000:.3f}ms")
+
+    max_difference = 0.0
+    for model_key in COMPILED_MODELS:
+        expected = sklearn_predictor.predict_batch_with_model(features, model_key)
+        actual = compiled_predictor.predict_batch_with_model(features, model_key)
+        for (label, probability, _), (compiled_label, compiled_probability, _) in zip(expected, actual):
+            assert label == compiled_label, f"{model_key} label mismatch"
+            max_difference = max(max_difference, abs(probability - compiled_probability))
+    print(f"labels identical, max probability difference: {max_difference:.3e}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Request decoding overhead: PatientData models vs direct decoding into arrays.
+
+Times turning a JSON body into the feature array the predictor receives, for
+single patients and for batches:
+- pydantic: the previous path, json.loads, PatientData validation, a Python list
+  of the 13 fields in training order and np.array
+- direct: decode_patient / decode_patients, json.loads straight into a float64
+  row or matrix with one vectorized range check
+
+Usage:
+    python -m benchmarks.bench_decode [--repeat 2000] [--batch-size 64]
+"""
+
+import argparse
+import json
+from typing import List
+
+import numpy as np
+from pydantic import TypeAdapter
+
+from app.schemas.decoding import decode_patient, decode_patients
+from app.schemas.patient import FEATURE_COLUMNS, PatientData
+from benchmarks.common import format_summary, load_patients
+from benchmarks.suite import measure
+
+_patients_adapter = TypeAdapter(List[PatientData])
+
+def pydantic_row(body: bytes) -> np.ndarray:
+    """Decode a body the way the routes did with a PatientData body parameter"""
+    data = PatientData.model_validate(json.loads(body))
+    return np.array([getattr(data, column) for column in FEATURE_COLUMNS])
+
+def pydantic_matrix(body: bytes) -> np.ndarray:
+    """Decode a batch body the way the routes did with a List[PatientData] body parameter"""
+    data = _patients_adapter.validate_python(json.loads(body))
+    return np.array([[getattr(patient, column) for column in FEATURE_COLUMNS] for patient in data])
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=2000, help="Timed samples per benchmark")
+    parser.add_argument("--batch-size", type=int, default=64, help="Patients per batch body")
+    args = parser.parse_args()
+
+    patients = load_patients()
+    bodies = [json.dumps(patient).encode() for patient in patients]
+    batches = [
+        json.dumps((patients * 2)[start:start + args.batch_size]).encode()
+        for start in range(0, len(patients), args.batch_size)
+    ]
+    for body in bodies:
+        assert np.array_equal(pydantic_row(body), decode_patient(body))
+
+    results = {
+        "single/pydantic": measure(lambda index: pydantic_row(bodies[index % len(bodies)]), args.repeat, 1, inner=10),
+        "single/direct": measure(lambda index: decode_patient(bodies[index % len(bodies)]), args.repeat, 1, inner=10),
+        f"batch{args.batch_size}/pydantic": measure(
+            lambda index: pydantic_matrix(batches[index % len(batches)]), args.repeat // 10, args.batch_size
+        ),
+        f"batch{args.batch_size}/direct": measure(
+            lambda index: decode_patients(batches[index % len(batches)]), args.repeat // 10, args.batch_size
+        )
+    }
+    for name, summary in results.items():
+        print(format_summary(name, summary))
+
+    for shape in ("single", f"batch{args.batch_size}"):
+        before, after = results[f"{shape}/pydantic"], results[f"{shape}/direct"]
+        print(f"{shape}: {before['p50_ms'] * 1000:.1f}us -> {after['p50_ms'] * 1000:.1f}us p50 "
+              f"({before['p50_ms'] / after['p50_ms']:.1f}x faster)")
+
+if __name__ == "__main__":
+    main()
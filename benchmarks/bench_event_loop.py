@@ -0,0 +1,87 @@
+"""
+Event loop responsiveness under inference load.
+
+Saturates /predict_all with concurrent clients and probes /health at a fixed
+interval. With inference running in the executor, /health latency under load
+should stay close to its idle latency, and overload should surface as 503s.
+
+Usage:
+    python -m benchmarks.bench_event_loop [--clients 64] [--duration 5]
+"""
+
+import argparse
+import asyncio
+import time
+from collections import Counter
+from typing import Dict, List
+
+from benchmarks.common import app_client, format_summary, latency_summary, load_patients
+
+async def probe_health(client, stop: asyncio.Event, interval: float) -> List[float]:
+    """Request /health every interval seconds until stopped"""
+    samples = []
+    while not stop.is_set():
+        start = time.perf_counter()
+        await client.get("/health")
+        samples.append(time.perf_counter() - start)
+        await asyncio.sleep(interval)
+    return samples
+
+async def hammer_predict(client, patients: List[Dict[str, float]], stop: asyncio.Event,
+                         latencies: List[float], statuses: Counter, offset: int) -> None:
+    """Send /predict_all requests back to back until stopped"""
+    index = offset
+    while not stop.is_set():
+        patient = patients[index % len(patients)]
+        index += 1
+        start = time.perf_counter()
+        response = await client.post("/predict_all", json=patient)
+        statuses[response.status_code] += 1
+        if response.status_code == 200:
+            latencies.append(time.perf_counter() - start)
+        elif response.status_code == 503:
+            # Back off like a real client instead of spinning on rejections
+            await asyncio.sleep(0.05)
+
+async def run(clients: int, duration: float, interval: float) -> None:
+    patients = load_patients()
+    async with app_client() as client:
+        # Warm up every code path once
+        await client.post("/predict_all", json=patients[0])
+
+        stop = asyncio.Event()
+        idle_probe = asyncio.create_task(probe_health(client, stop, interval))
+        await asyncio.sleep(min(duration, 2.0))
+        stop.set()
+        idle = await idle_probe
+
+        stop = asyncio.Event()
+        latencies: List[float] = []
+        statuses: Counter = Counter()
+        workers = [
+            asyncio.create_task(hammer_predict(client, patients, stop, latencies, statuses, i))
+            for i in range(clients)
+        ]
+        loaded_probe = asyncio.create_task(probe_health(client, stop, interval))
+        started = time.perf_counter()
+        await asyncio.sleep(duration)
+        stop.set()
+        loaded = await loaded_probe
+        await asyncio.gather(*workers)
+        elapsed = time.perf_counter() - started
+
+    print(format_summary("/health idle", latency_summary(idle)))
+    print(format_summary("/health with /predict_all saturated", latency_summary(loaded)))
+    print(format_summary("/predict_all", latency_summary(latencies)))
+    print(f"/predict_all throughput: {len(latencies) / elapsed:.1f} req/s, status codes: {dict(statuses)}")
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=64, help="Concurrent /predict_all clients")
+    parser.add_argument("--duration", type=float, default=5.0, help="Seconds of sustained load")
+    parser.add_argument("--interval", type=float, default=0.01, help="Seconds between /health probes")
+    args = parser.parse_args()
+    asyncio.run(run(args.clients, args.duration, args.interval))
+
+if __name__ == "__main__":
+    main()
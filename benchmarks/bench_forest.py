@@ -0,0 +1,49 @@
+"""
+Flattened random forest engine against RandomForestClassifier.predict_proba.
+
+Times single-row and batch probabilities on Data/heart.csv rows for both random
+forest models and reports the largest probability difference.
+
+Usage:
+    python -m benchmarks.bench_forest [--repeat 200] [--batch-repeat 20]
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from app.models.forest import FlatForest
+from app.models.predictor import HeartDiseasePredictor
+from benchmarks.common import format_summary, latency_summary, load_features, time_calls
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=200, help="Single-row iterations")
+    parser.add_argument("--batch-repeat", type=int, default=20, help="Full-dataset iterations")
+    args = parser.parse_args()
+
+    predictor = HeartDiseasePredictor(compiled=False, flat_forest=False)
+    features = load_features()
+
+    for model_key in ('random_forest_scaled', 'random_forest_normalized'):
+        model = predictor.models[model_key]
+        scaler = predictor.scalers['standard' if '_scaled' in model_key else 'minmax']
+        rows = scaler.transform(features)
+
+        start = time.perf_counter()
+        forest = FlatForest(model)
+        print(f"{model_key}: flattened {len(forest.feature)} nodes in {(time.perf_counter() - start) * 1000:.1f}ms")
+
+        for name, predict_proba in (("sklearn", model.predict_proba), ("flat", forest.predict_proba)):
+            single = latency_summary(time_calls(predict_proba, rows, args.repeat, batch=False))
+            batch = latency_summary(time_calls(predict_proba, rows, args.batch_repeat, batch=True))
+            print(format_summary(f"  {name} single row", single))
+            print(format_summary(f"  {name} batch of {len(rows)}", batch)
+                  + f" rows/s={len(rows) / (batch['mean_ms'] / 1000):,.0f}")
+
+        difference = np.abs(model.predict_proba(rows) - forest.predict_proba(rows)).max()
+        print(f"  max probability difference: {difference:.3e}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Prediction job throughput per number of worker processes.
+
+Submits one large job of Data/heart.csv rows to a JobQueue with a temporary job
+store and times it from submission until every chunk is stored, once per worker
+count. Every pool first scores a warm-up job, so worker start-up and model loading
+are not timed. The in-process line scores the same rows chunk by chunk in the
+benchmark process, the way /predict_all/batch does, as the single-core reference.
+Throughput should grow with the worker count up to the number of cores.
+
+Usage:
+    python -m benchmarks.bench_jobs [--rows 20000] [--workers 1,2,4] [--chunk-size 1000]
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from app.models.predictor import HeartDiseasePredictor
+from app.schemas.encoding import dumps
+from app.schemas.responses import all_predictions_content
+from app.services.jobs import FINISHED_STATES, JobQueue, JobStore
+from benchmarks.common import load_features
+
+def wait_for(queue: JobQueue, job_id: str) -> dict:
+    """Poll the job store until a job is finished"""
+    while True:
+        job = queue.store.get(job_id)
+        if job["status"] in FINISHED_STATES:
+            return job
+        time.sleep(0.005)
+
+def run_job(queue: JobQueue, features: np.ndarray) -> float:
+    """Submit a job and return the seconds until it completed"""
+    start = time.perf_counter()
+    job = wait_for(queue, queue.submit(features)["job_id"])
+    if job["status"] != "completed":
+        raise RuntimeError(f"Job failed: {job['error']}")
+    return time.perf_counter() - start
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=20000, help="Rows in the timed job")
+    parser.add_argument("--workers", default="1,2,4", help="Comma-separated worker process counts")
+    parser.add_argument("--chunk-size", type=int, default=1000, help="Rows per chunk")
+    args = parser.parse_args()
+
+    # The prediction cache would answer the repeated rows without running the models
+    os.environ["HEART_CACHE_SIZE"] = "0"
+    predictor = HeartDiseasePredictor()
+    predictor.cache = None
+    data = load_features()
+    features = data[np.arange(args.rows) % len(data)]
+
+    start = time.perf_counter()
+    for chunk_start in range(0, args.rows, args.chunk_size):
+        dumps([
+            all_predictions_content(predictor, all_predictions)
+            for all_predictions in predictor.predict_batch_with_all_models(features[chunk_start:chunk_start + args.chunk_size])
+        ])
+    baseline = args.rows / (time.perf_counter() - start)
+
+    print(f"{os.cpu_count()} CPU cores, {args.rows} rows in chunks of {args.chunk_size}")
+    print(f"{'in-process':<12} {baseline:>9,.0f} rows/s")
+    for workers in (int(value) for value in args.workers.split(",")):
+        with tempfile.TemporaryDirectory() as directory:
+            queue = JobQueue(JobStore(os.path.join(directory, "jobs.sqlite3")), predictor, workers, args.chunk_size)
+            queue.start()
+            try:
+                # Start every worker and load its models before timing
+                run_job(queue, features[:2 * workers * args.chunk_size])
+                seconds = run_job(queue, features)
+            finally:
+                queue.stop()
+        rate = args.rows / seconds
+        print(f"{f'{workers} workers':<12} {rate:>9,.0f} rows/s  {rate / baseline:.2f}x in-process")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""
+Precomputed neighbour index against KNeighborsClassifier.predict_proba.
+
+Times single-row and batch probabilities on Data/heart.csv rows for both KNN
+models, with brute force and KD-tree search, and checks that neighbour sets and
+probabilities match sklearn.
+
+Usage:
+    python -m benchmarks.bench_knn [--repeat 200] [--batch-repeat 20]
+"""
+
+import argparse
+
+import numpy as np
+
+from app.models.neighbors import FlatKNN
+from app.models.predictor import HeartDiseasePredictor
+from benchmarks.common import format_summary, latency_summary, load_features, time_calls
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=200, help="Single-row iterations")
+    parser.add_argument("--batch-repeat", type=int, default=20, help="Full-dataset iterations")
+    args = parser.parse_args()
+
+    predictor = HeartDiseasePredictor(compiled=False, flat_forest=False, flat_knn=False)
+    features = load_features()
+
+    for model_key in ('knn_scaled', 'knn_normalized'):
+        model = predictor.models[model_key]
+        scaler = predictor.scalers['standard' if '_scaled' in model_key else 'minmax']
+        rows = scaler.transform(features)
+        print(f"{model_key}: {len(model._fit_X)} training rows, k={model.n_neighbors}")
+
+        engines = [("sklearn", model)]
+        engines += [(f"flat {index}", FlatKNN(model, index)) for index in ('brute', 'tree')]
+
+        for name, engine in engines:
+            single = latency_summary(time_calls(engine.predict_proba, rows, args.repeat, batch=False))
+            batch = latency_summary(time_calls(engine.predict_proba, rows, args.batch_repeat, batch=True))
+            print(format_summary(f"  {name} single row", single))
+            print(format_summary(f"  {name} batch of {len(rows)}", batch)
+                  + f" rows/s={len(rows) / (batch['mean_ms'] / 1000):,.0f}")
+
+            if engine is not model:
+                _, expected = model.kneighbors(rows)
+                _, actual = engine.kneighbors(rows)
+                same_neighbours = (np.sort(expected, axis=1) == np.sort(actual, axis=1)).all()
+                difference = np.abs(model.predict_proba(rows) - engine.predict_proba(rows)).max()
+                print(f"    same neighbours: {same_neighbours}, max probability difference: {difference:.3e}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Overhead of the latency instrumentation and the /metrics endpoint.
+
+Sends sequential /predict_all requests with metrics recording enabled and
+disabled, alternating rounds so both see the same warm process, then times a
+single histogram observation and one /metrics scrape.
+
+Usage:
+    python -m benchmarks.bench_metrics [--requests 500] [--rounds 4]
+"""
+
+import argparse
+import asyncio
+import time
+from typing import Dict, List
+
+from app.config import settings
+from app.services.metrics import metrics
+from benchmarks.common import app_client, format_summary, latency_summary, load_patients
+
+async def run_round(client, patients: List[Dict[str, float]], offset: int) -> List[float]:
+    """Time one /predict_all request per patient"""
+    samples = []
+    for index, patient in enumerate(patients):
+        # Vary the age so every request misses the prediction cache
+        payload = dict(patient, age=patient["age"] + offset + index % 7)
+        start = time.perf_counter()
+        response = await client.post("/predict_all", json=payload)
+        samples.append(time.perf_counter() - start)
+        response.raise_for_status()
+    return samples
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=500, help="Requests per round")
+    parser.add_argument("--rounds", type=int, default=4, help="Rounds per setting, alternating")
+    args = parser.parse_args()
+
+    settings.cache_size = 0
+    patients = (load_patients() * (args.requests // 300 + 1))[:args.requests]
+    samples = {True: [], False: []}
+
+    async with app_client() as client:
+        await run_round(client, patients[:50], 0)
+        for round_index in range(args.rounds):
+            for enabled in (False, True):
+                metrics.enabled = enabled
+                samples[enabled].extend(await run_round(client, patients, round_index))
+
+        metrics.enabled = True
+        start = time.perf_counter()
+        response = await client.get("/metrics")
+        scrape = time.perf_counter() - start
+
+    disabled, enabled = latency_summary(samples[False]), latency_summary(samples[True])
+    print(format_summary("/predict_all metrics disabled", disabled))
+    print(format_summary("/predict_all metrics enabled", enabled))
+    print(f"overhead: {enabled['mean_ms'] - disabled['mean_ms']:+.3f}ms mean "
+          f"({(enabled['mean_ms'] / disabled['mean_ms'] - 1) * 100:+.1f}%), "
+          f"{enabled['p50_ms'] - disabled['p50_ms']:+.3f}ms p50")
+
+    observations = 100000
+    start = time.perf_counter()
+    for _ in range(observations):
+        metrics.observe_model("bench", 0.0002)
+    print(f"histogram observation: {(time.perf_counter() - start) / observations * 1e6:.2f}us")
+    print(f"/metrics scrape: {scrape * 1000:.2f}ms, {len(response.content):,} bytes, "
+          f"{len(response.text.splitlines()):,} lines")
+
+if __name__ == "__main__":
+    asyncio.run(main())
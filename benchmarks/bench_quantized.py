@@ -0,0 +1,67 @@
+"""
+Quantized engines against the float64 compiled ensemble and flattened engines.
+
+Loads the predictor twice, once with the compiled ensemble, the flattened random
+forests and the KNN index, once in quantized mode, and reports for both the
+memory held by the engines' arrays, single-row predict_with_all_models latency
+and full-dataset predict_arrays throughput on Data/heart.csv, with the
+prediction cache disabled. The last lines count the rows whose predicted label
+or consensus differs between the two and repeat the drift the models' report
+recorded on the held-out rows. Quantized mode needs pickles/quantization_report.json.
+
+Usage:
+    python -m benchmarks.bench_quantized [--repeat 500] [--batch-repeat 50]
+"""
+
+import argparse
+import os
+
+import numpy as np
+
+from app.models.predictor import HeartDiseasePredictor
+from app.models.quantized import engine_nbytes, read_report
+from benchmarks.common import format_summary, latency_summary, load_features, time_calls
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=500, help="Single-row iterations")
+    parser.add_argument("--batch-repeat", type=int, default=50, help="Full-dataset iterations")
+    args = parser.parse_args()
+
+    # Cached predictions would be served without running the engines
+    os.environ["HEART_CACHE_SIZE"] = "0"
+    predictors = {
+        "float64": HeartDiseasePredictor(compiled=True, flat_forest=True, flat_knn=True, quantized=False),
+        "quantized": HeartDiseasePredictor(compiled=False, flat_forest=False, flat_knn=False, quantized=True)
+    }
+    if not predictors["quantized"].model_set.use_quantized:
+        raise SystemExit(f"Quantized mode was refused: {predictors['quantized'].model_set.quantization_refusal}")
+    features = load_features()
+
+    labels = {}
+    for name, predictor in predictors.items():
+        predictor.cache = None
+        memory = engine_nbytes(predictor.compiled) + sum(engine_nbytes(engine) for engine in predictor.engines.values())
+        print(f"{name}: engine arrays {memory / 1024:,.0f} KiB")
+
+        single = latency_summary(time_calls(lambda row: predictor.predict_with_all_models(row[0]), features,
+                                            args.repeat, batch=False))
+        batch = latency_summary(time_calls(predictor.predict_arrays, features, args.batch_repeat, batch=True))
+        print(format_summary(f"  {name} single row, all models", single))
+        print(format_summary(f"  {name} batch of {len(features)}", batch)
+              + f" rows/s={len(features) / (batch['mean_ms'] / 1000):,.0f}")
+        labels[name] = {model_key: predictions for model_key, (predictions, _) in predictor.predict_arrays(features).items()}
+
+    changed = {model_key: int(np.sum(labels["float64"][model_key] != labels["quantized"][model_key]))
+               for model_key in labels["float64"]}
+    consensus = [HeartDiseasePredictor.get_consensus_predictions(labels[name])[0] for name in predictors]
+    print(f"rows with a changed label of {len(features)}: "
+          + ", ".join(f"{model_key}={count}" for model_key, count in changed.items()))
+    print(f"rows with a changed consensus: {int(np.sum(consensus[0] != consensus[1]))}")
+
+    report = read_report(predictors["quantized"].models_dir)
+    print(f"drift report: {report['max_drift']:.2%} of {report['rows']} held-out rows, consensus accuracy "
+          f"{report['consensus']['accuracy']:.2%} -> {report['consensus']['quantized_accuracy']:.2%}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Daily retraining cost: full refit against incremental updates from appended rows.
+
+Builds a temporary feature store from Data/heart.csv rows resampled with jitter,
+fits every model on it, then appends a batch of new rows and compares refitting
+each model on all training rows with updating it from the new segment the way
+generate_model_pickles.py does. The update times should follow the size of the
+appended batch, not the size of the store.
+
+Usage:
+    python -m benchmarks.bench_retrain [--rows 50000] [--new-rows 500,5000]
+"""
+
+import argparse
+import tempfile
+import time
+from typing import Tuple
+
+import numpy as np
+import pandas as pd
+from sklearn.base import clone
+from sklearn.ensemble import RandomForestClassifier
+
+from feature_store import FeatureStore
+from generate_model_pickles import build_models, fit_model, forest_growth, prepare_data, scale, update_model
+from benchmarks.common import DATA_PATH
+
+def synthetic_rows(data: pd.DataFrame, rows: int, seed: int) -> pd.DataFrame:
+    """Resample dataset rows and jitter the continuous features within their bounds"""
+    rng = np.random.default_rng(seed)
+    sample = data.sample(rows, replace=True, random_state=seed).reset_index(drop=True)
+    for column, spread in (('age', 3), ('trestbps', 5), ('chol', 10), ('thalach', 5)):
+        sample[column] = sample[column] + rng.integers(-spread, spread + 1, rows)
+    return sample
+
+def timed_fit(model_key: str, model, X: np.ndarray, y: np.ndarray) -> Tuple[object, float]:
+    """Fit a fresh copy of a model and return it with the fit time"""
+    _, fitted, seconds = fit_model(model_key, clone(model), X, y)
+    return fitted, seconds
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=50000, help="Rows in the store before the append")
+    parser.add_argument("--new-rows", default="500,5000", help="Comma-separated sizes of the appended batch")
+    args = parser.parse_args()
+
+    data = pd.read_csv(DATA_PATH)
+    models = build_models()
+    print(f"{'model':<32} {'new rows':>9} {'full refit':>11} {'update':>9} {'speedup':>8}")
+    for new_rows in (int(value) for value in args.new_rows.split(",")):
+        with tempfile.TemporaryDirectory() as store_path:
+            store = FeatureStore.create(store_path, synthetic_rows(data, args.rows, seed=0))
+            prepared, _ = prepare_data(store)
+            fitted = {
+                model_key: timed_fit(model_key, model, prepared['X'][model_key.rsplit('_', 1)[1]], prepared['y'])[0]
+                for model_key, model in models.items()
+            }
+            seen_rows = len(prepared['y'])
+
+            segment = store.append(synthetic_rows(data, new_rows, seed=new_rows))
+            X_new, y_new = store.read([segment['id']], holdout=False)
+            new_scaled = scale(prepared['scalers'], X_new)
+            start = time.perf_counter()
+            updated, _ = prepare_data(store, prepared['scalers'])
+            read_time = time.perf_counter() - start
+
+            for model_key, model in models.items():
+                scaling = model_key.rsplit('_', 1)[1]
+                _, full_time = timed_fit(model_key, model, updated['X'][scaling], updated['y'])
+                extra_trees = 0
+                if isinstance(fitted[model_key], RandomForestClassifier):
+                    extra_trees = forest_growth(fitted[model_key], len(y_new), seen_rows)
+                _, _, update_time = update_model(
+                    model_key, fitted[model_key], new_scaled[scaling], y_new,
+                    updated['X'][scaling], updated['y'], extra_trees
+                )
+                print(f"{model_key:<32} {len(y_new):>9} {full_time * 1000:>9.1f}ms {update_time * 1000:>7.1f}ms "
+                      f"{full_time / update_time:>7.1f}x")
+            print(f"Reading and scaling all {len(updated['y'])} training rows: {read_time * 1000:.1f}ms\n")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""
+Response building and serialization: pydantic response models vs plain JSON.
+
+Times turning the predictor's results into response bytes, for /predict_all with
+one patient and with a batch, and for /predict/{model_name}:
+- pydantic: the previous path, ModelPrediction and AllPredictionsResponse objects,
+  validated again against the route's response_model by FastAPI and encoded by
+  JSONResponse with json.dumps
+- fast: the plain dicts the routes build now, encoded by FastJSONResponse
+- compact: the same with ?compact=true
+
+Usage:
+    python -m benchmarks.bench_serialize [--repeat 2000] [--batch-size 64]
+"""
+
+import argparse
+import json
+from typing import Any, Dict
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import APIRoute, serialize_response
+
+from app.main import app
+from app.models.predictor import HeartDiseasePredictor
+from app.schemas.encoding import JSON_ENCODER, FastJSONResponse
+from app.schemas.patient import AllPredictionsResponse, ModelPrediction, SingleModelResponse
+from app.schemas.responses import all_predictions_content, recommendation, single_model_content
+from benchmarks.common import format_summary, load_features
+from benchmarks.suite import measure
+
+def response_field(path: str) -> Any:
+    """Response model field FastAPI validates the route's return value with"""
+    route = next(route for route in app.routes if isinstance(route, APIRoute) and route.path == path)
+    return route.secure_cloned_response_field
+
+def pydantic_all_predictions(predictor: HeartDiseasePredictor, all_predictions: Dict[str, Dict[str, Any]]) -> AllPredictionsResponse:
+    """Build the all-model response the way the route did with pydantic models"""
+    consensus, risk_level, agreement = predictor.get_consensus_prediction(all_predictions)
+    skipped_models = [model_key for model_key in predictor.ensemble_keys() if model_key not in all_predictions]
+    formatted_predictions = {
+        model_key: ModelPrediction(
+            prediction=pred["prediction"],
+            probability=pred["probability"] if pred["probability"] is not None else 0.0,
+            risk_level=pred["risk_level"]
+        )
+        for model_key, pred in all_predictions.items() if pred["prediction"] is not None
+    }
+    return AllPredictionsResponse(
+        predictions=formatted_predictions,
+        consensus_prediction=consensus,
+        consensus_risk_level=risk_level,
+        recommendation=recommendation(consensus),
+        model_agreement_percentage=agreement,
+        skipped_models=skipped_models,
+        estimated_latency_saved_ms=predictor.estimated_latency(skipped_models) * 1000
+    )
+
+def pydantic_body(field: Any, response: Any) -> bytes:
+    """Validate and encode a returned model the way FastAPI does for a response_model"""
+    # serialize_response never suspends for async routes, so it is driven without an event loop
+    coroutine = serialize_response(field=field, response_content=response)
+    try:
+        coroutine.send(None)
+    except StopIteration as e:
+        return JSONResponse(e.value).body
+    raise RuntimeError("serialize_response suspended")
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=2000, help="Timed samples per benchmark")
+    parser.add_argument("--batch-size", type=int, default=64, help="Patients per batch response")
+    args = parser.parse_args()
+
+    predictor = HeartDiseasePredictor()
+    features = load_features()
+    results = predictor.predict_batch_with_all_models(features)
+    single = predictor.predict_batch_with_model(features, "logistic_regression_scaled")
+    all_field, batch_field = response_field("/predict_all"), response_field("/predict_all/batch")
+    single_field = response_field("/predict/{model_name}")
+    batches = [results[start:start + args.batch_size] for start in range(0, len(results) - args.batch_size + 1, args.batch_size)]
+
+    # The fast responses carry the same JSON as the validated models
+    for all_predictions in results:
+        assert json.loads(pydantic_body(all_field, pydantic_all_predictions(predictor, all_predictions))) == \
+            json.loads(FastJSONResponse(all_predictions_content(predictor, all_predictions)).body)
+
+    def pydantic_single_model(index: int) -> bytes:
+        prediction, probability, risk_level = single[index % len(single)]
+        response = SingleModelResponse(
+            model="logistic_regression_scaled", prediction=prediction, probability=probability,
+            risk_level=risk_level, recommendation=recommendation(prediction)
+        )
+        return pydantic_body(single_field, response)
+
+    def fast_single_model(index: int, compact: bool = False) -> bytes:
+        prediction, probability, risk_level = single[index % len(single)]
+        return FastJSONResponse(
+            single_model_content("logistic_regression_scaled", prediction, probability, risk_level, compact)
+        ).body
+
+    batch_rows = args.batch_size
+    benchmarks = {
+        "predict_all/pydantic": measure(
+            lambda index: pydantic_body(all_field, pydantic_all_predictions(predictor, results[index % len(results)])),
+            args.repeat, 1
+        ),
+        "predict_all/fast": measure(
+            lambda index: FastJSONResponse(all_predictions_content(predictor, results[index % len(results)])).body,
+            args.repeat, 1, inner=10
+        ),
+        "predict_all/compact": measure(
+            lambda index: FastJSONResponse(all_predictions_content(predictor, results[index % len(results)], compact=True)).body,
+            args.repeat, 1, inner=10
+        ),
+        f"predict_all_batch{batch_rows}/pydantic": measure(
+            lambda index: pydantic_body(batch_field, {
+                "results": [pydantic_all_predictions(predictor, all_predictions) for all_predictions in batches[index % len(batches)]]
+            }),
+            args.repeat // 20, batch_rows
+        ),
+        f"predict_all_batch{batch_rows}/fast": measure(
+            lambda index: FastJSONResponse({
+                "results": [all_predictions_content(predictor, all_predictions) for all_predictions in batches[index % len(batches)]]
+            }).body,
+            args.repeat // 20, batch_rows
+        ),
+        f"predict_all_batch{batch_rows}/compact": measure(
+            lambda index: FastJSONResponse({
+                "results": [all_predictions_content(predictor, all_predictions, compact=True)
+                            for all_predictions in batches[index % len(batches)]]
+            }).body,
+            args.repeat // 20, batch_rows
+        ),
+        "predict_model/pydantic": measure(pydantic_single_model, args.repeat, 1),
+        "predict_model/fast": measure(fast_single_model, args.repeat, 1, inner=10),
+        "predict_model/compact": measure(lambda index: fast_single_model(index, True), args.repeat, 1, inner=10)
+    }
+
+    print(f"JSON encoder: {JSON_ENCODER}")
+    for name, summary in benchmarks.items():
+        print(format_summary(name, summary))
+
+    sizes = {
+        "full": len(FastJSONResponse(all_predictions_content(predictor, results[0])).body),
+        "compact": len(FastJSONResponse(all_predictions_content(predictor, results[0], compact=True)).body)
+    }
+    print(f"/predict_all body: {sizes['full']} bytes full, {sizes['compact']} bytes compact")
+    for shape in ("predict_all", f"predict_all_batch{batch_rows}", "predict_model"):
+        before = benchmarks[f"{shape}/pydantic"]["p50_ms"]
+        for mode in ("fast", "compact"):
+            after = benchmarks[f"{shape}/{mode}"]["p50_ms"]
+            print(f"{shape} {mode}: {before * 1000:.1f}us -> {after * 1000:.1f}us p50 ({before / after:.1f}x faster)")
+
+if __name__ == "__main__":
+    main()
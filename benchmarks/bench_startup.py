@@ -0,0 +1,93 @@
+"""
+Time to first response for each model load mode.
+
+Every configuration starts a fresh Python process that imports the app, runs
+its lifespan and sends one /predict_all request through an in-process client.
+The parent reports the time until the app modules were imported, until the
+lifespan finished, until the first response, and until /health reports every
+model ready.
+
+Usage:
+    python -m benchmarks.bench_startup [--runs 3]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+CONFIGURATIONS = [
+    ("eager", "0"),
+    ("parallel", "0"),
+    ("background", "0"),
+    ("lazy", "0"),
+    ("eager", "1"),
+    ("background", "1"),
+]
+
+async def child() -> None:
+    """Measure one cold start inside a fresh process"""
+    started = float(os.environ["BENCH_STARTED"])
+    from benchmarks.common import app_client, load_patients
+    import app.main  # noqa: F401
+    imported = time.time() - started
+    patient = load_patients()[0]
+
+    async with app_client() as client:
+        app_ready = time.time() - started
+        response = await client.post("/predict_all", json=patient)
+        first_response = time.time() - started
+        assert response.status_code == 200, response.text
+
+        while not (await client.get("/health")).json()["ready"]:
+            if os.environ["HEART_LOAD_MODE"] == "lazy":
+                break
+            await asyncio.sleep(0.001)
+        all_ready = time.time() - started
+
+        # A second request shows the cost left over after the first one
+        start = time.perf_counter()
+        await client.post("/predict_all", json=dict(patient, age=patient["age"] + 1))
+        second_response = time.perf_counter() - start
+
+    print(json.dumps({
+        "imported": imported, "app_ready": app_ready, "first_response": first_response,
+        "all_ready": all_ready, "second_response": second_response
+    }))
+
+def run_once(load_mode: str, warm: str) -> dict:
+    """Start a child process for one configuration and collect its timings"""
+    env = dict(os.environ, HEART_LOAD_MODE=load_mode, HEART_WARM_MODELS=warm,
+               HEART_BATCH_WINDOW_MS="0", BENCH_STARTED=repr(time.time()))
+    output = subprocess.run(
+        [sys.executable, "-m", "benchmarks.bench_startup", "--child"],
+        env=env, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3, help="Cold starts per configuration")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        asyncio.run(child())
+        return
+
+    print(f"{'load mode':<12}{'warm':<6}{'imported':>12}{'app ready':>12}{'first resp':>12}"
+          f"{'all ready':>12}{'second resp':>13}")
+    for load_mode, warm in CONFIGURATIONS:
+        runs = [run_once(load_mode, warm) for _ in range(args.runs)]
+        median = {key: float(np.median([run[key] for run in runs])) * 1000 for key in runs[0]}
+        print(f"{load_mode:<12}{warm:<6}{median['imported']:>10.1f}ms{median['app_ready']:>10.1f}ms"
+              f"{median['first_response']:>10.1f}ms"
+              f"{median['all_ready']:>10.1f}ms{median['second_response']:>11.1f}ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Peak memory and time to first byte: /predict_all/batch against /predict_all/stream.
+
+Sends the same patients to both routes, as one JSON array and as NDJSON, for each
+batch size. The bodies are fed to the ASGI app in 64 KiB pieces and the response
+is counted and dropped as it is sent, so only the server's own allocations are
+measured. Each request runs once for the timings and once under tracemalloc for
+the peak memory allocated while it is handled. The batch route's peak grows with
+the number of patients, the streaming route's should stay flat.
+
+Usage:
+    python -m benchmarks.bench_stream [--rows 10000,50000]
+"""
+
+import argparse
+import asyncio
+import json
+import time
+import tracemalloc
+from typing import Any, Dict, Tuple
+
+from benchmarks.common import load_patients
+
+# Size of the request body pieces handed to the app, like a server reading a socket
+PIECE_SIZE = 65536
+
+async def post(app: Any, path: str, body: bytes) -> Tuple[int, float, float]:
+    """
+    Send a request body to the ASGI app and drain the response
+
+    Returns:
+        Response body size, seconds to the first body byte and seconds to the end
+    """
+    view = memoryview(body)
+    offsets = iter(range(0, len(body) + 1, PIECE_SIZE))
+    state = {"bytes": 0, "first": None}
+    start = time.perf_counter()
+
+    async def receive() -> Dict[str, Any]:
+        offset = next(offsets, None)
+        if offset is None:
+            # Nothing more to read, the client stays connected
+            await asyncio.Event().wait()
+        end = offset + PIECE_SIZE
+        return {"type": "http.request", "body": bytes(view[offset:end]), "more_body": end < len(body)}
+
+    async def send(message: Dict[str, Any]) -> None:
+        if message["type"] == "http.response.body" and message.get("body"):
+            state["bytes"] += len(message["body"])
+            if state["first"] is None:
+                state["first"] = time.perf_counter() - start
+
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "POST",
+        "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": b"", "root_path": "",
+        "headers": [(b"content-length", str(len(body)).encode())], "client": ("bench", 0), "server": ("bench", 80)
+    }
+    await app(scope, receive, send)
+    return state["bytes"], state["first"], time.perf_counter() - start
+
+async def measure(app: Any, path: str, body: bytes) -> Dict[str, float]:
+    """Time one request, then run it again under tracemalloc for its peak allocation"""
+    size, first_byte, total = await post(app, path, body)
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    await post(app, path, body)
+    peak = tracemalloc.get_traced_memory()[1] - baseline
+    tracemalloc.stop()
+    return {"bytes": size, "first_byte": first_byte, "total": total, "peak": peak}
+
+async def run(sizes) -> None:
+    from app.main import app
+
+    patients = load_patients()
+    async with app.router.lifespan_context(app):
+        # The prediction cache would keep every scored row and hide the difference
+        app.state.predictor.cache = None
+        # Warm up both routes so the first timed request does not pay for it
+        await post(app, "/predict_all/batch", json.dumps(patients).encode())
+        await post(app, "/predict_all/stream", "\n".join(json.dumps(patient) for patient in patients).encode())
+        print(f"{'route':<22} {'rows':>7} {'response':>10} {'first byte':>11} {'total':>9} {'peak memory':>12}")
+        for rows in sizes:
+            sample = [patients[index % len(patients)] for index in range(rows)]
+            bodies = {
+                "/predict_all/batch": json.dumps(sample).encode(),
+                "/predict_all/stream": "\n".join(json.dumps(patient) for patient in sample).encode()
+            }
+            for path, body in bodies.items():
+                result = await measure(app, path, body)
+                print(f"{path:<22} {rows:>7} {result['bytes'] / 2 ** 20:>8.1f}MB {result['first_byte'] * 1000:>9.0f}ms "
+                      f"{result['total']:>8.2f}s {result['peak'] / 2 ** 20:>10.1f}MB")
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", default="10000,50000", help="Comma-separated numbers of patients per request")
+    args = parser.parse_args()
+    asyncio.run(run([int(value) for value in args.rows.split(",")]))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Shared helpers for the benchmark scripts.
+"""
+
+import os
+import time
+import warnings
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Callable, Dict, List, Sequence
+
+import numpy as np
+import pandas as pd
+
+from app.schemas.patient import FEATURE_COLUMNS
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_PATH = os.path.join(BASE_DIR, 'Data', 'heart.csv')
+
+# The pickled scalers were fitted on a DataFrame and warn on every ndarray call
+warnings.filterwarnings('ignore', message='X does not have valid feature names')
+
+def load_features(path: str = DATA_PATH) -> np.ndarray:
+    """Load the feature matrix of the dataset as float64"""
+    data = pd.read_csv(path)
+    return data[FEATURE_COLUMNS].to_numpy(dtype=np.float64)
+
+def load_patients(path: str = DATA_PATH) -> List[Dict[str, float]]:
+    """Load the dataset rows as JSON-ready patient payloads"""
+    data = pd.read_csv(path)
+    return data[FEATURE_COLUMNS].to_dict('records')
+
+def time_calls(predict_proba: Callable[[np.ndarray], np.ndarray], rows: np.ndarray, repeat: int, batch: bool) -> List[float]:
+    """Time predict_proba over single rows, or over the whole matrix when batch is set"""
+    samples = []
+    for index in range(repeat):
+        data = rows if batch else rows[index % len(rows)].reshape(1, -1)
+        start = time.perf_counter()
+        predict_proba(data)
+        samples.append(time.perf_counter() - start)
+    return samples
+
+def latency_summary(samples: Sequence[float]) -> Dict[str, float]:
+    """
+    Summarize latency samples given in seconds
+    
+    Returns:
+        Dictionary with count, mean, p50 and p99 in milliseconds
+    """
+    values = np.asarray(samples, dtype=np.float64) * 1000
+    if values.size == 0:
+        return {"count": 0, "mean_ms": 0.0, "p50_ms": 0.0, "p99_ms": 0.0}
+    return {
+        "count": int(values.size),
+        "mean_ms": float(values.mean()),
+        "p50_ms": float(np.percentile(values, 50)),
+        "p99_ms": float(np.percentile(values, 99))
+    }
+
+def format_summary(name: str, summary: Dict[str, float]) -> str:
+    """Format a latency summary as one report line"""
+    return (f"{name:<40} n={summary['count']:<7} mean={summary['mean_ms']:8.3f}ms "
+            f"p50={summary['p50_ms']:8.3f}ms p99={summary['p99_ms']:8.3f}ms")
+
+@asynccontextmanager
+async def app_client() -> AsyncIterator["httpx.AsyncClient"]:
+    """Run the API lifespan and yield an in-process HTTP client for it"""
+    import httpx
+    from app.main import app
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            yield client
@@ -0,0 +1,261 @@
+"""
+Reproducible benchmark suite for the predictor and the API.
+
+Times, on Data/heart.csv rows:
+- single-row and full-dataset batch predictions of every available model
+- predict_with_all_models and predict_batch_with_all_models end to end, and
+  predict_with_all_models in fast consensus mode
+- get_consensus_prediction
+- /predict_all through the in-process ASGI client
+
+The prediction cache is disabled so every call does the full work. Results are
+written as JSON and compared with a stored baseline. A benchmark whose p50 grew
+by more than the threshold is reported as a regression and the suite exits with
+status 1.
+
+Shared and frequency-scaled machines can run 1.5-2x slower from one minute to
+the next. The suite therefore runs in several rounds and keeps the round with the
+lowest p50 of every benchmark. A fixed NumPy calibration workload is timed in every
+round as well and reported as the machine speed relative to the baseline. With
+--normalize the baseline is scaled by that ratio, for comparing results across
+machines of different speed.
+
+Usage:
+    python -m benchmarks.suite                          # run and compare with benchmarks/baseline.json
+    python -m benchmarks.suite --output results.json --threshold 0.2
+    python -m benchmarks.suite --save-baseline          # make this run the new baseline
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List
+
+import numpy as np
+import sklearn
+
+from app.config import settings
+from app.models.predictor import HeartDiseasePredictor
+from benchmarks.common import app_client, latency_summary, load_features, load_patients
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+BASELINE_PATH = os.path.join(BENCHMARK_DIR, 'baseline.json')
+
+def measure(func: Callable[[int], Any], repeat: int, rows_per_call: int, warmup: int = 3,
+            inner: int = 1) -> Dict[str, float]:
+    """
+    Time repeated calls of func(index) after a few untimed warmup calls
+
+    Args:
+        func: Function called with the iteration index
+        repeat: Timed samples
+        rows_per_call: Rows each call scores, used for rows/sec
+        warmup: Untimed calls made first
+        inner: Calls per sample, for functions too fast to time one call at a time
+
+    Returns:
+        Latency summary of one call in milliseconds with rows_per_s added
+    """
+    for index in range(warmup):
+        func(index)
+    samples = []
+    for index in range(repeat):
+        start = time.perf_counter()
+        for call in range(inner):
+            func(index * inner + call)
+        samples.append((time.perf_counter() - start) / inner)
+    summary = latency_summary(samples)
+    summary["rows_per_s"] = rows_per_call * 1000 / summary["mean_ms"] if summary["mean_ms"] > 0 else 0.0
+    return summary
+
+def calibrate(repeat: int) -> float:
+    """
+    Time a fixed mix of small NumPy calls and one matrix product, shaped like the predictor's work
+
+    Returns:
+        p50 of the workload in milliseconds
+    """
+    rng = np.random.default_rng(0)
+    matrix, weights = rng.random((303, 13)), rng.random((13, 100))
+
+    def workload(index: int) -> None:
+        row = np.arange(13, dtype=np.float64)
+        for _ in range(200):
+            row = (row * 1.0001 + 0.5).clip(0, 1e6)
+        (matrix @ weights).argmax(axis=1)
+
+    return measure(workload, repeat, 1)["p50_ms"]
+
+def predictor_benchmarks(predictor: HeartDiseasePredictor, features: np.ndarray,
+                         repeat: int, batch_repeat: int) -> Dict[str, Dict[str, float]]:
+    """Time the predictor's model, ensemble and consensus calls"""
+    results = {}
+    n_rows = len(features)
+
+    for model_key in predictor.get_available_models():
+        results[f"model/{model_key}/single"] = measure(
+            lambda index: predictor.predict_with_model(features[index % n_rows], model_key), repeat, 1
+        )
+        results[f"model/{model_key}/batch"] = measure(
+            lambda index: predictor.predict_batch_with_model(features, model_key), batch_repeat, n_rows
+        )
+
+    results["predict_with_all_models/single"] = measure(
+        lambda index: predictor.predict_with_all_models(features[index % n_rows]), repeat, 1
+    )
+    results["predict_with_all_models/fast/single"] = measure(
+        lambda index: predictor.predict_with_all_models(features[index % n_rows], fast=True), repeat, 1
+    )
+    results["predict_batch_with_all_models/batch"] = measure(
+        lambda index: predictor.predict_batch_with_all_models(features), batch_repeat, n_rows
+    )
+
+    all_predictions = predictor.predict_batch_with_all_models(features)
+    results["get_consensus_prediction"] = measure(
+        lambda index: predictor.get_consensus_prediction(all_predictions[index % n_rows]), repeat, 1, inner=100
+    )
+    return results
+
+async def http_benchmarks(patients: List[Dict[str, float]], requests: int) -> Dict[str, Dict[str, float]]:
+    """Time sequential /predict_all requests through the in-process client"""
+    samples = []
+    async with app_client() as client:
+        for index in range(requests + 10):
+            start = time.perf_counter()
+            response = await client.post("/predict_all", json=patients[index % len(patients)])
+            elapsed = time.perf_counter() - start
+            response.raise_for_status()
+            # The first requests are warmup
+            if index >= 10:
+                samples.append(elapsed)
+    summary = latency_summary(samples)
+    summary["rows_per_s"] = 1000 / summary["mean_ms"] if summary["mean_ms"] > 0 else 0.0
+    return {"http/predict_all": summary}
+
+def fastest(rounds: List[Dict[str, Dict[str, float]]]) -> Dict[str, Dict[str, float]]:
+    """Keep the summary with the lowest p50 of every benchmark over all rounds"""
+    return {
+        name: min((results[name] for results in rounds), key=lambda summary: summary["p50_ms"])
+        for name in rounds[0]
+    }
+
+def environment() -> Dict[str, Any]:
+    """Describe the machine and the configuration the results were measured with"""
+    return {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "sklearn": sklearn.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "compiled_ensemble": settings.compiled_ensemble,
+        "flat_forest": settings.flat_forest,
+        "flat_knn": settings.flat_knn,
+        "quantized": settings.quantized,
+        "batch_window_ms": settings.batch_window_ms
+    }
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], threshold: float, normalize: bool) -> List[str]:
+    """
+    Print every benchmark next to its baseline
+
+    Args:
+        results: Results of this run
+        baseline: Stored results to compare with
+        threshold: Relative p50 increase reported as a regression
+        normalize: Scale the baseline by the ratio of the calibration times
+
+    Returns:
+        Names of the regressed benchmarks
+    """
+    regressions = []
+    speed = results["calibration_ms"] / baseline["calibration_ms"] if baseline.get("calibration_ms") else 1.0
+    print(f"\nCalibration took {speed:.2f}x as long as for the baseline")
+    if not normalize:
+        speed = 1.0
+    print(f"{'benchmark':<52} {'baseline p50':>13} {'p50':>10} {'change':>8}")
+    for name, current in results["benchmarks"].items():
+        previous = baseline["benchmarks"].get(name)
+        if previous is None or previous["p50_ms"] <= 0:
+            print(f"{name:<52} {'-':>13} {current['p50_ms']:>8.3f}ms {'new':>8}")
+            continue
+        change = current["p50_ms"] / (previous["p50_ms"] * speed) - 1
+        flag = ""
+        if change > threshold:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print(f"{name:<52} {previous['p50_ms'] * speed:>11.3f}ms {current['p50_ms']:>8.3f}ms {change:>+7.1%}{flag}")
+
+    changed = [key for key, value in results["environment"].items() if baseline.get("environment", {}).get(key) != value]
+    if changed:
+        print(f"Note: the baseline was measured with a different {', '.join(changed)}")
+    return regressions
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rounds", type=int, default=3, help="Rounds of the whole suite (default: 3)")
+    parser.add_argument("--repeat", type=int, default=200, help="Single-row iterations per round (default: 200)")
+    parser.add_argument("--batch-repeat", type=int, default=20, help="Full-dataset iterations per round (default: 20)")
+    parser.add_argument("--http-requests", type=int, default=200, help="/predict_all requests per round (default: 200)")
+    parser.add_argument("--output", default=os.path.join(BENCHMARK_DIR, 'results', 'latest.json'),
+                        help="Where to write the results (default: benchmarks/results/latest.json)")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="Baseline results to compare with")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="Relative p50 increase reported as a regression (default: 0.25)")
+    parser.add_argument("--normalize", action="store_true",
+                        help="Scale the baseline by the calibration times before comparing")
+    parser.add_argument("--save-baseline", action="store_true", help="Also write the results to the baseline path")
+    args = parser.parse_args()
+
+    # Cached results would hide the cost of the models
+    settings.cache_size = 0
+    features = load_features()
+    predictor = HeartDiseasePredictor()
+
+    start = time.perf_counter()
+    rounds, calibrations = [], []
+    for _ in range(max(1, args.rounds)):
+        calibrations.append(calibrate(args.repeat))
+        benchmarks = predictor_benchmarks(predictor, features, args.repeat, args.batch_repeat)
+        benchmarks.update(asyncio.run(http_benchmarks(load_patients(), args.http_requests)))
+        rounds.append(benchmarks)
+    benchmarks = fastest(rounds)
+    calibration = min(calibrations)
+
+    results = {
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "environment": environment(),
+        "rows": len(features),
+        "rounds": len(rounds),
+        "calibration_ms": calibration,
+        "benchmarks": benchmarks
+    }
+    for name, summary in benchmarks.items():
+        print(f"{name:<52} mean={summary['mean_ms']:8.3f}ms p50={summary['p50_ms']:8.3f}ms "
+              f"p99={summary['p99_ms']:8.3f}ms rows/s={summary['rows_per_s']:>10,.0f}")
+    print(f"Calibration workload p50: {calibration:.3f}ms")
+    print(f"Ran {len(benchmarks)} benchmarks in {time.perf_counter() - start:.1f}s")
+
+    paths = [args.output] + ([args.baseline] if args.save_baseline else [])
+    for path in paths:
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(path, 'w') as file:
+            json.dump(results, file, indent=2)
+        print(f"Wrote {path}")
+
+    if args.save_baseline or not os.path.exists(args.baseline):
+        return
+    with open(args.baseline) as file:
+        baseline = json.load(file)
+    regressions = compare(results, baseline, args.threshold, args.normalize)
+    if regressions:
+        print(f"{len(regressions)} benchmarks regressed by more than {args.threshold:.0%}: {', '.join(regressions)}")
+        sys.exit(1)
+    print(f"No benchmark regressed by more than {args.threshold:.0%}")
+
+if __name__ == "__main__":
+    main()
@@ -1,56 +1,75 @@
-import pickle
+import argparse
 import numpy as np
-from sklearn.preprocessing import MinMaxScaler
+from app.models.predictor import HeartDiseasePredictor
+from app.schemas.patient import FEATURE_BOUNDS, FEATURE_COLUMNS, INTEGER_FEATURES
 
-class HeartDiseasePredictor:
-    def __init__(self, model_path='knn_model_normalized.pkl'):
-        self.load_model(model_path)
-        self.scaler = MinMaxScaler()
+# Prompt label of every feature, with the meaning of its codes where the range alone does not explain them;
+# the accepted range comes from FEATURE_BOUNDS, the limits the API validates against
+FEATURE_PROMPTS = {
+    'age': ("Age", None),
+    'sex': ("Sex", "1 = male, 0 = female"),
+    'cp': ("Chest Pain Type", None),
+    'trestbps': ("Resting Blood Pressure in mm Hg", None),
+    'chol': ("Serum Cholesterol in mg/dl", None),
+    'fbs': ("Fasting Blood Sugar > 120 mg/dl", "1 = true, 0 = false"),
+    'restecg': ("Resting ECG Results", None),
+    'thalach': ("Maximum Heart Rate Achieved", None),
+    'exang': ("Exercise Induced Angina", "1 = yes, 0 = no"),
+    'oldpeak': ("ST Depression Induced by Exercise", None),
+    'slope': ("Slope of Peak Exercise ST Segment", None),
+    'ca': ("Number of Major Vessels Colored by Fluoroscopy", None),
+    'thal': ("Thalassemia", "0 = normal, 1 = fixed defect, 2 = reversible defect")
+}
+
+class HeartDiseaseCLI:
+    def __init__(self, model_name='knn_normalized', models_dir=None):
+        # Only the scalers and the chosen model are unpickled
+        self.predictor = HeartDiseasePredictor(models_dir, load_mode='lazy')
+        self.model_name = model_name
+        self.load_model(model_name)
         
-    def load_model(self, model_path):
-        try:
-            with open(model_path, 'rb') as file:
-                self.model = pickle.load(file)
-        except FileNotFoundError:
-            print(f"Error: Model file '{model_path}' not found.")
+    def load_model(self, model_name):
+        available_models = self.predictor.get_available_models()
+        if model_name != 'all' and model_name not in available_models:
+            print(f"Error: Model '{model_name}' not found. Available models: {', '.join(available_models)}")
             exit(1)
 
     def get_user_input(self):
         print("\n=== Heart Disease Prediction System ===")
-        print("Please enter the following information:")
+        print("Please enter the following information:\n")
         
         try:
-            age = float(input("\nAge: "))
-            sex = int(input("Sex (1 = male, 0 = female): "))
-            cp = int(input("Chest Pain Type (0-3): "))
-            trestbps = float(input("Resting Blood Pressure (in mm Hg): "))
-            chol = float(input("Serum Cholesterol (in mg/dl): "))
-            fbs = int(input("Fasting Blood Sugar > 120 mg/dl (1 = true, 0 = false): "))
-            restecg = int(input("Resting ECG Results (0-2): "))
-            thalach = float(input("Maximum Heart Rate Achieved: "))
-            exang = int(input("Exercise Induced Angina (1 = yes, 0 = no): "))
-            oldpeak = float(input("ST Depression Induced by Exercise: "))
-            slope = int(input("Slope of Peak Exercise ST Segment (0-2): "))
-            ca = int(input("Number of Major Vessels Colored by Fluoroscopy (0-3): "))
-            thal = int(input("Thalassemia (0 = normal, 1 = fixed defect, 2 = reversible defect): "))
-
-            return np.array([age, sex, cp, trestbps, chol, fbs, restecg, 
-                           thalach, exang, oldpeak, slope, ca, thal])
+            features = [self.read_feature(column) for column in FEATURE_COLUMNS]
+            return np.array(features, dtype=np.float64)
         
-        except ValueError:
-            print("\nError: Please enter valid numerical values.")
+        except ValueError as e:
+            print(f"\nError: {e}")
             return None
 
+    @staticmethod
+    def read_feature(column):
+        # Prompt with the range the API accepts and reject values it would answer with a 422
+        label, meaning = FEATURE_PROMPTS[column]
+        minimum, maximum = FEATURE_BOUNDS[column]
+        prompt = f"{label} ({minimum}-{maximum}: {meaning})" if meaning else f"{label} ({minimum}-{maximum})"
+        text = input(f"{prompt}: ")
+        try:
+            value = int(text) if column in INTEGER_FEATURES else float(text)
+        except ValueError:
+            raise ValueError("Please enter valid numerical values.")
+        if not minimum <= value <= maximum:
+            raise ValueError(f"{label} must be between {minimum} and {maximum}.")
+        return value
+
     def predict(self, features):
-        # Reshape and normalize the features
-        features_reshaped = features.reshape(1, -1)
-        features_normalized = self.scaler.fit_transform(features_reshaped)
+        # Scale with the scalers the models were trained with
+        if self.model_name == 'all':
+            all_predictions = self.predictor.predict_with_all_models(features)
+            prediction, _, agreement = self.predictor.get_consensus_prediction(all_predictions)
+            return prediction, agreement / 100
         
-        # Make prediction
-        prediction = self.model.predict(features_normalized)
-        prediction_proba = self.model.predict_proba(features_normalized)
-        
-        return prediction[0], prediction_proba[0]
+        prediction, probability, _ = self.predictor.predict_with_model(features, self.model_name)
+        return prediction, probability
 
     def display_result(self, prediction, probability):
         print("\n=== Prediction Results ===")
@@ -59,7 +78,9 @@ class HeartDiseasePredictor:
         else:
             print("Result: Low risk of heart disease")
             
-        print(f"Confidence: {probability[prediction]*100:.2f}%")
+        if probability is not None:
+            label = "Model agreement" if self.model_name == 'all' else "Confidence"
+            print(f"{label}: {probability*100:.2f}%")
         
         if prediction == 1:
             print("\nRecommendation: Please consult a healthcare professional for a thorough evaluation.")
@@ -67,7 +88,13 @@ class HeartDiseasePredictor:
             print("\nRecommendation: Continue maintaining a healthy lifestyle with regular check-ups.")
 
 def main():
-    predictor = HeartDiseasePredictor()
+    parser = argparse.ArgumentParser(description="Interactive heart disease risk prediction")
+    parser.add_argument("--model", default="knn_normalized",
+                        help="Model to predict with, or 'all' for the consensus of every model (default: knn_normalized)")
+    parser.add_argument("--models-dir", help="Directory containing the model pickles or bundle")
+    args = parser.parse_args()
+
+    predictor = HeartDiseaseCLI(args.model, args.models_dir)
     
     while True:
         features = predictor.get_user_input()
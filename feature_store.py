@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+"""
+Columnar Feature Store for the Training Data
+
+The labelled patients the models are trained on are kept in an append-only store
+of memory-mapped NumPy segments instead of one CSV file that is read and parsed on
+every training run. Every append writes one new segment, so adding the daily
+outcomes costs time proportional to the new rows. generate_model_pickles.py
+remembers which segments each model has seen and updates the models with the
+rows of the new segments only.
+
+Layout of the store directory:
+- manifest.json lists the columns and the segments in append order
+- segment_<id>.npy holds one segment as a float64 array of shape
+  (n_columns, n_rows), so every column is contiguous and loads without parsing
+
+The columns are the model features in FEATURE_COLUMNS order, the target, and a
+holdout flag that marks the rows kept out of training for evaluation. The rows
+imported from Data/heart.csv use the train/test split the models were always
+trained with. Appended rows are held out at random at the same rate, with a seed
+derived from the segment id, so the split of a row never changes.
+
+Usage:
+    python feature_store.py import Data/heart.csv          # create the store from the dataset
+    python feature_store.py append outcomes_2026_10_17.csv  # add newly labelled patients
+    python feature_store.py info
+    python feature_store.py compact                         # merge all segments into one
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sys
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+from sklearn.model_selection import train_test_split
+from app.schemas.patient import FEATURE_BOUNDS, FEATURE_COLUMNS
+
+STORE_PATH = 'Data/store'
+STORE_FORMAT = 'heart-disease-feature-store'
+STORE_FORMAT_VERSION = 1
+
+TARGET_COLUMN = 'target'
+HOLDOUT_COLUMN = 'holdout'
+COLUMNS = FEATURE_COLUMNS + [TARGET_COLUMN, HOLDOUT_COLUMN]
+
+# Held-out share and seed of the train/test split
+TEST_SIZE = 0.2
+RANDOM_STATE = 42
+
+class FeatureStore:
+    """
+    Append-only columnar store of labelled patients
+
+    Segments are immutable once written. Appends write the new segment next to
+    its destination, rename it into place and then replace the manifest, so an
+    interrupted append leaves the store as it was.
+    """
+
+    def __init__(self, path: str):
+        """
+        Open a store directory
+
+        Args:
+            path: Directory holding manifest.json and the segments
+
+        Raises:
+            FileNotFoundError: If the directory holds no store
+        """
+        self.path = path
+        manifest_path = os.path.join(path, 'manifest.json')
+        if not os.path.exists(manifest_path):
+            raise FileNotFoundError(f"No feature store at {path}, create it with 'python feature_store.py import'")
+        with open(manifest_path) as file:
+            self.manifest = json.load(file)
+        if self.manifest.get('format') != STORE_FORMAT or self.manifest.get('columns') != COLUMNS:
+            raise ValueError(f"{path} is not a feature store with the columns {', '.join(COLUMNS)}")
+
+    @classmethod
+    def create(cls, path: str, frame: pd.DataFrame, replace: bool = False) -> 'FeatureStore':
+        """
+        Create a store holding the rows of a dataset with the standard train/test split
+
+        Args:
+            path: Directory to create the store in
+            frame: Dataset with the feature columns and the target
+            replace: Overwrite an existing store
+
+        Returns:
+            The new store
+        """
+        if os.path.exists(os.path.join(path, 'manifest.json')):
+            if not replace:
+                raise FileExistsError(f"A feature store already exists at {path}")
+            shutil.rmtree(path)
+        os.makedirs(path, exist_ok=True)
+
+        # Store the training rows in the order train_test_split returns them, so the
+        # models fitted from the store are the ones fitted from the CSV before
+        features, target = _validated_columns(frame)
+        train_index, test_index = train_test_split(
+            np.arange(len(target)), test_size=TEST_SIZE, random_state=RANDOM_STATE
+        )
+        order = np.concatenate([train_index, test_index])
+        holdout = np.concatenate([np.zeros(len(train_index)), np.ones(len(test_index))])
+
+        _write_manifest(path, {
+            'format': STORE_FORMAT,
+            'format_version': STORE_FORMAT_VERSION,
+            'columns': COLUMNS,
+            'next_segment': 0,
+            'segments': []
+        })
+        store = cls(path)
+        store._write_segment(features[order], target[order], holdout)
+        return store
+
+    @classmethod
+    def open_or_create(cls, path: str, data_path: str) -> 'FeatureStore':
+        """Open a store, creating it from a CSV dataset the first time"""
+        if not os.path.exists(os.path.join(path, 'manifest.json')):
+            print(f"Creating feature store {path} from {data_path}")
+            return cls.create(path, pd.read_csv(data_path))
+        return cls(path)
+
+    @property
+    def segments(self) -> List[Dict[str, Any]]:
+        """Segment descriptions in append order"""
+        return self.manifest['segments']
+
+    def segment_ids(self) -> List[int]:
+        """Ids of the segments in append order"""
+        return [segment['id'] for segment in self.segments]
+
+    def rows(self) -> int:
+        """Number of rows in the store"""
+        return sum(segment['rows'] for segment in self.segments)
+
+    def fingerprint(self, segment_ids: Optional[List[int]] = None) -> str:
+        """
+        Identify the contents of some or all segments
+
+        Args:
+            segment_ids: Segments to cover, defaults to all
+
+        Returns:
+            Hex digest of the checksums of the segments
+        """
+        wanted = set(self.segment_ids() if segment_ids is None else segment_ids)
+        digest = hashlib.sha256()
+        for segment in self.segments:
+            if segment['id'] in wanted:
+                digest.update(f"{segment['id']}:{segment['sha256']}\n".encode())
+        return digest.hexdigest()
+
+    def append(self, frame: pd.DataFrame, test_size: float = TEST_SIZE) -> Dict[str, Any]:
+        """
+        Append newly labelled patients as a new segment
+
+        Args:
+            frame: Rows with the feature columns and the target
+            test_size: Share of the rows held out of training
+
+        Returns:
+            Description of the new segment
+
+        Raises:
+            ValueError: If columns are missing or values are invalid
+        """
+        features, target = _validated_columns(frame)
+        segment_id = self.manifest['next_segment']
+        rng = np.random.default_rng([RANDOM_STATE, segment_id])
+        holdout = (rng.random(len(target)) < test_size).astype(np.float64)
+        return self._write_segment(features, target, holdout)
+
+    def read(self, segment_ids: Optional[List[int]] = None, holdout: Optional[bool] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Read the rows of some or all segments
+
+        Args:
+            segment_ids: Segments to read, defaults to all
+            holdout: True for the held-out rows only, False for the training rows
+                only, None for both
+
+        Returns:
+            Tuple of (float64 feature matrix of shape (n_rows, n_features), integer targets)
+        """
+        wanted = set(self.segment_ids() if segment_ids is None else segment_ids)
+        columns = [self._load(segment) for segment in self.segments if segment['id'] in wanted]
+        if not columns:
+            return np.empty((0, len(FEATURE_COLUMNS))), np.empty(0, dtype=np.int64)
+
+        data = np.concatenate(columns, axis=1) if len(columns) > 1 else columns[0]
+        if holdout is not None:
+            data = data[:, (data[-1] == 1) == holdout]
+        n_features = len(FEATURE_COLUMNS)
+        return np.ascontiguousarray(data[:n_features].T), data[n_features].astype(np.int64)
+
+    def compact(self) -> Dict[str, Any]:
+        """
+        Merge all segments into one, keeping the rows and their holdout flags
+
+        The merged segment gets a new id, so models trained on the old segments
+        are fully refitted by the next training run.
+
+        Returns:
+            Description of the merged segment
+        """
+        old_segments = list(self.segments)
+        data = np.concatenate([self._load(segment) for segment in old_segments], axis=1)
+        self.manifest['segments'] = []
+        n_features = len(FEATURE_COLUMNS)
+        merged = self._write_segment(data[:n_features].T, data[n_features], data[n_features + 1])
+        for segment in old_segments:
+            os.remove(os.path.join(self.path, segment['file']))
+        return merged
+
+    def _load(self, segment: Dict[str, Any]) -> np.ndarray:
+        """Map a segment's columns from disk"""
+        return np.load(os.path.join(self.path, segment['file']), mmap_mode='r')
+
+    def _write_segment(self, features: np.ndarray, target: np.ndarray, holdout: np.ndarray) -> Dict[str, Any]:
+        """Write rows as the next segment and record it in the manifest"""
+        data = np.vstack([np.asarray(features, dtype=np.float64).T, target, holdout])
+        segment_id = self.manifest['next_segment']
+        file_name = f'segment_{segment_id:06d}.npy'
+        path = os.path.join(self.path, file_name)
+
+        with open(f'{path}.tmp', 'wb') as file:
+            np.save(file, data)
+        os.replace(f'{path}.tmp', path)
+
+        segment = {
+            'id': segment_id,
+            'file': file_name,
+            'rows': int(data.shape[1]),
+            'holdout_rows': int(holdout.sum()),
+            'sha256': hashlib.sha256(data.tobytes()).hexdigest()
+        }
+        self.manifest['segments'].append(segment)
+        self.manifest['next_segment'] = segment_id + 1
+        _write_manifest(self.path, self.manifest)
+        return segment
+
+def _validated_columns(frame: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Take the feature matrix and the target of labelled rows, rejecting invalid values
+
+    Raises:
+        ValueError: If columns are missing, values are not numeric or outside
+            FEATURE_BOUNDS, or a target is not 0 or 1
+    """
+    missing = [column for column in FEATURE_COLUMNS + [TARGET_COLUMN] if column not in frame.columns]
+    if missing:
+        raise ValueError(f"Missing columns: {', '.join(missing)}")
+
+    features = frame[FEATURE_COLUMNS].apply(pd.to_numeric, errors='coerce').to_numpy(dtype=np.float64)
+    target = pd.to_numeric(frame[TARGET_COLUMN], errors='coerce').to_numpy(dtype=np.float64)
+    minimum = np.array([FEATURE_BOUNDS[column][0] for column in FEATURE_COLUMNS])
+    maximum = np.array([FEATURE_BOUNDS[column][1] for column in FEATURE_COLUMNS])
+    # NaN from missing or non-numeric values fails both comparisons
+    invalid = ~((features >= minimum) & (features <= maximum))
+    if invalid.any():
+        columns = [FEATURE_COLUMNS[index] for index in np.flatnonzero(invalid.any(axis=0))]
+        raise ValueError(f"{int(invalid.any(axis=1).sum())} rows have missing or out-of-range values in: {', '.join(columns)}")
+    if not np.isin(target, (0, 1)).all():
+        raise ValueError("The target must be 0 or 1")
+    return features, target
+
+def _write_manifest(path: str, manifest: Dict[str, Any]) -> None:
+    """Replace the manifest atomically"""
+    manifest_path = os.path.join(path, 'manifest.json')
+    with open(f'{manifest_path}.tmp', 'w') as file:
+        json.dump(manifest, file, indent=2)
+    os.replace(f'{manifest_path}.tmp', manifest_path)
+
+def _read_table(path: str) -> pd.DataFrame:
+    """Read a CSV or Parquet file of labelled patients"""
+    if path.lower().endswith(('.parquet', '.pq')):
+        return pd.read_parquet(path)
+    return pd.read_csv(path)
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--store', default=STORE_PATH, help=f'Feature store directory (default: {STORE_PATH})')
+    commands = parser.add_subparsers(dest='command', required=True)
+    import_parser = commands.add_parser('import', help='Create the store from a labelled dataset')
+    import_parser.add_argument('input', help='CSV or Parquet file in the Data/heart.csv layout')
+    import_parser.add_argument('--replace', action='store_true', help='Overwrite an existing store')
+    append_parser = commands.add_parser('append', help='Append newly labelled patients')
+    append_parser.add_argument('input', help='CSV or Parquet file in the Data/heart.csv layout')
+    append_parser.add_argument('--test-size', type=float, default=TEST_SIZE,
+                               help=f'Share of the new rows held out of training (default: {TEST_SIZE})')
+    commands.add_parser('info', help='Show the segments of the store')
+    commands.add_parser('compact', help='Merge all segments into one')
+    args = parser.parse_args()
+
+    try:
+        if args.command == 'import':
+            store = FeatureStore.create(args.store, _read_table(args.input), replace=args.replace)
+            print(f"Created {args.store} with {store.rows()} rows")
+        elif args.command == 'append':
+            store = FeatureStore(args.store)
+            segment = store.append(_read_table(args.input), test_size=args.test_size)
+            print(f"Appended {segment['rows']} rows ({segment['holdout_rows']} held out) as segment {segment['id']}, "
+                  f"{store.rows()} rows in total")
+        elif args.command == 'compact':
+            store = FeatureStore(args.store)
+            segment = store.compact()
+            print(f"Merged the store into segment {segment['id']} with {segment['rows']} rows")
+        else:
+            store = FeatureStore(args.store)
+            for segment in store.segments:
+                print(f"segment {segment['id']:>6}: {segment['rows']:>9} rows, {segment['holdout_rows']:>8} held out")
+            print(f"{len(store.segments)} segments, {store.rows()} rows")
+    except (FileNotFoundError, FileExistsError, ValueError) as e:
+        sys.exit(f"Error: {e}")
+
+if __name__ == '__main__':
+    main()
@@ -2,8 +2,8 @@
 """
 Generate Pickle Files for Machine Learning Models
 
-This script generates pickle files for all the machine learning models used in the 
-cardiovascular heart disease prediction system. It creates both scaled and normalized 
+This script generates pickle files for all the machine learning models used in the
+cardiovascular heart disease prediction system. It creates both scaled and normalized
 versions of each model.
 
 Models included:
@@ -11,90 +11,576 @@ Models included:
 - LogisticRegression
 - GaussianNB (Naive Bayes)
 - RandomForestClassifier
+
+The training data is read from the columnar feature store in Data/store (see
+feature_store.py), which is created from Data/heart.csv on the first run. The
+scaled and normalized training rows of every store segment are cached under
+pickles/.cache/prepared, keyed on a fingerprint of the scalers and the segment's
+checksum, so a run only scales the segments appended since the last one. The
+models are fitted concurrently with joblib, and the training state under
+pickles/.cache records the hyperparameters and the store segments every model
+was trained on:
+
+- a model whose hyperparameters changed, or whose pickle is missing, is refitted
+  on all training rows
+- when segments were appended since, the model is updated with the new rows:
+  GaussianNB with partial_fit, KNN by appending the rows to its points, logistic
+  regression by restarting its solver from the previous coefficients on the new
+  rows and a weighted random sample of the earlier ones, and random forests by
+  growing extra trees in proportion to the new rows, fitted on the new rows and
+  as many earlier ones
+- an up to date model is skipped, and a run that skips every model reads no
+  training data and leaves the drift report and the bundle as they are
+
+The scalers are fitted on the training rows of a full run and kept by the
+updates, so the models stay consistent with them. --full refits the scalers and
+every model on all rows, and a forest that has grown to twice its configured
+size is refitted from scratch. Hyperparameters tuned by tune_hyperparameters.py
+are read from pickles/hyperparameters.json when it exists. Pickles are replaced
+atomically, so a running API that watches the pickles directory never reads a
+half-written file.
+
+Every run that changes a model also writes pickles/quantization_report.json, the
+label drift of the quantized engines (app/models/quantized.py) against the models
+on the held-out rows, which decides whether the API may serve in quantized mode.
+
+Usage:
+    python generate_model_pickles.py            # fit or update changed models on all cores
+    python generate_model_pickles.py --jobs 1   # fit serially
+    python generate_model_pickles.py --full     # refit the scalers and every model on all rows
 """
 
+import argparse
+import hashlib
+import json
+import math
 import pickle
-import pandas as pd
 import numpy as np
 import os
-from sklearn.model_selection import train_test_split
+import shutil
+import time
+import sklearn
+from joblib import Parallel, delayed
 from sklearn.preprocessing import StandardScaler, MinMaxScaler
 from sklearn.neighbors import KNeighborsClassifier
 from sklearn.linear_model import LogisticRegression
 from sklearn.naive_bayes import GaussianNB
 from sklearn.ensemble import RandomForestClassifier
+from app.models.bundle import BUNDLE_FILENAME, write_bundle
+from app.models.quantized import REPORT_FILENAME, drift_report, model_digests, read_report, write_report
+from feature_store import RANDOM_STATE, STORE_PATH, TEST_SIZE, FeatureStore
 
 OUT_DIR = 'pickles'
+DATA_PATH = 'Data/heart.csv'
+
+# A forest grown by updates beyond this multiple of its configured size is refitted
+FOREST_GROWTH_LIMIT = 2
+
+# Arrays cached for the training rows of every segment
+PREPARED_ARRAYS = ('scaled', 'normalized', 'target')
+
+# Earlier training rows sampled for an update: UPDATE_SAMPLE_FACTOR per new row,
+# at least UPDATE_SAMPLE_MIN
+UPDATE_SAMPLE_FACTOR = 4
+UPDATE_SAMPLE_MIN = 1000
+
+def build_models(hyperparameters=None):
+    """
+    Create the unfitted models for every scaling method
+
+    Args:
+        hyperparameters: Parameters overriding the defaults, keyed by '<model_name>_<scaling>'
+
+    Returns:
+        Dictionary of estimators keyed by '<model_name>_<scaling>'
+    """
+    models = {
+        'knn': {
+            'scaled': KNeighborsClassifier(n_neighbors=3),
+            'normalized': KNeighborsClassifier(n_neighbors=3)
+        },
+        'logistic_regression': {
+            'scaled': LogisticRegression(random_state=100),
+            'normalized': LogisticRegression(random_state=100)
+        },
+        'naive_bayes': {
+            'scaled': GaussianNB(),
+            'normalized': GaussianNB()
+        },
+        'random_forest': {
+            'scaled': RandomForestClassifier(max_depth=10, random_state=100),
+            'normalized': RandomForestClassifier(max_depth=10, random_state=100)
+        }
+    }
+    models = {
+        f'{model_name}_{scaling}': model
+        for model_name, model_variants in models.items()
+        for scaling, model in model_variants.items()
+    }
+    for model_key, params in (hyperparameters or {}).items():
+        if model_key in models:
+            models[model_key].set_params(**params)
+    return models
+
+def load_hyperparameters(path):
+    """
+    Read the tuned hyperparameters written by tune_hyperparameters.py
+
+    Returns:
+        Parameters keyed by '<model_name>_<scaling>', empty if the file does not exist
+    """
+    if not os.path.exists(path):
+        return {}
+    with open(path) as file:
+        return {model_key: result['params'] for model_key, result in json.load(file).get('models', {}).items()}
+
+def model_fingerprint(model):
+    """
+    Identify a model's configuration by its class, hyperparameters and sklearn version
+
+    Args:
+        model: Unfitted estimator
+
+    Returns:
+        Hex digest that changes whenever a refit could produce a different model
+    """
+    description = json.dumps({
+        'class': f'{type(model).__module__}.{type(model).__qualname__}',
+        'params': model.get_params(deep=True),
+        'split': [TEST_SIZE, RANDOM_STATE],
+        'sklearn': sklearn.__version__
+    }, sort_keys=True, default=repr)
+    return hashlib.sha256(description.encode()).hexdigest()
+
+def model_path(out_dir, model_key):
+    """Pickle file of a model, e.g. pickles/knn_model_scaled.pkl for 'knn_scaled'"""
+    model_name, scaling = model_key.rsplit('_', 1)
+    return os.path.join(out_dir, f'{model_name}_model_{scaling}.pkl')
+
+def atomic_dump(obj, path):
+    """Pickle an object next to its destination and move it into place"""
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'wb') as file:
+        pickle.dump(obj, file)
+    os.replace(tmp_path, path)
+
+def scale(scalers, X):
+    """Scale and normalize a feature matrix with the fitted scalers"""
+    return {
+        'scaled': scalers['standard'].transform(X),
+        'normalized': scalers['minmax'].transform(X)
+    }
+
+def scaler_fingerprint(scalers):
+    """
+    Identify fitted scalers by the parameters of their transforms
+
+    Returns:
+        Hex digest, the key of the rows they prepared
+    """
+    digest = hashlib.sha256()
+    standard, minmax = scalers['standard'], scalers['minmax']
+    for values in (standard.mean_, standard.scale_, minmax.min_, minmax.scale_):
+        digest.update(b'-' if values is None else np.ascontiguousarray(values, dtype=np.float64).tobytes())
+    digest.update(repr(minmax.clip).encode())
+    return digest.hexdigest()
+
+def prepare_segments(store, scalers, cache_dir):
+    """
+    Scale and normalize the training rows of every segment, reusing the cached ones
+
+    Segments never change once written, so their prepared rows are cached under
+    the scalers' fingerprint and the segment checksums, and only the segments
+    appended since the last run are read from the store and scaled. Rows prepared
+    by other scalers or for segments no longer in the store are removed.
+
+    Args:
+        store: FeatureStore with the labelled patients
+        scalers: Fitted 'standard' and 'minmax' scalers
+        cache_dir: Directory holding the prepared data cache
+
+    Returns:
+        Tuple of (memory-mapped 'scaled', 'normalized' and 'target' arrays of every
+        segment keyed by segment id, number of segments that were scaled)
+    """
+    root = os.path.join(cache_dir, 'prepared')
+    prepared_dir = os.path.join(root, scaler_fingerprint(scalers)[:16])
+    os.makedirs(prepared_dir, exist_ok=True)
+    for name in os.listdir(root):
+        if os.path.join(root, name) != prepared_dir:
+            shutil.rmtree(os.path.join(root, name))
+
+    prepared, scaled_segments, current_files = {}, 0, set()
+    for segment in store.segments:
+        prefix = f"segment_{segment['id']:06d}_{segment['sha256'][:16]}"
+        paths = {name: os.path.join(prepared_dir, f'{prefix}_{name}.npy') for name in PREPARED_ARRAYS}
+        current_files.update(os.path.basename(path) for path in paths.values())
+        if not all(os.path.exists(path) for path in paths.values()):
+            X, y = store.read([segment['id']], holdout=False)
+            arrays = dict(scale(scalers, X), target=y)
+            for name, path in paths.items():
+                with open(f'{path}.tmp', 'wb') as file:
+                    np.save(file, arrays[name])
+                os.replace(f'{path}.tmp', path)
+            scaled_segments += 1
+        prepared[segment['id']] = {name: np.load(path, mmap_mode='r') for name, path in paths.items()}
+
+    for name in os.listdir(prepared_dir):
+        if name not in current_files:
+            os.remove(os.path.join(prepared_dir, name))
+    return prepared, scaled_segments
+
+def training_rows(prepared, segment_ids, name):
+    """Concatenate one prepared array of some segments, 'scaled', 'normalized' or 'target'"""
+    return np.concatenate([prepared[segment_id][name] for segment_id in segment_ids])
+
+def sample_rows(prepared, segment_ids, name, count, seed):
+    """
+    Draw prepared training rows of some segments at random, reading only the drawn rows
+
+    Args:
+        prepared: Prepared rows keyed by segment id, from prepare_segments
+        segment_ids: Segments to draw from
+        name: 'scaled' or 'normalized'
+        count: Rows to draw, at most all of them
+        seed: Seed of the draw
+
+    Returns:
+        Tuple of (drawn rows in random order, their targets, training rows each
+        drawn row stands for)
+    """
+    sizes = np.array([len(prepared[segment_id]['target']) for segment_id in segment_ids], dtype=np.int64)
+    total = int(sizes.sum())
+    count = min(count, total)
+    if count == 0:
+        return np.empty((0, prepared[segment_ids[0]][name].shape[1])), np.empty(0, dtype=np.int64), 0.0
 
-# Load the dataset
-print("Loading dataset...")
-data = pd.read_csv('Data/heart.csv')
-
-# Split features and target
-X = data.drop('target', axis=1)
-y = data['target']
-
-# Split data into training and testing sets
-X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
-
-# Scale the features
-print("Scaling features...")
-scaler = StandardScaler()
-X_train_scaled = scaler.fit_transform(X_train)
-X_test_scaled = scaler.transform(X_test)
-
-# Normalize the features
-print("Normalizing features...")
-normalizer = MinMaxScaler()
-X_train_normalized = normalizer.fit_transform(X_train)
-X_test_normalized = normalizer.transform(X_test)
-
-# Save the scalers
-print("Saving scalers...")
-with open(os.path.join(OUT_DIR, 'standard_scaler.pkl'), 'wb') as file:
-    pickle.dump(scaler, file)
-
-with open(os.path.join(OUT_DIR, 'minmax_scaler.pkl'), 'wb') as file:
-    pickle.dump(normalizer, file)
-
-# Dictionary to store all models
-models = {
-    'knn': {
-        'scaled': KNeighborsClassifier(n_neighbors=3),
-        'normalized': KNeighborsClassifier(n_neighbors=3)
-    },
-    'logistic_regression': {
-        'scaled': LogisticRegression(random_state=100),
-        'normalized': LogisticRegression(random_state=100)
-    },
-    'naive_bayes': {
-        'scaled': GaussianNB(),
-        'normalized': GaussianNB()
-    },
-    'random_forest': {
-        'scaled': RandomForestClassifier(max_depth=10, random_state=100),
-        'normalized': RandomForestClassifier(max_depth=10, random_state=100)
+    rng = np.random.default_rng(seed)
+    picks = np.sort(rng.choice(total, size=count, replace=False))
+    offsets = np.concatenate([[0], np.cumsum(sizes)])
+    rows, targets = [], []
+    for index, segment_id in enumerate(segment_ids):
+        local = picks[(picks >= offsets[index]) & (picks < offsets[index + 1])] - offsets[index]
+        if len(local):
+            rows.append(prepared[segment_id][name][local])
+            targets.append(prepared[segment_id]['target'][local])
+    order = rng.permutation(count)
+    return np.concatenate(rows)[order], np.concatenate(targets)[order], total / count
+
+def prepare_data(store, cache_dir, scalers=None):
+    """
+    Prepare the training rows of the feature store
+
+    Args:
+        store: FeatureStore with the labelled patients
+        cache_dir: Directory holding the prepared data cache
+        scalers: Fitted scalers to apply, None fits new ones on the training rows
+
+    Returns:
+        Tuple of (dictionary with the scalers, the prepared rows of every segment and
+        the number of segments scaled by this run, hash of the store contents)
+    """
+    if scalers is None:
+        X_train, _ = store.read(holdout=False)
+        scalers = {'standard': StandardScaler().fit(X_train), 'minmax': MinMaxScaler().fit(X_train)}
+    segments, scaled_segments = prepare_segments(store, scalers, cache_dir)
+    return {'scalers': scalers, 'segments': segments, 'scaled_segments': scaled_segments}, store.fingerprint()
+
+def fit_model(model_key, model, X, y):
+    """
+    Fit one model, run in a joblib worker
+
+    Returns:
+        Tuple of (model_key, fitted model, fit time in seconds)
+    """
+    start = time.perf_counter()
+    model.fit(X, y)
+    return model_key, model, time.perf_counter() - start
+
+def update_model(model_key, model, X_new, y_new, X_earlier, y_earlier, earlier_weight, extra_trees=0):
+    """
+    Update a fitted model with new training rows, run in a joblib worker
+
+    The work grows with the new rows, not with all training rows. Models that
+    cannot fold new rows into their fitted state see them together with a bounded
+    random sample of the earlier rows.
+
+    Args:
+        model_key: Name of the model
+        model: Fitted estimator
+        X_new: Scaled training rows of the new segments
+        y_new: Targets of the new rows
+        X_earlier: Random sample of the earlier scaled training rows, in random order
+        y_earlier: Targets of the sampled rows
+        earlier_weight: Earlier training rows each sampled row stands for
+        extra_trees: Trees a random forest grows
+
+    Returns:
+        Tuple of (model_key, updated model, update time in seconds)
+    """
+    start = time.perf_counter()
+    if isinstance(model, GaussianNB):
+        # Folds the new rows into the per-class means and variances
+        model.partial_fit(X_new, y_new)
+    elif isinstance(model, KNeighborsClassifier):
+        if model._fit_method == 'brute' and np.isin(y_new, model.classes_).all():
+            # Brute force search only keeps the points, so the new rows are appended to them
+            model._fit_X = np.vstack([model._fit_X, X_new])
+            model._y = np.concatenate([model._y, np.searchsorted(model.classes_, y_new)])
+            model.n_samples_fit_ = len(model._fit_X)
+        else:
+            # A KD or ball tree cannot insert points and is rebuilt from the stored ones
+            model.fit(np.vstack([model._fit_X, X_new]), np.concatenate([model.classes_[model._y], y_new]))
+    elif isinstance(model, LogisticRegression):
+        # Starting from the previous coefficients, the solver needs a few iterations. The
+        # weighted sample stands in for the earlier rows, so the loss it minimizes estimates
+        # the loss over all training rows
+        weights = np.concatenate([np.ones(len(y_new)), np.full(len(y_earlier), earlier_weight)])
+        model.set_params(warm_start=True).fit(
+            np.vstack([X_new, X_earlier]), np.concatenate([y_new, y_earlier]), sample_weight=weights
+        )
+        model.set_params(warm_start=False)
+    elif isinstance(model, RandomForestClassifier):
+        # Only the extra trees are fitted, on the new rows and as many earlier ones, so
+        # they reflect the new rows but still see every class
+        X_fit = np.vstack([X_new, X_earlier[:len(y_new)]])
+        y_fit = np.concatenate([y_new, y_earlier[:len(y_new)]])
+        if not np.isin(model.classes_, y_fit).all():
+            X_fit, y_fit = np.vstack([X_new, X_earlier]), np.concatenate([y_new, y_earlier])
+        model.set_params(warm_start=True, n_estimators=len(model.estimators_) + extra_trees).fit(X_fit, y_fit)
+        model.set_params(warm_start=False)
+    else:
+        model.fit(np.vstack([X_new, X_earlier]), np.concatenate([y_new, y_earlier]))
+    return model_key, model, time.perf_counter() - start
+
+def forest_growth(model, new_rows, seen_rows):
+    """Extra trees that keep a forest's trees per training row when new rows are added"""
+    return max(1, math.ceil(len(model.estimators_) * new_rows / max(seen_rows, 1)))
+
+def load_state(state_path):
+    """Fingerprints of the models fitted by earlier runs"""
+    if not os.path.exists(state_path):
+        return {}
+    with open(state_path) as file:
+        return json.load(file)
+
+def save_state(state_path, state):
+    """Record the fingerprints of the fitted models"""
+    tmp_path = f'{state_path}.tmp'
+    with open(tmp_path, 'w') as file:
+        json.dump(state, file, indent=2, sort_keys=True)
+    os.replace(tmp_path, state_path)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--data', default=DATA_PATH,
+                        help=f'Labelled dataset the feature store is created from on the first run (default: {DATA_PATH})')
+    parser.add_argument('--store', default=STORE_PATH, help=f'Feature store with the training data (default: {STORE_PATH})')
+    parser.add_argument('--out-dir', default=OUT_DIR, help=f'Directory to write the pickles to (default: {OUT_DIR})')
+    parser.add_argument('--jobs', type=int, default=-1, help='Models fitted concurrently, -1 for all cores (default: -1)')
+    parser.add_argument('--full', '--force', dest='full', action='store_true',
+                        help='Refit the scalers and every model on all rows instead of updating them')
+    parser.add_argument('--hyperparameters',
+                        help='Tuned hyperparameters JSON (default: hyperparameters.json in the output directory)')
+    parser.add_argument('--default-hyperparameters', action='store_true',
+                        help='Ignore the tuned hyperparameters and use the defaults')
+    parser.add_argument('--processes', action='store_true',
+                        help='Fit in worker processes instead of threads, for estimators that hold the GIL')
+    parser.add_argument('--bundle', action='store_true',
+                        help=f'Write {BUNDLE_FILENAME} for HEART_MODEL_FORMAT=bundle, a bundle already in the '
+                             'output directory is kept up to date either way')
+    parser.add_argument('--compare-serial', action='store_true',
+                        help='Refit the trained models one after another to measure the speedup')
+    args = parser.parse_args()
+
+    total_start = time.perf_counter()
+    cache_dir = os.path.join(args.out_dir, '.cache')
+    state_path = os.path.join(cache_dir, 'training_state.json')
+    os.makedirs(args.out_dir, exist_ok=True)
+
+    store = FeatureStore.open_or_create(args.store, args.data)
+    segments = store.segment_ids()
+    train_rows = {segment['id']: segment['rows'] - segment['holdout_rows'] for segment in store.segments}
+    state = {} if args.full else load_state(state_path)
+    hyperparameters = {} if args.default_hyperparameters else load_hyperparameters(
+        args.hyperparameters or os.path.join(args.out_dir, 'hyperparameters.json')
+    )
+    if hyperparameters:
+        print(f"Using tuned hyperparameters for {', '.join(sorted(hyperparameters))}")
+    models = build_models(hyperparameters)
+    fingerprints = {model_key: model_fingerprint(model) for model_key, model in models.items()}
+
+    def trained_through(entry):
+        """Segments an earlier run trained on, None unless they are still the start of the store"""
+        trained = entry.get('segments') if isinstance(entry, dict) else None
+        return trained if trained is not None and trained == segments[:len(trained)] else None
+
+    # Keep the scalers unless the store was rebuilt or they are missing, since every
+    # updated model depends on them
+    scaler_paths = {
+        'standard': os.path.join(args.out_dir, 'standard_scaler.pkl'),
+        'minmax': os.path.join(args.out_dir, 'minmax_scaler.pkl')
     }
-}
-
-# Train and save all models
-for model_name, model_variants in models.items():
-    print(f"Training and saving {model_name} models...")
-    
-    # Train and save scaled model
-    model_variants['scaled'].fit(X_train_scaled, y_train)
-    with open(os.path.join(OUT_DIR, f'{model_name}_model_scaled.pkl'), 'wb') as file:
-        pickle.dump(model_variants['scaled'], file)
-    
-    # Train and save normalized model
-    model_variants['normalized'].fit(X_train_normalized, y_train)
-    with open(os.path.join(OUT_DIR, f'{model_name}_model_normalized.pkl'), 'wb') as file:
-        pickle.dump(model_variants['normalized'], file)
-
-print("All models have been trained and saved successfully!")
-print("Generated pickle files:")
-for model_name in models.keys():
-    print(f"- {model_name}_model_scaled.pkl")
-    print(f"- {model_name}_model_normalized.pkl")
-print("- standard_scaler.pkl")
-print("- minmax_scaler.pkl")
+    scalers_changed = trained_through(state.get('scalers')) is None or not all(os.path.exists(path) for path in scaler_paths.values())
+    scalers = None
+    if not scalers_changed:
+        scalers = {}
+        for name, path in scaler_paths.items():
+            with open(path, 'rb') as file:
+                scalers[name] = pickle.load(file)
+
+    if scalers_changed:
+        state = {'scalers': {'segments': segments}}
+
+    # Refit the models whose configuration changed (None), update those that have not
+    # seen the newest segments (the segments they were trained on) and skip the rest
+    plan = {}
+    for model_key in models:
+        entry = state.get('models', {}).get(model_key)
+        trained = trained_through(entry)
+        if trained is None or entry.get('fingerprint') != fingerprints[model_key] or not os.path.exists(model_path(args.out_dir, model_key)):
+            plan[model_key] = None
+        elif trained == segments:
+            print(f"Skipping {model_key}, up to date")
+        else:
+            plan[model_key] = trained
+
+    report_path = os.path.join(args.out_dir, REPORT_FILENAME)
+    bundle_path = os.path.join(args.out_dir, BUNDLE_FILENAME)
+    # The API loads the per-model pickles by default, so the bundle is only written
+    # on request, or to keep one that exists from going stale
+    bundle_kept = args.bundle or os.path.exists(bundle_path)
+    if not plan and os.path.exists(report_path) and (not bundle_kept or os.path.exists(bundle_path)):
+        # The drift report and the bundle describe these models already
+        print(f"Finished in {time.perf_counter() - total_start:.2f}s")
+        print("All models were up to date")
+        return
+
+    print("Preparing data...")
+    start = time.perf_counter()
+    prepared, data_hash = prepare_data(store, cache_dir, scalers)
+    print(f"Prepared {sum(train_rows.values())} training rows of {len(segments)} segments, "
+          f"{prepared['scaled_segments']} of them scaled by this run, in {time.perf_counter() - start:.3f}s")
+    if scalers_changed:
+        print("Saving scalers...")
+        for name, path in scaler_paths.items():
+            atomic_dump(prepared['scalers'][name], path)
+
+    all_rows = {}
+
+    def all_training_rows(name):
+        """All training rows of one prepared array, concatenated on first use"""
+        if name not in all_rows:
+            all_rows[name] = training_rows(prepared['segments'], segments, name)
+        return all_rows[name]
+
+    tasks, modes = [], {}
+    for model_key, trained in plan.items():
+        model = models[model_key]
+        scaling = model_key.rsplit('_', 1)[1]
+        fitted = None
+        if trained is not None:
+            with open(model_path(args.out_dir, model_key), 'rb') as file:
+                fitted = pickle.load(file)
+            new_segments = segments[len(trained):]
+            new_rows = sum(train_rows[segment] for segment in new_segments)
+            extra_trees = 0
+            if isinstance(fitted, RandomForestClassifier):
+                extra_trees = forest_growth(fitted, new_rows, sum(train_rows[segment] for segment in trained))
+                if len(fitted.estimators_) + extra_trees > FOREST_GROWTH_LIMIT * model.n_estimators:
+                    print(f"Refitting {model_key}, updates would grow it past {FOREST_GROWTH_LIMIT}x its size")
+                    fitted = None
+        if fitted is None:
+            modes[model_key] = 'full'
+            tasks.append(delayed(fit_model)(model_key, model, all_training_rows(scaling), all_training_rows('target')))
+            continue
+
+        # GaussianNB and KNN fold the new rows into their state without the earlier ones
+        sample_size = 0
+        if not isinstance(fitted, (GaussianNB, KNeighborsClassifier)):
+            sample_size = max(UPDATE_SAMPLE_MIN, UPDATE_SAMPLE_FACTOR * new_rows)
+        X_earlier, y_earlier, earlier_weight = sample_rows(
+            prepared['segments'], trained, scaling, sample_size, [RANDOM_STATE, len(segments), list(models).index(model_key)]
+        )
+        modes[model_key] = f'{new_rows} new rows'
+        tasks.append(delayed(update_model)(
+            model_key, fitted, training_rows(prepared['segments'], new_segments, scaling),
+            training_rows(prepared['segments'], new_segments, 'target'), X_earlier, y_earlier, earlier_weight, extra_trees
+        ))
+
+    fit_times = {}
+    if tasks:
+        print(f"Training {len(tasks)} models with {args.jobs} jobs...")
+        fit_start = time.perf_counter()
+        # sklearn's tree building and linear solvers release the GIL, so threads
+        # parallelize the fits without copying the training data into workers
+        results = Parallel(n_jobs=args.jobs, prefer='processes' if args.processes else 'threads')(tasks)
+        fit_wall = time.perf_counter() - fit_start
+
+        state.setdefault('models', {})
+        for model_key, model, seconds in results:
+            atomic_dump(model, model_path(args.out_dir, model_key))
+            models[model_key] = model
+            fit_times[model_key] = seconds
+            state['models'][model_key] = {'fingerprint': fingerprints[model_key], 'segments': segments}
+            if modes[model_key] == 'full':
+                print(f"Trained {model_key} in {seconds:.3f}s")
+            else:
+                print(f"Updated {model_key} with {modes[model_key]} in {seconds:.3f}s")
+
+    # Reuse the fitted models that were up to date
+    for model_key in models:
+        if model_key not in modes:
+            with open(model_path(args.out_dir, model_key), 'rb') as file:
+                models[model_key] = pickle.load(file)
+
+    # Measure how far the quantized engines drift from the models on the held-out rows,
+    # the API only activates HEART_QUANTIZED when the drift is within its threshold
+    report_changed = tasks or not os.path.exists(report_path)
+    if report_changed:
+        X_holdout, y_holdout = store.read(holdout=True)
+        report = drift_report(prepared['scalers'], models, X_holdout, y_holdout)
+        report['model_digests'] = model_digests({model_key: model_path(args.out_dir, model_key) for model_key in models})
+        write_report(report_path, report)
+        print(f"Quantized engines drift from the models on {report['max_drift']:.2%} of {report['rows']} held-out rows")
+    else:
+        report = read_report(args.out_dir)
+
+    # Save everything as one memory-mappable bundle as well
+    if bundle_kept and (report_changed or not os.path.exists(bundle_path)):
+        print("Writing model bundle...")
+        write_bundle(bundle_path, scalers=prepared['scalers'], models=models, metadata={
+            'data_hash': data_hash,
+            'training_rows': sum(train_rows.values()),
+            'hyperparameters': {model_key: model.get_params() for model_key, model in models.items()},
+            'tuned_models': sorted(hyperparameters),
+            'quantization': report
+        })
+
+    os.makedirs(cache_dir, exist_ok=True)
+    save_state(state_path, state)
+
+    print(f"Finished in {time.perf_counter() - total_start:.2f}s")
+    if not fit_times:
+        print("All models were up to date")
+        return
+
+    refitted = [model_key for model_key in fit_times if modes[model_key] == 'full']
+    if args.compare_serial and refitted:
+        # Fit fresh copies of the same models one after another
+        serial_models = build_models(hyperparameters)
+        serial_start = time.perf_counter()
+        for model_key in refitted:
+            fit_model(model_key, serial_models[model_key], all_training_rows(model_key.rsplit('_', 1)[1]),
+                      all_training_rows('target'))
+        serial = time.perf_counter() - serial_start
+        label = "serial run"
+    else:
+        # Without a serial run, the per-model fit times add up to an estimate of it
+        serial = sum(fit_times.values())
+        label = "sum of fit times"
+    print(f"Model fitting: {fit_wall:.2f}s wall clock vs {serial:.2f}s {label}, "
+          f"{serial / fit_wall:.2f}x speedup with {args.jobs} jobs")
+
+if __name__ == '__main__':
+    main()
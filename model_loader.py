@@ -4,12 +4,35 @@ Model Loader Utility
 
 This utility provides functions to load different machine learning models
 for the cardiovascular heart disease prediction system.
+
+Every ModelLoader is a thin view of one model of the shared inference core,
+app.models.predictor.HeartDiseasePredictor, so the models and scalers are read
+once per models directory and predictions use the same trained scalers and
+engines as the API.
 """
 
-import pickle
-import os
 import numpy as np
-from sklearn.preprocessing import StandardScaler, MinMaxScaler
+from typing import Dict, Optional
+from app.models.predictor import HeartDiseasePredictor
+
+# Predictor of every models directory, shared by all loaders
+_predictors: Dict[Optional[str], HeartDiseasePredictor] = {}
+
+def get_predictor(models_dir: Optional[str] = None) -> HeartDiseasePredictor:
+    """
+    Get the shared predictor of a models directory, loading it on first use.
+    
+    Args:
+        models_dir (str): Directory containing the model pickles or bundle,
+                          defaults to the configured models directory
+    
+    Returns:
+        HeartDiseasePredictor: Predictor that loads each model on first use
+    """
+    predictor = _predictors.get(models_dir)
+    if predictor is None:
+        predictor = _predictors[models_dir] = HeartDiseasePredictor(models_dir, load_mode='lazy')
+    return predictor
 
 class ModelLoader:
     """
@@ -17,14 +40,9 @@ class ModelLoader:
     for heart disease prediction.
     """
     
-    AVAILABLE_MODELS = [
-        'knn',
-        'logistic_regression',
-        'naive_bayes',
-        'random_forest'
-    ]
+    AVAILABLE_MODELS = HeartDiseasePredictor.MODEL_TYPES
     
-    def __init__(self, model_type='knn', scaling='normalized'):
+    def __init__(self, model_type='knn', scaling='normalized', models_dir=None):
         """
         Initialize the model loader.
         
@@ -32,11 +50,16 @@ class ModelLoader:
             model_type (str): Type of model to load ('knn', 'logistic_regression', 
                              'naive_bayes', 'random_forest')
             scaling (str): Scaling method ('scaled' or 'normalized')
+            models_dir (str): Directory containing the model pickles or bundle,
+                             defaults to the configured models directory
         """
         self.model = None
         self.scaler = None
         self.model_type = model_type
         self.scaling = scaling
+        self.model_name = f"{model_type}_{scaling}"
+        self.predictor = None
+        self.models_dir = models_dir
         
         # Load the model and appropriate scaler
         self.load_model()
@@ -49,27 +72,19 @@ class ModelLoader:
         if self.scaling not in ['scaled', 'normalized']:
             raise ValueError("Scaling must be either 'scaled' or 'normalized'")
         
-        # Determine model and scaler file paths
-        model_path = f"{self.model_type}_model_{self.scaling}.pkl"
-        
-        if self.scaling == 'scaled':
-            scaler_path = "standard_scaler.pkl"
-        else:  # normalized
-            scaler_path = "minmax_scaler.pkl"
-        
-        # Check if files exist
-        if not os.path.exists(model_path):
-            raise FileNotFoundError(f"Model file {model_path} not found")
+        self.predictor = get_predictor(self.models_dir)
+        if self.model_name not in self.predictor.get_available_models():
+            raise FileNotFoundError(f"Model {self.model_name} not found in {self.predictor.models_dir}")
         
-        if not os.path.exists(scaler_path):
-            raise FileNotFoundError(f"Scaler file {scaler_path} not found")
+        self.predictor.model_set.ensure_loaded([self.model_name])
+        self.model = self.predictor.models.get(self.model_name)
+        if self.model is None:
+            raise ValueError(f"Model {self.model_name} failed to load")
         
-        # Load model and scaler
-        with open(model_path, 'rb') as file:
-            self.model = pickle.load(file)
-            
-        with open(scaler_path, 'rb') as file:
-            self.scaler = pickle.load(file)
+        scaler_name = 'standard' if self.scaling == 'scaled' else 'minmax'
+        self.scaler = self.predictor.scalers.get(scaler_name)
+        if self.scaler is None:
+            raise FileNotFoundError(f"Scaler {scaler_name} not found in {self.predictor.models_dir}")
             
         print(f"Successfully loaded {self.model_type} model with {self.scaling} scaling")
     
@@ -83,38 +98,32 @@ class ModelLoader:
         Returns:
             tuple: (prediction, probability)
         """
+        predictions, probabilities = self.predict_batch(features)
+        return predictions[0], probabilities[0] if probabilities is not None else None
+    
+    def predict_batch(self, features):
+        """
+        Make predictions for many patients at once.
+        
+        Args:
+            features (array-like): 2D array with one row of features per patient
+            
+        Returns:
+            tuple: (predictions, class probabilities per patient or None)
+        """
         if self.model is None or self.scaler is None:
             raise ValueError("Model or scaler not loaded")
         
         # Reshape features if needed
+        features = np.asarray(features, dtype=np.float64)
         if len(features.shape) == 1:
             features = features.reshape(1, -1)
         
-        # Apply appropriate scaling
-        features_transformed = self.scaler.transform(features)
-        
-        # Make prediction
-        prediction = self.model.predict(features_transformed)
-        
-        # Get probability if the model supports it
-        try:
-            probability = self.model.predict_proba(features_transformed)
-            return prediction[0], probability[0]
-        except AttributeError:
-            # If model doesn't support predict_proba
-            return prediction[0], None
+        return self.predictor.predict_probabilities(features, self.model_name)
     
     def list_available_models(self):
         """List all available models in the system."""
-        available_models = []
-        
-        for model_type in self.AVAILABLE_MODELS:
-            for scaling in ['scaled', 'normalized']:
-                model_path = f"{model_type}_model_{scaling}.pkl"
-                if os.path.exists(model_path):
-                    available_models.append(f"{model_type}_{scaling}")
-        
-        return available_models
+        return self.predictor.get_available_models()
 
 
 # Example usage
@@ -135,7 +144,7 @@ if __name__ == "__main__":
             try:
                 model = ModelLoader(model_type=model_type, scaling=scaling)
                 prediction, probability = model.predict(sample)
-                prob_str = f"{probability[prediction]:.4f}" if probability is not None else "N/A"
+                prob_str = f"{probability[list(model.model.classes_).index(prediction)]:.4f}" if probability is not None else "N/A"
                 print(f"{model_type}_{scaling}: Prediction={prediction}, Probability={prob_str}")
             except Exception as e:
                 print(f"{model_type}_{scaling}: Error - {str(e)}")
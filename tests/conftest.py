@@ -0,0 +1,41 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+from fastapi.testclient import TestClient
+
+from app.config import settings
+from app.main import app
+from app.models.bundle import read_pickles
+from app.schemas.patient import FEATURE_COLUMNS
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+@pytest.fixture(scope="session")
+def features() -> np.ndarray:
+    """Every row of Data/heart.csv as a float64 feature matrix"""
+    data = pd.read_csv(os.path.join(ROOT, "Data", "heart.csv"))
+    return data[FEATURE_COLUMNS].to_numpy(dtype=np.float64)
+
+@pytest.fixture(scope="session")
+def patients() -> list:
+    """Every row of Data/heart.csv as a PatientData request body"""
+    data = pd.read_csv(os.path.join(ROOT, "Data", "heart.csv"))
+    return data[FEATURE_COLUMNS].to_dict(orient="records")
+
+@pytest.fixture(scope="session")
+def pickles():
+    """Scalers and models keyed by model name, unpickled from pickles/"""
+    return read_pickles(os.path.join(ROOT, "pickles"))
+
+@pytest.fixture(scope="session")
+def client(tmp_path_factory):
+    """API test client serving pickles/, with its job store in a temporary directory"""
+    job_db = settings.job_db
+    settings.job_db = str(tmp_path_factory.mktemp("jobs") / "jobs.sqlite3")
+    try:
+        with TestClient(app) as test_client:
+            yield test_client
+    finally:
+        settings.job_db = job_db
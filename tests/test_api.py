@@ -0,0 +1,32 @@
+import pytest
+
+from app.config import settings
+
+MODEL_NAMES = ["knn_scaled", "logistic_regression_normalized", "naive_bayes_scaled", "random_forest_scaled"]
+
+def test_batch_results_match_single_rows(client, patients):
+    batch = client.post("/predict_all/batch", json=patients).json()["results"]
+    
+    assert batch == [client.post("/predict_all", json=patient).json() for patient in patients]
+
+@pytest.mark.parametrize("model_name", MODEL_NAMES)
+def test_model_batch_results_match_single_rows(client, patients, model_name):
+    batch = client.post(f"/predict/{model_name}/batch", json=patients).json()["results"]
+    
+    assert batch == [client.post(f"/predict/{model_name}", json=patient).json() for patient in patients]
+
+@pytest.mark.parametrize("route", ["/predict_all/batch", "/predict/knn_scaled/batch"])
+def test_oversized_batch_is_a_413(client, patients, monkeypatch, route):
+    monkeypatch.setattr(settings, "batch_max_rows", 100)
+    
+    response = client.post(route, json=patients)
+    assert response.status_code == 413
+    assert "/jobs" in response.json()["detail"]
+    assert client.post(route, json=patients[:100]).status_code == 200
+
+def test_jobs_take_batches_beyond_the_limit(client, patients, monkeypatch):
+    monkeypatch.setattr(settings, "batch_max_rows", 100)
+    
+    response = client.post("/jobs", json=patients)
+    assert response.status_code == 202
+    assert client.delete(f"/jobs/{response.json()['job_id']}").status_code == 200
@@ -0,0 +1,103 @@
+import asyncio
+import threading
+
+import numpy as np
+import pytest
+
+from app.services.batcher import MicroBatcher
+from app.services.executor import ExecutorSaturatedError, InferenceExecutor
+
+def row_sums(matrix: np.ndarray) -> list:
+    if (matrix < 0).any():
+        raise ValueError("negative feature")
+    return matrix.sum(axis=1).tolist()
+
+async def submit_all(batcher: MicroBatcher, rows) -> list:
+    return await asyncio.gather(*(batcher.submit(row) for row in rows), return_exceptions=True)
+
+def test_lone_row_is_dispatched_without_waiting():
+    async def scenario():
+        executor = InferenceExecutor(1, 4)
+        batcher = MicroBatcher(row_sums, executor, max_batch_size=8, max_wait_ms=10000)
+        try:
+            return await asyncio.wait_for(batcher.submit(np.array([1.0, 2.0])), timeout=1), batcher.stats()
+        finally:
+            executor.shutdown()
+    
+    result, stats = asyncio.run(scenario())
+    assert result == 3.0
+    assert stats["batches"] == 1 and stats["rows"] == 1
+
+def test_concurrent_rows_are_batched_and_fanned_out():
+    async def scenario():
+        executor = InferenceExecutor(1, 4)
+        batcher = MicroBatcher(row_sums, executor, max_batch_size=4, max_wait_ms=10000)
+        try:
+            # The first row finds the executor idle, the other four fill one batch
+            rows = [np.array([float(index), 1.0]) for index in range(5)]
+            return await asyncio.wait_for(submit_all(batcher, rows), timeout=1), batcher.stats()
+        finally:
+            executor.shutdown()
+    
+    results, stats = asyncio.run(scenario())
+    assert results == [1.0, 2.0, 3.0, 4.0, 5.0]
+    assert stats["batches"] == 2 and stats["rows"] == 5
+    assert stats["batch_size_histogram"] == {"1": 1, "2": 0, "4": 1}
+    assert stats["mean_batch_size"] == 2.5
+
+def test_failing_batch_is_retried_row_by_row():
+    async def scenario():
+        executor = InferenceExecutor(1, 4)
+        batcher = MicroBatcher(row_sums, executor, max_batch_size=3, max_wait_ms=10000)
+        try:
+            rows = [np.array([1.0]), np.array([2.0]), np.array([-1.0]), np.array([4.0])]
+            return await asyncio.wait_for(submit_all(batcher, rows), timeout=1)
+        finally:
+            executor.shutdown()
+    
+    results = asyncio.run(scenario())
+    assert results[:2] == [1.0, 2.0] and results[3] == 4.0
+    assert isinstance(results[2], ValueError)
+
+def test_saturated_executor_fails_the_batch_without_retries():
+    calls = []
+    
+    def counted(matrix: np.ndarray) -> list:
+        calls.append(len(matrix))
+        return row_sums(matrix)
+    
+    async def scenario():
+        executor = InferenceExecutor(1, 0)
+        batcher = MicroBatcher(counted, executor, max_batch_size=8, max_wait_ms=1)
+        release = threading.Event()
+        try:
+            # Occupy the only thread, with no room left in the queue
+            busy = asyncio.ensure_future(executor.run(release.wait))
+            await asyncio.sleep(0)
+            results = await asyncio.wait_for(submit_all(batcher, [np.array([1.0]), np.array([2.0])]), timeout=1)
+            release.set()
+            await busy
+            return results, executor.stats()
+        finally:
+            release.set()
+            executor.shutdown()
+    
+    results, stats = asyncio.run(scenario())
+    assert all(isinstance(result, ExecutorSaturatedError) for result in results)
+    assert calls == [] and stats["rejected"] == 1
+
+class SaturatedExecutor:
+    idle = False
+    
+    async def run(self, func, *args):
+        raise ExecutorSaturatedError("Inference queue is full, please retry later")
+
+def test_saturation_is_a_503(client, monkeypatch):
+    batcher = MicroBatcher(row_sums, SaturatedExecutor(), max_batch_size=8, max_wait_ms=1)
+    monkeypatch.setattr(client.app.state, "batcher", batcher)
+    patient = {"age": 52, "sex": 1, "cp": 0, "trestbps": 125, "chol": 212, "fbs": 0, "restecg": 1,
+               "thalach": 168, "exang": 0, "oldpeak": 1.0, "slope": 2, "ca": 2, "thal": 3}
+    
+    response = client.post("/predict_all", json=patient)
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
@@ -0,0 +1,92 @@
+import numpy as np
+import pytest
+
+from app.models.predictor import HeartDiseasePredictor
+from app.services import cache as cache_module
+from app.services.cache import PredictionCache
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Monotonic clock of the cache module, advanced by the test"""
+    now = [1000.0]
+    monkeypatch.setattr(cache_module.time, "monotonic", lambda: now[0])
+    return now
+
+@pytest.fixture(scope="module")
+def predictor() -> HeartDiseasePredictor:
+    """Predictor with a prediction cache of its own"""
+    predictor = HeartDiseasePredictor(compiled=False, flat_forest=False, flat_knn=False, quantized=False)
+    predictor.cache = PredictionCache(1000)
+    return predictor
+
+def test_least_recently_used_entry_is_evicted():
+    cache = PredictionCache(2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
+
+def test_entries_expire_after_the_ttl(clock):
+    cache = PredictionCache(10, ttl_seconds=5)
+    cache.put("a", 1)
+    
+    clock[0] += 4.9
+    assert cache.get("a") == 1
+    clock[0] += 0.1
+    assert cache.get("a") is None
+    stats = cache.stats()
+    assert stats["size"] == 0 and stats["hits"] == 1 and stats["misses"] == 1
+
+def test_zero_ttl_never_expires(clock):
+    cache = PredictionCache(10, ttl_seconds=0)
+    cache.put("a", 1)
+    
+    clock[0] += 1e9
+    assert cache.get("a") == 1
+
+def test_integer_and_float_rows_share_an_entry(predictor, features):
+    predictor.cache.clear()
+    row = features[(features == np.round(features)).all(axis=1)][:1]
+    first = predictor.predict_batch_with_model(row.astype(np.int64), "knn_scaled")
+    hits = predictor.cache.stats()["hits"]
+    
+    assert predictor.predict_batch_with_model(row, "knn_scaled") == first
+    assert predictor.cache.stats()["hits"] == hits + 1
+
+def test_models_and_ensembles_do_not_share_entries(predictor, features):
+    predictor.cache.clear()
+    # Contiguous like the rows the cache computes, so BLAS rounds them the same way
+    rows = np.ascontiguousarray(features[:20])
+    uncached = HeartDiseasePredictor.__new__(HeartDiseasePredictor)
+    uncached.__dict__.update(predictor.__dict__, cache=None)
+    
+    # Fill the cache under every scope first, then read every scope back from it
+    scopes = [
+        lambda p: p.predict_batch_with_model(rows, "knn_scaled"),
+        lambda p: p.predict_batch_with_model(rows, "random_forest_scaled"),
+        lambda p: p.predict_batch_with_all_models(rows),
+        lambda p: p.predict_batch_with_all_models(rows, ["knn_scaled", "naive_bayes_scaled"])
+    ]
+    for scope in scopes:
+        scope(predictor)
+    for scope in scopes:
+        assert scope(predictor) == scope(uncached)
+    # Fast consensus skips models, so it is not served the full ensemble's entries
+    assert any(len(result) < 8 for result in predictor.predict_batch_with_all_models(rows, fast=True))
+
+def test_cached_results_cannot_be_altered(predictor, features):
+    predictor.cache.clear()
+    row = features[:1]
+    predictor.predict_batch_with_all_models(row)[0]["knn_scaled"]["prediction"] = -1
+    
+    assert predictor.predict_batch_with_all_models(row)[0]["knn_scaled"]["prediction"] in (0, 1)
+
+def test_reload_clears_the_cache(predictor, features):
+    predictor.predict_batch_with_model(features[:5], "knn_scaled")
+    predictor.reload()
+    
+    assert predictor.cache.stats()["size"] == 0
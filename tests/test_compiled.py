@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+
+from app.models.compiled import CompiledEnsemble
+from app.models.predictor import HeartDiseasePredictor
+
+@pytest.fixture(scope="module")
+def ensemble(pickles) -> CompiledEnsemble:
+    scalers, models = pickles
+    return CompiledEnsemble(scalers, models)
+
+def test_compiles_linear_and_naive_bayes_models(ensemble):
+    assert sorted(ensemble.model_keys) == [
+        "logistic_regression_normalized", "logistic_regression_scaled",
+        "naive_bayes_normalized", "naive_bayes_scaled"
+    ]
+
+def test_transform_matches_scalers(ensemble, pickles, features):
+    scalers, _ = pickles
+    features_scaled, features_normalized = ensemble.transform(features)
+    
+    np.testing.assert_allclose(features_scaled, scalers['standard'].transform(features), rtol=0, atol=1e-12)
+    np.testing.assert_allclose(features_normalized, scalers['minmax'].transform(features), rtol=0, atol=1e-12)
+
+def test_batch_matches_sklearn(ensemble, pickles, features):
+    scalers, models = pickles
+    probabilities = ensemble.predict_proba_all(*ensemble.transform(features))
+    
+    for model_key in ensemble.model_keys:
+        scaler = scalers['standard' if '_scaled' in model_key else 'minmax']
+        reference = models[model_key].predict_proba(scaler.transform(features))
+        np.testing.assert_allclose(probabilities[model_key], reference, rtol=0, atol=1e-12)
+        np.testing.assert_array_equal(probabilities[model_key].argmax(axis=1), reference.argmax(axis=1))
+
+def test_single_row_matches_sklearn(ensemble, pickles, features):
+    scalers, models = pickles
+    for model_key in ensemble.model_keys:
+        scaler = scalers['standard' if '_scaled' in model_key else 'minmax']
+        for row in features:
+            row = row.reshape(1, -1)
+            features_scaled, features_normalized = ensemble.transform(row)
+            transformed_features = features_scaled if '_scaled' in model_key else features_normalized
+            probabilities = ensemble.predict_proba(model_key, transformed_features)
+            reference = models[model_key].predict_proba(scaler.transform(row))
+            np.testing.assert_allclose(probabilities, reference, rtol=0, atol=1e-12)
+            assert probabilities.argmax() == reference.argmax()
+
+def test_predictor_labels_match_sklearn(features):
+    predictor = HeartDiseasePredictor(compiled=True, flat_forest=False, flat_knn=False, quantized=False)
+    predictor.cache = None
+    assert predictor.compiled is not None
+    
+    for model_key, (predictions, probabilities) in predictor.predict_arrays(features).items():
+        scaler = predictor.scalers['standard' if '_scaled' in model_key else 'minmax']
+        reference = predictor.models[model_key].predict_proba(scaler.transform(features))
+        np.testing.assert_array_equal(predictions, predictor.models[model_key].predict(scaler.transform(features)))
+        np.testing.assert_allclose(probabilities, reference.max(axis=1), rtol=0, atol=1e-12)
@@ -0,0 +1,115 @@
+import json
+from typing import List
+
+import numpy as np
+import pytest
+from fastapi import FastAPI, HTTPException
+from fastapi.exceptions import RequestValidationError
+from fastapi.testclient import TestClient
+
+from app.schemas.decoding import decode_patient, decode_patients
+from app.schemas.patient import FEATURE_COLUMNS, PatientData
+
+PATIENT = {"age": 52, "sex": 1, "cp": 0, "trestbps": 125, "chol": 212, "fbs": 0, "restecg": 1,
+           "thalach": 168, "exang": 0, "oldpeak": 1.0, "slope": 2, "ca": 2, "thal": 3}
+ROW = [PATIENT[column] for column in FEATURE_COLUMNS]
+
+def without(name: str) -> dict:
+    return {key: value for key, value in PATIENT.items() if key != name}
+
+INVALID_BODIES = {
+    "above maximum": json.dumps(dict(PATIENT, age=500)),
+    "below minimum": json.dumps(dict(PATIENT, chol=10)),
+    "fractional category": json.dumps(dict(PATIENT, sex=0.5)),
+    "missing feature": json.dumps(without("chol")),
+    "text value": json.dumps(dict(PATIENT, thal="normal")),
+    "null value": json.dumps(dict(PATIENT, ca=None)),
+    "not an object": json.dumps([PATIENT]),
+    "malformed JSON": '{"age": 52,',
+    "empty body": ""
+}
+
+@pytest.fixture(scope="module")
+def reference():
+    """App taking PatientData as a FastAPI body parameter, whose 422s the decoders must match"""
+    app = FastAPI()
+    
+    @app.post("/patient")
+    def patient(patient: PatientData) -> dict:
+        return {}
+    
+    @app.post("/patients")
+    def patients(patients: List[PatientData]) -> dict:
+        return {}
+    
+    return TestClient(app)
+
+def error_locations(error: RequestValidationError) -> list:
+    return [(item["type"], tuple(item["loc"])) for item in error.errors()]
+
+def test_valid_patient_takes_the_fast_path(monkeypatch):
+    # The fast path never builds a PatientData
+    monkeypatch.setattr(PatientData, "model_validate", None)
+    
+    np.testing.assert_array_equal(decode_patient(json.dumps(PATIENT).encode()), ROW)
+    np.testing.assert_array_equal(decode_patients(json.dumps([PATIENT, PATIENT]).encode()), [ROW, ROW])
+
+@pytest.mark.parametrize("body", [
+    dict(PATIENT, age="52", ca="2"),
+    dict(PATIENT, sex=1.0, thal=3.0),
+    dict(PATIENT, comment="extra fields are ignored")
+], ids=["numeric strings", "whole floats", "extra field"])
+def test_fallback_accepts_what_patientdata_accepts(body):
+    np.testing.assert_array_equal(decode_patient(json.dumps(body).encode()), ROW)
+    np.testing.assert_array_equal(decode_patients(json.dumps([PATIENT, body]).encode()), [ROW, ROW])
+
+@pytest.mark.parametrize("name", INVALID_BODIES)
+def test_invalid_patient_errors_match_patientdata(reference, name):
+    body = INVALID_BODIES[name].encode()
+    expected = reference.post("/patient", content=body, headers={"content-type": "application/json"})
+    assert expected.status_code == 422
+    
+    with pytest.raises(RequestValidationError) as error:
+        decode_patient(body)
+    assert error_locations(error.value) == [(item["type"], tuple(item["loc"])) for item in expected.json()["detail"]]
+
+@pytest.mark.parametrize("body", [
+    json.dumps([PATIENT, dict(PATIENT, sex=0.5)]),
+    json.dumps([PATIENT, without("age"), "patient"]),
+    json.dumps(PATIENT),
+    "[",
+    ""
+], ids=["fractional category", "missing feature and not an object", "not a list", "malformed JSON", "empty body"])
+def test_invalid_list_errors_match_patientdata(reference, body):
+    expected = reference.post("/patients", content=body.encode(), headers={"content-type": "application/json"})
+    assert expected.status_code == 422
+    
+    with pytest.raises(RequestValidationError) as error:
+        decode_patients(body.encode())
+    assert error_locations(error.value) == [(item["type"], tuple(item["loc"])) for item in expected.json()["detail"]]
+
+def test_invalid_row_of_a_list_is_located_by_its_index():
+    body = json.dumps([PATIENT, dict(PATIENT, age=-1), PATIENT]).encode()
+    
+    with pytest.raises(RequestValidationError) as error:
+        decode_patients(body)
+    assert error_locations(error.value) == [("greater_than_equal", ("body", 1, "age"))]
+
+def test_non_finite_values_are_rejected():
+    for value in ("NaN", "Infinity"):
+        body = json.dumps(PATIENT).replace('"oldpeak": 1.0', f'"oldpeak": {value}').encode()
+        with pytest.raises(RequestValidationError) as error:
+            decode_patient(body)
+        assert [location for _, location in error_locations(error.value)] == [("body", "oldpeak")]
+
+def test_undecodable_body_is_a_400():
+    with pytest.raises(HTTPException) as error:
+        decode_patient(b'{"age": "\xff"}')
+    assert error.value.status_code == 400
+
+@pytest.mark.parametrize("route", ["/predict_all", "/predict/knn_scaled"])
+def test_invalid_patient_is_a_422(client, route):
+    response = client.post(route, json=dict(PATIENT, age=500))
+    
+    assert response.status_code == 422
+    assert [item["loc"] for item in response.json()["detail"]] == [["body", "age"]]
@@ -0,0 +1,56 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from app.services.executor import ExecutorSaturatedError, InferenceExecutor
+
+@pytest.fixture
+def saturated(client, monkeypatch):
+    """Replace the app's executor with one whose only thread is busy and whose queue has no room"""
+    executor = InferenceExecutor(1, 0)
+    release = threading.Event()
+    monkeypatch.setattr(client.app.state, "executor", executor)
+    busy = client.portal.start_task_soon(executor.run, release.wait)
+    while executor.idle:
+        time.sleep(0.001)
+    yield executor
+    release.set()
+    busy.result()
+    executor.shutdown()
+
+def test_jobs_beyond_workers_and_queue_are_rejected():
+    async def scenario():
+        executor = InferenceExecutor(2, 1)
+        release = threading.Event()
+        try:
+            running = [asyncio.ensure_future(executor.run(release.wait)) for _ in range(3)]
+            await asyncio.sleep(0)
+            with pytest.raises(ExecutorSaturatedError):
+                await executor.run(sum, [1, 2])
+            stats = executor.stats()
+            release.set()
+            await asyncio.gather(*running)
+            return stats, await executor.run(sum, [1, 2]), executor.stats()
+        finally:
+            release.set()
+            executor.shutdown()
+    
+    stats, result, after = asyncio.run(scenario())
+    assert stats == {"max_workers": 2, "max_queue_size": 1, "in_flight": 3, "queued": 1, "rejected": 1}
+    assert result == 3
+    assert after["in_flight"] == 0 and after["rejected"] == 1
+
+@pytest.mark.parametrize("route, batch", [
+    ("/predict/knn_scaled", False),
+    ("/predict/knn_scaled/batch", True),
+    ("/predict_all?models=knn_scaled,naive_bayes_scaled", False),
+    ("/predict_all/batch", True)
+])
+def test_saturated_executor_is_a_503(client, patients, saturated, route, batch):
+    response = client.post(route, json=patients[:3] if batch else patients[0])
+    
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+    assert saturated.stats()["rejected"] == 1
@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+
+from app.models.predictor import HeartDiseasePredictor
+
+@pytest.fixture(scope="module")
+def predictor() -> HeartDiseasePredictor:
+    """Predictor in fast consensus mode, without the prediction cache"""
+    predictor = HeartDiseasePredictor(compiled=False, flat_forest=False, flat_knn=False, quantized=False,
+                                      fast_consensus=True)
+    predictor.cache = None
+    return predictor
+
+def test_fast_consensus_matches_every_model(predictor, features):
+    fast = predictor.predict_batch_with_all_models(features)
+    full = predictor.predict_batch_with_all_models(features, fast=False)
+    
+    for fast_result, full_result in zip(fast, full):
+        assert predictor.get_consensus_prediction(fast_result)[0] == predictor.get_consensus_prediction(full_result)[0]
+        # The models that ran predict what they predict with every model running
+        for model_key, prediction in fast_result.items():
+            assert prediction["prediction"] == full_result[model_key]["prediction"]
+            assert prediction["probability"] == pytest.approx(full_result[model_key]["probability"], abs=1e-12)
+
+def test_models_stop_once_the_vote_is_settled(predictor, features):
+    order = predictor._cost_order(predictor.ensemble_keys())
+    results = predictor.predict_batch_with_all_models(features)
+    
+    for result in results:
+        ran = [model_key for model_key in order if model_key in result]
+        # Models run in cost order, so the ones that ran come first
+        assert ran == order[:len(ran)]
+        if len(ran) < len(order):
+            positive = sum(result[model_key]["prediction"] == 1 for model_key in ran)
+            remaining = len(order) - len(ran)
+            assert 2 * positive > len(ran) + remaining or 2 * positive + remaining <= len(ran)
+    # The forests are skipped for most patients of the dataset
+    assert sum(len(result) < len(order) for result in results) > len(results) / 2
+
+def test_loaded_models_have_latency_estimates(predictor):
+    # Fast consensus warms every model on load and times a second run
+    model_keys = predictor.ensemble_keys()
+    
+    assert set(predictor.model_set.model_costs) == set(model_keys)
+    assert all(cost > 0 for cost in predictor.model_set.model_costs.values())
+    assert predictor.estimated_latency(model_keys) > 0
+
+def test_response_lists_the_skipped_models(client, patients):
+    # Without HEART_FAST_CONSENSUS the models are only timed once warmed
+    client.app.state.predictor.warm()
+    responses = [client.post("/predict_all?fast=true", json=patient).json() for patient in patients[:30]]
+    skipped = [response for response in responses if response["skipped_models"]]
+    
+    assert skipped
+    for response in skipped:
+        assert not set(response["skipped_models"]) & set(response["predictions"])
+        assert len(response["skipped_models"]) + len(response["predictions"]) == 8
+        assert response["estimated_latency_saved_ms"] > 0
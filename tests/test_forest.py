@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+
+from app.models.forest import FlatForest
+from app.models.predictor import HeartDiseasePredictor
+
+FOREST_KEYS = ["random_forest_scaled", "random_forest_normalized"]
+
+def transformed_features(pickles, model_key: str, features: np.ndarray) -> np.ndarray:
+    scalers, _ = pickles
+    return scalers['standard' if '_scaled' in model_key else 'minmax'].transform(features)
+
+@pytest.mark.parametrize("model_key", FOREST_KEYS)
+def test_batch_matches_sklearn(pickles, features, model_key):
+    model = pickles[1][model_key]
+    transformed = transformed_features(pickles, model_key, features)
+    forest = FlatForest(model)
+    
+    np.testing.assert_allclose(forest.predict_proba(transformed), model.predict_proba(transformed), rtol=0, atol=1e-12)
+    np.testing.assert_array_equal(forest.predict(transformed), model.predict(transformed))
+
+@pytest.mark.parametrize("model_key", FOREST_KEYS)
+def test_single_row_matches_sklearn(pickles, features, model_key):
+    model = pickles[1][model_key]
+    forest = FlatForest(model)
+    
+    for row in transformed_features(pickles, model_key, features):
+        row = row.reshape(1, -1)
+        np.testing.assert_allclose(forest.predict_proba(row), model.predict_proba(row), rtol=0, atol=1e-12)
+        assert forest.predict(row)[0] == model.predict(row)[0]
+
+@pytest.mark.parametrize("model_key", FOREST_KEYS)
+def test_chunked_batch_matches_sklearn(pickles, features, model_key):
+    model = pickles[1][model_key]
+    # More rows than one chunk, so the batch is evaluated in several steps
+    transformed = np.tile(transformed_features(pickles, model_key, features), (FlatForest.CHUNK_SIZE // len(features) + 2, 1))
+    
+    np.testing.assert_allclose(FlatForest(model).predict_proba(transformed), model.predict_proba(transformed),
+                               rtol=0, atol=1e-12)
+
+def test_predictor_labels_match_sklearn(features):
+    predictor = HeartDiseasePredictor(compiled=False, flat_forest=True, flat_knn=False, quantized=False)
+    predictor.cache = None
+    
+    predictions = predictor.predict_arrays(features, FOREST_KEYS)
+    for model_key in FOREST_KEYS:
+        assert isinstance(predictor.engines[model_key], FlatForest)
+        scaler = predictor.scalers['standard' if '_scaled' in model_key else 'minmax']
+        np.testing.assert_array_equal(predictions[model_key][0], predictor.models[model_key].predict(scaler.transform(features)))
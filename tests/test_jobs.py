@@ -0,0 +1,104 @@
+import time
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+import pytest
+
+from app.services.jobs import JobNotFoundError, JobQueue, JobStore
+
+@pytest.fixture
+def store(tmp_path):
+    job_store = JobStore(str(tmp_path / "jobs.sqlite3"))
+    yield job_store
+    job_store.close()
+
+def broken_future() -> Future:
+    future = Future()
+    future.set_exception(BrokenProcessPool("worker exited"))
+    return future
+
+def test_claim_takes_each_chunk_once(store, features):
+    job = store.create(features[:10], 4, {"models": None, "fast": None, "compact": False})
+    assert job["status"] == "queued" and job["chunks"] == 3
+    
+    first = store.claim(2, "a", 60.0)
+    second = store.claim(2, "b", 60.0)
+    assert [chunk for _, chunk, _, _, _, _ in first] == [0, 1]
+    assert [chunk for _, chunk, _, _, _, _ in second] == [2]
+    assert store.claim(2, "c", 60.0) == []
+    np.testing.assert_array_equal(first[1][4], features[4:8])
+    assert store.get(job["job_id"])["status"] == "running"
+
+def test_expired_lease_moves_the_chunk_to_another_owner(store, features):
+    job = store.create(features[:4], 4, {"models": None, "fast": None, "compact": False})
+    store.claim(1, "a", -1.0)
+    
+    assert store.requeue_expired() == 1
+    (job_id, chunk, rows, attempts, _, _), = store.claim(1, "b", 60.0)
+    assert attempts == 2
+    # The first owner lost the chunk and can no longer store its results
+    assert not store.complete_chunk(job_id, chunk, rows, b"[1,2,3,4]", "a")
+    assert store.complete_chunk(job_id, chunk, rows, b"[1,2,3,4]", "b")
+    assert store.get(job["job_id"])["status"] == "completed"
+    assert store.results(job["job_id"]) == (store.get(job["job_id"]), 1)
+    assert store.chunk_results(job["job_id"], 0, 8) == [b"[1,2,3,4]"]
+
+def test_renewed_lease_does_not_expire(store, features):
+    store.create(features[:4], 4, {"models": None, "fast": None, "compact": False})
+    store.claim(1, "a", -1.0)
+    
+    assert store.renew("a", 60.0) == 1
+    assert store.requeue_expired() == 0
+
+def test_worker_crashes_fail_the_job_after_max_attempts(store, features):
+    job = store.create(features[:4], 4, {"models": None, "fast": None, "compact": False})
+    queue = JobQueue(store, predictor=None, workers=1, chunk_size=4)
+    
+    for attempt in range(1, JobQueue.MAX_ATTEMPTS + 1):
+        (job_id, chunk, rows, attempts, _, _), = store.claim(1, queue.owner, 60.0)
+        assert attempts == attempt
+        queue._chunk_done(job_id, chunk, rows, attempts, broken_future())
+    
+    status = store.get(job["job_id"])
+    assert status["status"] == "failed"
+    assert f"{JobQueue.MAX_ATTEMPTS} times" in status["error"]
+    assert store.claim(1, queue.owner, 60.0) == []
+    assert queue.stats()["chunks_failed"] == 1
+
+def test_purge_deletes_only_jobs_finished_before_the_cutoff(store, features):
+    finished = store.create(features[:0], 4, {"models": None, "fast": None, "compact": False})
+    running = store.create(features[:4], 4, {"models": None, "fast": None, "compact": False})
+    
+    assert store.purge(finished["finished_at"]) == 0
+    assert store.purge(time.time() + 1) == 1
+    with pytest.raises(JobNotFoundError):
+        store.get(finished["job_id"])
+    assert store.get(running["job_id"])["status"] == "queued"
+
+def test_delete_removes_the_job_and_its_chunks(store, features):
+    job = store.create(features[:10], 4, {"models": None, "fast": None, "compact": False})
+    store.delete(job["job_id"])
+    
+    with pytest.raises(JobNotFoundError):
+        store.get(job["job_id"])
+    with pytest.raises(JobNotFoundError):
+        store.delete(job["job_id"])
+    assert store.claim(10, "a", 60.0) == []
+    assert store.chunk_results(job["job_id"], 0, 8) == []
+
+def test_streamed_job_results_match_the_batch_route(client, patients, monkeypatch):
+    # Enough chunks for several reads of the results stream
+    monkeypatch.setattr(client.app.state.jobs, "chunk_size", 20)
+    
+    job = client.post("/jobs", json=patients).json()
+    deadline = time.monotonic() + 60
+    while client.get(f"/jobs/{job['job_id']}").json()["status"] != "completed":
+        assert time.monotonic() < deadline
+        time.sleep(0.1)
+    
+    results = client.get(f"/jobs/{job['job_id']}/results").json()
+    assert results["chunks"] == 16
+    assert results["results"] == client.post("/predict_all/batch", json=patients).json()["results"]
+    assert client.delete(f"/jobs/{job['job_id']}").status_code == 200
+    assert client.get(f"/jobs/{job['job_id']}/results").status_code == 404
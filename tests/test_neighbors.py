@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+from sklearn.neighbors import KNeighborsClassifier
+
+from app.models.neighbors import FlatKNN
+from app.models.predictor import HeartDiseasePredictor
+
+KNN_KEYS = ["knn_scaled", "knn_normalized"]
+
+def transformed_features(pickles, model_key: str, features: np.ndarray) -> np.ndarray:
+    scalers, _ = pickles
+    return scalers['standard' if '_scaled' in model_key else 'minmax'].transform(features)
+
+@pytest.mark.parametrize("index", ["brute", "tree"])
+@pytest.mark.parametrize("model_key", KNN_KEYS)
+def test_batch_matches_sklearn(pickles, features, model_key, index):
+    model = pickles[1][model_key]
+    transformed = transformed_features(pickles, model_key, features)
+    knn = FlatKNN(model, index)
+    
+    distances, indices = knn.kneighbors(transformed)
+    reference_distances, reference_indices = model.kneighbors(transformed)
+    np.testing.assert_allclose(distances, reference_distances, rtol=0, atol=1e-12)
+    np.testing.assert_array_equal(np.sort(indices, axis=1), np.sort(reference_indices, axis=1))
+    np.testing.assert_allclose(knn.predict_proba(transformed), model.predict_proba(transformed), rtol=0, atol=1e-12)
+    np.testing.assert_array_equal(knn.predict(transformed), model.predict(transformed))
+
+@pytest.mark.parametrize("index", ["brute", "tree"])
+@pytest.mark.parametrize("model_key", KNN_KEYS)
+def test_single_row_matches_sklearn(pickles, features, model_key, index):
+    model = pickles[1][model_key]
+    knn = FlatKNN(model, index)
+    
+    for row in transformed_features(pickles, model_key, features):
+        row = row.reshape(1, -1)
+        np.testing.assert_allclose(knn.predict_proba(row), model.predict_proba(row), rtol=0, atol=1e-12)
+        assert knn.predict(row)[0] == model.predict(row)[0]
+
+@pytest.mark.parametrize("index", ["brute", "tree"])
+def test_distance_weights_match_sklearn(pickles, features, index):
+    # Data/heart.csv holds the training rows, so some queries are exact matches
+    fitted = pickles[1]["knn_scaled"]
+    model = KNeighborsClassifier(n_neighbors=fitted.n_neighbors, weights='distance')
+    model.fit(fitted._fit_X, fitted.classes_[fitted._y])
+    transformed = transformed_features(pickles, "knn_scaled", features)
+    knn = FlatKNN(model, index)
+    
+    np.testing.assert_allclose(knn.predict_proba(transformed), model.predict_proba(transformed), rtol=0, atol=1e-12)
+    np.testing.assert_array_equal(knn.predict(transformed), model.predict(transformed))
+
+def test_predictor_labels_match_sklearn(features):
+    predictor = HeartDiseasePredictor(compiled=False, flat_forest=False, flat_knn=True, quantized=False)
+    predictor.cache = None
+    
+    predictions = predictor.predict_arrays(features, KNN_KEYS)
+    for model_key in KNN_KEYS:
+        assert isinstance(predictor.engines[model_key], FlatKNN)
+        scaler = predictor.scalers['standard' if '_scaled' in model_key else 'minmax']
+        np.testing.assert_array_equal(predictions[model_key][0], predictor.models[model_key].predict(scaler.transform(features)))
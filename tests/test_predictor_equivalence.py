@@ -0,0 +1,41 @@
+import numpy as np
+import pytest
+
+from app.models.predictor import HeartDiseasePredictor
+
+MODEL_KEYS = [
+    f"{model_type}_{scaling}"
+    for model_type in HeartDiseasePredictor.MODEL_TYPES
+    for scaling in HeartDiseasePredictor.SCALING_METHODS
+]
+
+@pytest.fixture(scope="module")
+def predictor() -> HeartDiseasePredictor:
+    """Predictor running the sklearn models themselves, without the prediction cache"""
+    predictor = HeartDiseasePredictor(compiled=False, flat_forest=False, flat_knn=False, quantized=False)
+    predictor.cache = None
+    return predictor
+
+def reference_predictions(predictor: HeartDiseasePredictor, model_key: str, features: np.ndarray):
+    """Labels and probabilities of the former path, predict followed by predict_proba"""
+    scaler = predictor.scalers['standard' if '_scaled' in model_key else 'minmax']
+    transformed_features = scaler.transform(features)
+    model = predictor.models[model_key]
+    predictions = model.predict(transformed_features)
+    probabilities = model.predict_proba(transformed_features)[np.arange(len(predictions)), predictions]
+    return predictions, probabilities
+
+@pytest.mark.parametrize("model_key", MODEL_KEYS)
+def test_batch_matches_predict_and_predict_proba(predictor, features, model_key):
+    predictions, probabilities = reference_predictions(predictor, model_key, features)
+    results = predictor.predict_batch_with_model(features, model_key)
+    
+    assert [prediction for prediction, _, _ in results] == predictions.tolist()
+    assert [probability for _, probability, _ in results] == probabilities.tolist()
+
+@pytest.mark.parametrize("model_key", MODEL_KEYS)
+def test_single_row_matches_predict_and_predict_proba(predictor, features, model_key):
+    for row in features:
+        # The former path also ran each model on the single row
+        predictions, probabilities = reference_predictions(predictor, model_key, row.reshape(1, -1))
+        assert predictor.predict_with_model(row, model_key)[:2] == (predictions[0], probabilities[0])
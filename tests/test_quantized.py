@@ -0,0 +1,80 @@
+import json
+import os
+import shutil
+
+import numpy as np
+import pytest
+
+from app.config import settings
+from app.models.predictor import HeartDiseasePredictor
+from app.models.quantized import REPORT_FILENAME, QuantizedEnsemble, QuantizedForest, QuantizedKNN, quantization_refusal
+
+PICKLES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "pickles")
+
+@pytest.fixture
+def models_dir(tmp_path):
+    """Copy of pickles/ whose drift report a test can rewrite"""
+    path = tmp_path / "pickles"
+    shutil.copytree(PICKLES_DIR, path, ignore=shutil.ignore_patterns(".cache", "*.joblib"))
+    return path
+
+def set_drift(models_dir, drift: float) -> None:
+    report = json.loads((models_dir / REPORT_FILENAME).read_text())
+    report["max_drift"] = drift
+    (models_dir / REPORT_FILENAME).write_text(json.dumps(report))
+
+def quantized_predictor(models_dir) -> HeartDiseasePredictor:
+    return HeartDiseasePredictor(str(models_dir), compiled=False, flat_forest=False, flat_knn=False, quantized=True)
+
+def test_refusal_reasons():
+    report = {"max_drift": 0.02, "model_digests": {"knn_scaled": "a"}}
+    
+    assert "no drift report" in quantization_refusal(None, 0.01)
+    assert "other models" in quantization_refusal(report, 0.05, {"knn_scaled": "b"})
+    assert "exceeds" in quantization_refusal(report, 0.01, {"knn_scaled": "a"})
+    assert quantization_refusal(report, 0.02, {"knn_scaled": "a"}) is None
+    # A bundle manifest carries its report, so no digests are checked
+    assert quantization_refusal(report, 0.02) is None
+
+def test_drift_above_the_threshold_keeps_float64(models_dir, monkeypatch, features):
+    monkeypatch.setattr(settings, "quantized_max_drift", 0.01)
+    set_drift(models_dir, 0.05)
+    predictor = quantized_predictor(models_dir)
+    model_set = predictor.model_set
+    
+    assert not model_set.use_quantized
+    assert "5.00% exceeds the allowed 1.00%" in model_set.quantization_refusal
+    assert model_set.info()["quantized"] is False
+    assert not any(isinstance(engine, (QuantizedForest, QuantizedKNN)) for engine in model_set.engines.values())
+    assert not isinstance(model_set.compiled, QuantizedEnsemble)
+    
+    reference = HeartDiseasePredictor(str(models_dir), compiled=False, flat_forest=False, flat_knn=False, quantized=False)
+    rows = np.ascontiguousarray(features[:50])
+    predictor.cache = reference.cache = None
+    assert predictor.predict_batch_with_all_models(rows) == reference.predict_batch_with_all_models(rows)
+
+def test_drift_within_the_threshold_activates_quantized_mode(models_dir, monkeypatch):
+    monkeypatch.setattr(settings, "quantized_max_drift", 0.05)
+    set_drift(models_dir, 0.05)
+    model_set = quantized_predictor(models_dir).model_set
+    
+    assert model_set.use_quantized and model_set.quantization_refusal is None
+    assert isinstance(model_set.compiled, QuantizedEnsemble)
+    assert isinstance(model_set.engines["random_forest_scaled"], QuantizedForest)
+    assert isinstance(model_set.engines["knn_scaled"], QuantizedKNN)
+
+def test_report_of_other_models_is_refused(models_dir, monkeypatch):
+    monkeypatch.setattr(settings, "quantized_max_drift", 1.0)
+    # Swap two model files, so the report no longer describes the models served
+    shutil.copy(models_dir / "knn_model_normalized.pkl", models_dir / "knn_model_scaled.pkl")
+    model_set = quantized_predictor(models_dir).model_set
+    
+    assert not model_set.use_quantized
+    assert "other models" in model_set.quantization_refusal
+
+def test_missing_report_is_refused(models_dir):
+    (models_dir / REPORT_FILENAME).unlink()
+    model_set = quantized_predictor(models_dir).model_set
+    
+    assert not model_set.use_quantized
+    assert "no drift report" in model_set.quantization_refusal
@@ -0,0 +1,64 @@
+import os
+import shutil
+
+import numpy as np
+import pytest
+
+from app.config import settings
+from app.models.model_set import ModelSetValidationError, ReloadInProgressError
+from app.models.predictor import HeartDiseasePredictor
+
+PICKLES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "pickles")
+
+@pytest.fixture
+def models_dir(tmp_path):
+    """Copy of pickles/ a test can break"""
+    path = tmp_path / "pickles"
+    shutil.copytree(PICKLES_DIR, path, ignore=shutil.ignore_patterns(".cache", "*.joblib"))
+    return path
+
+@pytest.fixture
+def predictor(models_dir) -> HeartDiseasePredictor:
+    return HeartDiseasePredictor(str(models_dir), compiled=False, flat_forest=False, flat_knn=False, quantized=False)
+
+def test_reload_swaps_in_a_new_version(predictor, features):
+    rows = np.ascontiguousarray(features[:20])
+    before = predictor.predict_batch_with_all_models(rows)
+    
+    info = predictor.reload()
+    assert info["version"] == 2 and predictor.version == 2
+    assert predictor.predict_batch_with_all_models(rows) == before
+
+@pytest.mark.parametrize("broken", ["corrupt model", "missing scaler"])
+def test_failed_validation_keeps_the_active_set(predictor, models_dir, features, broken):
+    model_set = predictor.model_set
+    if broken == "corrupt model":
+        (models_dir / "random_forest_model_scaled.pkl").write_bytes(b"not a pickle")
+    else:
+        (models_dir / "minmax_scaler.pkl").unlink()
+    
+    with pytest.raises(ModelSetValidationError):
+        predictor.reload()
+    assert predictor.model_set is model_set and predictor.version == 1
+    assert len(predictor.predict_batch_with_all_models(features[:5])[0]) == 8
+
+def test_concurrent_reload_is_refused(predictor):
+    with predictor._reload_lock:
+        with pytest.raises(ReloadInProgressError):
+            predictor.reload()
+
+def test_admin_reload_rolls_back_on_a_broken_model(client, models_dir, monkeypatch):
+    predictor = client.app.state.predictor
+    monkeypatch.setattr(settings, "admin_token", "secret")
+    monkeypatch.setattr(predictor, "models_dir", str(models_dir))
+    assert client.post("/admin/reload").status_code == 401
+    
+    response = client.post("/admin/reload", headers={"X-Admin-Token": "secret"})
+    assert response.status_code == 200
+    version = response.json()["model_set"]["version"]
+    
+    (models_dir / "knn_model_scaled.pkl").write_bytes(b"not a pickle")
+    response = client.post("/admin/reload", headers={"X-Admin-Token": "secret"})
+    assert response.status_code == 422
+    assert f"still serving model set version {version}" in response.json()["detail"]
+    assert predictor.version == version
@@ -0,0 +1,72 @@
+import json
+
+import pytest
+
+from app.config import settings
+from app.schemas.decoding import MAX_LINE_BYTES
+
+@pytest.fixture
+def body(patients):
+    """NDJSON body of 20 patients with invalid and blank lines between them, and its valid patients"""
+    lines, valid = [], []
+    for index, patient in enumerate(patients[:20]):
+        lines.append(json.dumps(patient))
+        valid.append(patient)
+        if index == 3:
+            lines.append('{"age": 52,')
+        if index == 8:
+            lines.append("")
+        if index == 12:
+            lines.append(json.dumps(dict(patient, ca=9)))
+    return "\n".join(lines).encode(), valid
+
+def read_ndjson(response) -> list:
+    return [json.loads(line) for line in response.text.splitlines()]
+
+def read_sse(response) -> list:
+    events = []
+    for message in response.text.strip().split("\n\n"):
+        event, data = message.split("\n")
+        events.append((event[len("event: "):], json.loads(data[len("data: "):])))
+    return events
+
+@pytest.mark.parametrize("chunk_size", [1000, 7])
+def test_invalid_lines_get_errors_in_place(client, body, monkeypatch, chunk_size):
+    monkeypatch.setattr(settings, "stream_chunk_size", chunk_size)
+    content, valid = body
+    
+    results = read_ndjson(client.post("/predict_all/stream", content=content))
+    expected = iter(client.post("/predict_all/batch", json=valid).json()["results"])
+    # The blank line is skipped but still counted by the line numbers
+    errors = {5: "json_invalid", 16: "less_than_equal"}
+    assert len(results) == len(valid) + len(errors)
+    for result in results:
+        if "line" in result:
+            assert [item["type"] for item in result["detail"]] == [errors.pop(result["line"])]
+        else:
+            assert result == next(expected)
+    assert not errors and next(expected, None) is None
+
+def test_single_model_stream_matches_its_batch_route(client, body):
+    content, valid = body
+    
+    results = [result for result in read_ndjson(client.post("/predict/knn_scaled/stream", content=content)) if "line" not in result]
+    assert results == client.post("/predict/knn_scaled/batch", json=valid).json()["results"]
+
+def test_sse_reports_chunks_and_counts(client, body, monkeypatch):
+    monkeypatch.setattr(settings, "stream_chunk_size", 7)
+    content, valid = body
+    
+    events = read_sse(client.post("/predict_all/stream?format=sse", content=content))
+    # 22 non-blank lines make four chunks, each event names the line number of its first line
+    assert [event for event, _ in events] == ["results"] * 4 + ["done"]
+    assert [data["line"] for _, data in events[:4]] == [1, 8, 16, 23]
+    assert sum(len(data["results"]) for _, data in events[:4]) == 22
+    assert events[-1][1] == {"rows": len(valid), "invalid_rows": 2}
+
+def test_overlong_line_ends_the_stream_with_an_error(client, patients):
+    content = (json.dumps(patients[0]) + "\n" + " " * (MAX_LINE_BYTES + 1)).encode()
+    
+    results = read_ndjson(client.post("/predict_all/stream", content=content))
+    assert all("predictions" in result for result in results[:-1])
+    assert results[-1] == {"detail": f"Line 2 is longer than {MAX_LINE_BYTES} bytes"}
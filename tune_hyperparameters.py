@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+"""
+Hyperparameter Tuning for the Heart Disease Models
+
+This script searches the hyperparameters of each model family for both the scaled
+and the normalized features with successive halving over repeated stratified k-fold
+cross-validation:
+
+- Every candidate of a search is first scored on a few folds, and only the best
+  third is promoted to the next rung, where it is scored on three times as many.
+  Scores of earlier folds are kept, so a promoted candidate only fits the new folds.
+- The folds are split once and shared by every candidate and model, and the scaled
+  and normalized matrices are read from the feature store of generate_model_pickles.py.
+  The scalers fitted on the whole training split are reused inside the folds, which
+  biases all candidates alike.
+- The fits of a rung run in parallel with joblib.
+- The searches share a wall-clock budget. The cheap model families are searched first,
+  so time they leave unused goes to the random forests, and a search that runs out of
+  time keeps the best candidate of its last finished rung, or the previous parameters
+  when not even the first rung finished.
+
+The best configurations are written to pickles/hyperparameters.json, which
+generate_model_pickles.py applies and records in the model bundle manifest.
+
+Usage:
+    python tune_hyperparameters.py                     # 5 minute budget, all cores
+    python tune_hyperparameters.py --budget 60 --jobs 2
+    python tune_hyperparameters.py --models random_forest --max-candidates 40
+    python generate_model_pickles.py                   # refit the models that changed
+"""
+
+import argparse
+import json
+import math
+import os
+import time
+from datetime import datetime, timezone
+import numpy as np
+from joblib import Parallel, delayed
+from sklearn.base import clone
+from sklearn.metrics import get_scorer
+from sklearn.model_selection import ParameterGrid, ParameterSampler, RepeatedStratifiedKFold
+from feature_store import STORE_PATH, FeatureStore
+from generate_model_pickles import DATA_PATH, OUT_DIR, RANDOM_STATE, build_models, prepare_data
+
+# Candidate hyperparameters of every model family, cheapest family first
+SEARCH_SPACES = {
+    'naive_bayes': {
+        'var_smoothing': [float(value) for value in np.logspace(-12, -2, 11)]
+    },
+    'logistic_regression': {
+        'C': [0.001, 0.003, 0.01, 0.03, 0.1, 0.3, 1.0, 3.0, 10.0, 30.0, 100.0],
+        'max_iter': [1000]
+    },
+    'knn': {
+        # FlatKNN needs the Euclidean metric, so only the neighbourhood is searched
+        'n_neighbors': [1, 3, 5, 7, 9, 11, 15, 21, 31],
+        'weights': ['uniform', 'distance']
+    },
+    'random_forest': {
+        # Prediction latency grows with the number of trees, so only their shape is searched
+        'n_estimators': [100],
+        'max_depth': [None, 4, 6, 8, 10, 14],
+        'min_samples_leaf': [1, 2, 4],
+        'max_features': ['sqrt', 0.5]
+    }
+}
+
+SCALING_METHODS = ['scaled', 'normalized']
+
+def candidates_for(model_name, max_candidates, random_state):
+    """
+    List the candidate parameter sets of a model family
+
+    Args:
+        model_name: Model family, a key of SEARCH_SPACES
+        max_candidates: Sample this many candidates from larger grids, 0 for the full grid
+        random_state: Seed of the sampling
+
+    Returns:
+        List of parameter dictionaries
+    """
+    space = SEARCH_SPACES[model_name]
+    grid = list(ParameterGrid(space))
+    if max_candidates and len(grid) > max_candidates:
+        return list(ParameterSampler(space, n_iter=max_candidates, random_state=random_state))
+    return grid
+
+def fit_and_score(candidate, fold, estimator, params, X, y, train_index, test_index, scoring):
+    """
+    Fit one candidate on one fold, run in a joblib worker
+
+    Returns:
+        Tuple of (candidate, fold, score on the fold's held-out rows)
+    """
+    model = clone(estimator).set_params(**params)
+    model.fit(X[train_index], y[train_index])
+    return candidate, fold, get_scorer(scoring)(model, X[test_index], y[test_index])
+
+def successive_halving(estimator, candidates, X, y, folds, scoring, jobs, deadline, eta=3, min_folds=1):
+    """
+    Find the best candidate with successive halving over cross-validation folds
+
+    Args:
+        estimator: Unfitted model whose parameters are searched
+        candidates: List of parameter dictionaries
+        X: Training features, already scaled the way the model expects
+        y: Training labels
+        folds: Precomputed (train_index, test_index) pairs
+        scoring: sklearn scorer name
+        jobs: Fits run in parallel
+        deadline: time.perf_counter() value after which no more fits are started
+        eta: Keep 1/eta of the candidates per rung and multiply their folds by eta
+        min_folds: Folds every candidate is scored on in the first rung
+
+    Returns:
+        Tuple of (best parameters or None, mean score, folds scored, rungs finished, fits)
+    """
+    scores = [[] for _ in candidates]
+    alive = list(range(len(candidates)))
+    resource = min_folds
+    rungs = fits = 0
+    best = None
+
+    with Parallel(n_jobs=jobs, return_as='generator_unordered') as parallel:
+        while True:
+            # Score every surviving candidate on the folds it has not seen yet
+            tasks = [
+                (candidate, fold)
+                for candidate in alive
+                for fold in range(len(scores[candidate]), resource)
+            ]
+            results = parallel(
+                delayed(fit_and_score)(candidate, fold, estimator, candidates[candidate], X, y, *folds[fold], scoring)
+                for candidate, fold in tasks
+            )
+
+            finished = True
+            fold_scores = {}
+            for candidate, fold, score in results:
+                fold_scores[(candidate, fold)] = score
+                fits += 1
+                if len(fold_scores) < len(tasks) and time.perf_counter() > deadline:
+                    finished = False
+                    break
+            if not finished:
+                # Candidates of an unfinished rung are not comparable, keep the last finished one
+                results.close()
+                break
+
+            for (candidate, fold), score in sorted(fold_scores.items()):
+                scores[candidate].append(score)
+            rungs += 1
+
+            ranked = sorted(alive, key=lambda c: np.mean(scores[c]), reverse=True)
+            best = (ranked[0], float(np.mean(scores[ranked[0]])), len(scores[ranked[0]]))
+            if resource >= len(folds) or len(ranked) == 1:
+                break
+
+            alive = ranked[:max(1, math.ceil(len(ranked) / eta))]
+            resource = min(len(folds), resource * eta)
+
+    if best is None:
+        return None, None, 0, rungs, fits
+    candidate, score, n_folds = best
+    return candidates[candidate], score, n_folds, rungs, fits
+
+def holdout_score(estimator, params, prepared, scaling, scoring):
+    """Fit on the whole training split and score on the test split"""
+    model = clone(estimator).set_params(**params)
+    model.fit(prepared['X'][scaling], prepared['y'])
+    return float(get_scorer(scoring)(model, prepared['X_test'][scaling], prepared['y_test']))
+
+def _plain(value):
+    """Convert NumPy scalars in parameter values to plain Python for JSON"""
+    return value.item() if isinstance(value, np.generic) else value
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--data', default=DATA_PATH,
+                        help=f'Labelled dataset the feature store is created from if it does not exist (default: {DATA_PATH})')
+    parser.add_argument('--store', default=STORE_PATH, help=f'Feature store with the training data (default: {STORE_PATH})')
+    parser.add_argument('--output', default=os.path.join(OUT_DIR, 'hyperparameters.json'),
+                        help='Where to write the best configurations (default: pickles/hyperparameters.json)')
+    parser.add_argument('--models', help=f"Comma-separated model families to tune (default: {','.join(SEARCH_SPACES)})")
+    parser.add_argument('--budget', type=float, default=300, help='Wall-clock budget in seconds for all searches (default: 300)')
+    parser.add_argument('--jobs', type=int, default=-1, help='Fits run in parallel, -1 for all cores (default: -1)')
+    parser.add_argument('--folds', type=int, default=5, help='Cross-validation folds (default: 5)')
+    parser.add_argument('--repeats', type=int, default=2, help='Repetitions of the k-fold split (default: 2)')
+    parser.add_argument('--max-candidates', type=int, default=0,
+                        help='Sample at most this many candidates per search, 0 for the full grid (default: 0)')
+    parser.add_argument('--scoring', default='roc_auc', help='sklearn scorer to maximize (default: roc_auc)')
+    args = parser.parse_args()
+
+    model_names = args.models.split(',') if args.models else list(SEARCH_SPACES)
+    unknown = [model_name for model_name in model_names if model_name not in SEARCH_SPACES]
+    if unknown:
+        parser.error(f"Unknown model families: {', '.join(unknown)}")
+    model_names = [model_name for model_name in SEARCH_SPACES if model_name in model_names]
+
+    start = time.perf_counter()
+    prepared, data_hash = prepare_data(FeatureStore.open_or_create(args.store, args.data))
+    splitter = RepeatedStratifiedKFold(n_splits=args.folds, n_repeats=args.repeats, random_state=RANDOM_STATE)
+    folds = list(splitter.split(prepared['X']['scaled'], prepared['y']))
+    defaults = build_models()
+
+    # Earlier results are kept for the model families that are not tuned this time
+    results = {}
+    if os.path.exists(args.output):
+        with open(args.output) as file:
+            results = json.load(file).get('models', {})
+
+    searches = [(model_name, scaling) for model_name in model_names for scaling in SCALING_METHODS]
+    for index, (model_name, scaling) in enumerate(searches):
+        model_key = f'{model_name}_{scaling}'
+        # Split the time that is left evenly over the searches that are left
+        now = time.perf_counter()
+        deadline = now + (start + args.budget - now) / (len(searches) - index)
+
+        candidates = candidates_for(model_name, args.max_candidates, RANDOM_STATE)
+        search_start = time.perf_counter()
+        params, score, n_folds, rungs, fits = successive_halving(
+            defaults[model_key], candidates, prepared['X'][scaling], prepared['y'],
+            folds, args.scoring, args.jobs, deadline
+        )
+        elapsed = time.perf_counter() - search_start
+
+        if params is None:
+            print(f"{model_key}: budget exhausted before the first rung finished, keeping the previous parameters")
+            continue
+
+        params = {name: _plain(value) for name, value in params.items()}
+        tuned = holdout_score(defaults[model_key], params, prepared, scaling, args.scoring)
+        default = holdout_score(defaults[model_key], {}, prepared, scaling, args.scoring)
+        results[model_key] = {
+            'params': params,
+            'cv_score': score,
+            'cv_folds': n_folds,
+            'test_score': tuned,
+            'default_test_score': default,
+            'candidates': len(candidates),
+            'rungs': rungs,
+            'fits': fits,
+            'seconds': round(elapsed, 3)
+        }
+        print(f"{model_key}: {params} cv {args.scoring}={score:.4f} over {n_folds} folds, "
+              f"test {tuned:.4f} (defaults {default:.4f}), "
+              f"{len(candidates)} candidates, {fits} fits, {rungs} rungs in {elapsed:.1f}s")
+
+    os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+    tmp_path = f'{args.output}.tmp'
+    with open(tmp_path, 'w') as file:
+        json.dump({
+            'created_at': datetime.now(timezone.utc).isoformat(),
+            'data_hash': data_hash,
+            'scoring': args.scoring,
+            'cv': {'folds': args.folds, 'repeats': args.repeats},
+            'models': results
+        }, file, indent=2, sort_keys=True)
+    os.replace(tmp_path, args.output)
+
+    print(f"Tuned {len(searches)} searches in {time.perf_counter() - start:.1f}s of a {args.budget:.0f}s budget")
+    print(f"Wrote {args.output}, run generate_model_pickles.py to fit the tuned models")
+
+if __name__ == '__main__':
+    main()